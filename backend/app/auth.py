@@ -3,7 +3,6 @@ Bisheshoggo AI - Authentication Utilities
 """
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -31,6 +30,8 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
+    # Imported here: python-jose loads its cryptography backend (~45 ms), off the startup path
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -43,6 +44,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def decode_token(token: str) -> Optional[schemas.TokenData]:
     """Decode and validate a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
@@ -84,6 +86,19 @@ async def get_current_user(
     return user
 
 
+async def get_current_admin(
+    current_user: models.User = Depends(get_current_user)
+) -> models.User:
+    """Require an authenticated user listed in ADMIN_EMAILS"""
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
     db: Session = Depends(get_db)
@@ -101,6 +116,15 @@ async def get_current_user_optional(
     return user if user and user.is_active else None
 
 
+def get_user_from_token(db: Session, token: str) -> Optional[models.User]:
+    """Active user for a bearer token (for WebSockets, which can't use the HTTPBearer dependency)"""
+    token_data = decode_token(token) if token else None
+    if token_data is None or token_data.user_id is None:
+        return None
+    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
+    return user if user and user.is_active else None
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
     """Authenticate a user by email and password"""
     user = db.query(models.User).filter(models.User.email == email).first()
@@ -0,0 +1,176 @@
+"""
+Bisheshoggo AI - Consultation Chat Broker
+In-process fan-out and batched persistence for consultation messages.
+
+Every WebSocket connected to a consultation subscribes to its channel. A
+message, whether from a socket or from the POST route, gets its id and
+timestamp and goes out to the channel's subscribers right away. It is also
+queued for writing. Queued messages from all consultations are inserted
+together in one transaction, every CHAT_WRITE_BATCH_MS or as soon as
+CHAT_WRITE_BATCH_SIZE are pending. The sender learns the message is durable
+from a ``persisted`` event (the POST route waits for it). If a batch fails,
+each of its messages' channels gets a ``failed`` event.
+
+Each event is serialized once per publish. Every subscriber has a bounded
+queue drained by its own writer task, so a slow phone never holds up the
+rest of the channel. A subscriber whose queue overflows is disconnected and
+catches up from the message history when it reconnects.
+
+The broker lives in one process. Run chat on a single worker, or route each
+consultation's sockets to the same worker.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert
+from . import models, schemas
+from .config import settings
+from .database import SessionLocal
+from .serialization import get_adapter
+
+logger = logging.getLogger(__name__)
+
+_message = get_adapter(schemas.ConsultationMessageResponse)
+
+
+class Subscription:
+    """One connection's feed of a consultation channel."""
+
+    def __init__(self, consultation_id: str, user_id: str):
+        self.consultation_id = consultation_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CHAT_SUBSCRIBER_QUEUE)
+        self.overflowed = False
+
+    def deliver(self, event: str):
+        """Queue a serialized event; on overflow, replace the backlog with a disconnect sentinel."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class ChatBroker:
+    """Channels of subscriptions per consultation, plus the pending write batch."""
+
+    def __init__(self):
+        self._channels: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._pending: List[Tuple[dict, dict, asyncio.Future]] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, consultation_id: str, user_id: str) -> Subscription:
+        subscription = Subscription(consultation_id, user_id)
+        self._channels[consultation_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = self._channels.get(subscription.consultation_id)
+        if channel is not None:
+            channel.discard(subscription)
+            if not channel:
+                del self._channels[subscription.consultation_id]
+
+    def subscriber_count(self, consultation_id: str = None) -> int:
+        if consultation_id is not None:
+            return len(self._channels.get(consultation_id, ()))
+        return sum(len(channel) for channel in self._channels.values())
+
+    def publish(self, consultation_id: str, event: dict, exclude: Subscription = None):
+        """Fan an event out to every subscriber of the consultation (bar ``exclude``)."""
+        channel = self._channels.get(consultation_id)
+        if not channel:
+            return
+        text = json.dumps(event, ensure_ascii=False)
+        for subscription in tuple(channel):
+            if subscription is not exclude:
+                subscription.deliver(text)
+
+    def send(
+        self,
+        consultation_id: str,
+        sender_id: str,
+        data: schemas.ConsultationMessageCreate,
+        client_id: str = None,
+    ) -> asyncio.Future:
+        """
+        Publish a new message and queue it for writing. The returned future
+        resolves to the message (JSON-ready dict) once its batch is committed.
+        """
+        row = {
+            "id": models.generate_uuid(),
+            "consultation_id": consultation_id,
+            "sender_id": sender_id,
+            "message": data.message,
+            "attachment_url": data.attachment_url,
+            # Naive UTC, like the server_default timestamps SQLite stores
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        message = _message.dump_python(_message.validate_python(row), mode="json")
+        self.publish(consultation_id, {"type": "message", "client_id": client_id, "data": message})
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, message, future))
+        if len(self._pending) >= settings.CHAT_WRITE_BATCH_SIZE:
+            self._spawn(self.flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_later())
+        return future
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self):
+        await asyncio.sleep(settings.CHAT_WRITE_BATCH_MS / 1000)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Write every pending message in one transaction."""
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                await asyncio.to_thread(_insert_messages, [row for row, _, _ in batch])
+            except Exception as e:
+                logger.exception("Chat message batch failed", extra={"messages": len(batch)})
+                for row, _, future in batch:
+                    self.publish(row["consultation_id"], {"type": "failed", "id": row["id"]})
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for _, message, future in batch:
+                if not future.done():
+                    future.set_result(message)
+
+    async def close(self):
+        """Stop the batch timer and write whatever is still pending."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+
+def _insert_messages(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.ConsultationMessage), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+chat_broker = ChatBroker()
@@ -0,0 +1,212 @@
+"""
+Bisheshoggo AI - Response Compression
+Negotiated brotli / zstd / gzip for clients on slow rural links.
+
+The encoding is picked from Accept-Encoding (q-values honoured) in server
+preference order br > zstd > gzip, skipping codecs whose optional package
+(``brotli``/``brotlicffi``, ``zstandard``) is not installed; gzip is always
+available. Complete bodies under COMPRESSION_MIN_SIZE bytes and already-compact
+content types are passed through untouched.
+
+Streaming responses are compressed incrementally. For Server-Sent Events
+every event is followed by a sync flush, so the client can decode and render
+it immediately instead of waiting for the compressor's window to fill.
+"""
+import zlib
+from typing import Optional
+from .config import settings
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "application/msgpack",  # binary, but keys still repeat per row
+)
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Server preference order
+ENCODERS = {"gzip": _GzipEncoder}
+if zstandard is not None:
+    ENCODERS = {"zstd": _ZstdEncoder, **ENCODERS}
+if brotli is not None:
+    ENCODERS = {"br": _BrotliEncoder, **ENCODERS}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best available coding the client accepts, or None for identity."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    wildcard = accepted.get("*", 0.0)
+    for coding in ENCODERS:
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress_body(coding: str, body: bytes) -> bytes:
+    """One-shot compression of a complete body."""
+    encoder = ENCODERS[coding]()
+    return encoder.compress(body) + encoder.finish()
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return any(content_type.startswith(prefix) for prefix in _COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses with the negotiated encoding."""
+
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        coding = negotiate_encoding(accept_encoding)
+
+        start_message = None
+        encoder = None
+        flush_each = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, flush_each
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if message["status"] == 304:
+                    message["headers"] = list(message.get("headers", [])) + [(b"vary", b"Accept-Encoding")]
+                    return await send(message)
+                if message["status"] < 200 or message["status"] == 204 or not _is_compressible(content_type):
+                    return await send(message)
+                if b"content-encoding" in headers or coding is None:
+                    message["headers"] = list(message.get("headers", [])) + [(b"vary", b"Accept-Encoding")]
+                    return await send(message)
+                # Hold the start until the first body chunk tells us whether to compress
+                start_message = message
+                flush_each = content_type.startswith("text/event-stream")
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    start_message["headers"] = list(start_message.get("headers", [])) + [(b"vary", b"Accept-Encoding")]
+                    await send(start_message)
+                    start_message = None
+                    return await send(message)
+                encoder = ENCODERS[coding]()
+                headers = [
+                    (name, value) for name, value in start_message.get("headers", [])
+                    if name.lower() != b"content-length"
+                ]
+                headers = [
+                    # A strong validator can't survive a change of encoding
+                    (name, b"W/" + value if name.lower() == b"etag" and not value.startswith(b"W/") else value)
+                    for name, value in headers
+                ]
+                headers += [(b"content-encoding", coding.encode("latin-1")), (b"vary", b"Accept-Encoding")]
+                if not more_body:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    start_message["headers"] = headers
+                    await send(start_message)
+                    return await send({"type": "http.response.body", "body": compressed})
+                start_message["headers"] = headers
+                await send(start_message)
+
+            if more_body:
+                chunk = encoder.compress(body)
+                if flush_each:
+                    chunk += encoder.flush()
+            else:
+                chunk = encoder.compress(body) + encoder.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
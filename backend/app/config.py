@@ -23,6 +23,78 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str = ""
     GOOGLE_API_KEY: str = ""
     HF_TOKEN: str = ""  # HuggingFace token for MedGemma model download
+    MEDGEMMA_MAX_NEW_TOKENS: int = 2048  # Hard ceiling for any single generation
+    MEDGEMMA_USER_TOKENS_PER_MINUTE: int = 6000  # Per-user local GPU quota (0 = unlimited)
+    MEDGEMMA_DRAFT_MODEL_ID: str = ""  # e.g. "google/gemma-3-270m-it" to enable speculative decoding
+    MEDGEMMA_NUM_ASSISTANT_TOKENS: int = 5  # Draft tokens proposed per verification step
+    MEDGEMMA_INFERENCE_MODE: str = "local"  # "local" (in-process), "remote" (inference daemon) or "stub" (offline)
+    INFERENCE_SOCKET_PATH: str = "/tmp/bisheshoggo-inference.sock"
+    INFERENCE_SHM_THRESHOLD: int = 64 * 1024  # Bodies above this many bytes go via shared memory
+    INFERENCE_SHM_LEASE_SECONDS: float = 600.0  # Unclaimed shared-memory bodies older than this are unlinked
+    INFERENCE_TIMEOUT_SECONDS: float = 300.0
+    STUB_PREFILL_MS: float = 250.0  # Stub backend: median time to first token
+    STUB_TOKENS_PER_SECOND: float = 30.0  # Stub backend: median decode rate (0 = instant)
+    STUB_LATENCY_JITTER: float = 0.3  # Stub backend: lognormal sigma applied to both
+    STUB_SEED: int = 0
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_STREAM: str = "stdout"  # "stdout" or "stderr"
+    LOG_SAMPLE_RATE: float = 0.1  # Fraction of high-volume INFO/DEBUG events kept
+    SQL_ECHO: bool = False  # Log every SQL statement (very noisy)
+    
+    # Tracing
+    TRACE_EXPORTER: str = "none"  # "none", "log", "otlp" or "memory"
+    TRACE_SAMPLE_RATE: float = 0.05  # Head sampling ratio for new traces
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://localhost:4318"
+    OTEL_SERVICE_NAME: str = "bisheshoggo-api"
+    
+    # Caching
+    FACILITY_DIRECTORY_CHECK_SECONDS: float = 30.0  # How often to look for facility writes by other workers
+    
+    # Profiling
+    PROFILER_INTERVAL_MS: float = 10.0  # Sampling period (100 Hz)
+    PROFILER_MAX_SECONDS: float = 300.0  # Auto-stop a forgotten profile
+    PROFILER_REQUEST_TOKEN: str = ""  # Value of X-Profile that opts a request in ("" = disabled)
+    PROFILER_REQUEST_HISTORY: int = 32  # Per-request profiles kept for retrieval
+    
+    # Compression
+    COMPRESSION_MIN_SIZE: int = 512  # Complete bodies smaller than this go out uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5  # 0-11; dynamic responses, so well below the max
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    SSE_BATCH_MS: float = 50.0  # Coalesce chat token deltas arriving within this window
+    SSE_BATCH_MAX_CHARS: int = 512  # ...up to this many characters per event
+    
+    # Consultation Chat
+    CHAT_WRITE_BATCH_MS: float = 20.0  # Max time a message waits to be written with others
+    CHAT_WRITE_BATCH_SIZE: int = 256  # ...or write as soon as this many are pending
+    CHAT_SUBSCRIBER_QUEUE: int = 256  # Undelivered events per socket before it is dropped
+    
+    # Scheduling
+    CONSULTATION_SLOT_MINUTES: int = 30  # Booking grid; a consultation holds every slot it overlaps
+    SCHEDULE_DAY_START: str = "09:00"  # Bookable hours, local time
+    SCHEDULE_DAY_END: str = "17:00"
+    SCHEDULE_UTC_OFFSET_MINUTES: int = 360  # Bangladesh Standard Time (UTC+6, no DST)
+    SCHEDULE_HORIZON_DAYS: int = 60  # How far ahead next-free-slot searches look
+    
+    # Patient Context
+    PATIENT_CONTEXT_MAX_TOKENS: int = 200  # Budget for the clinical summary added to AI prompts
+    PATIENT_CONTEXT_RECENT_DIAGNOSES: int = 5
+    PATIENT_CONTEXT_CACHE_SIZE: int = 4096  # Patients whose summaries are kept per process
+    
+    # Knowledge Retrieval
+    KNOWLEDGE_INDEX_PATH: str = "./knowledge_index.bin"  # Built on startup when missing or stale
+    KNOWLEDGE_SOURCES: str = ""  # Extra comma-separated .md/.txt guideline files or directories
+    KNOWLEDGE_EMBEDDING_DIM: int = 1024
+    KNOWLEDGE_TOP_K: int = 3  # Reference snippets per prompt, at most
+    KNOWLEDGE_MIN_SCORE: float = 0.15  # Cosine similarity below which a snippet is left out
+    KNOWLEDGE_NPROBE: int = 4  # IVF lists scanned per search
+    KNOWLEDGE_MAX_TOKENS: int = 300  # Budget for the snippets added to a prompt
+    
+    # Admin
+    ADMIN_EMAILS: str = ""  # Comma-separated accounts allowed on /api/admin
     
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
@@ -1,15 +1,16 @@
 """
 Bisheshoggo AI - Database Configuration with SQLAlchemy + SQLite
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 from .config import settings
+from .tracing import start_span
 
 # Create SQLite engine
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False},  # Required for SQLite
-    echo=settings.DEBUG
+    echo=settings.SQL_ECHO
 )
 
 # Create session factory
@@ -22,15 +23,40 @@ Base = declarative_base()
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    # Not attached: FastAPI may resume this generator in another thread
+    with start_span("db.session", {"db.system": "sqlite"}, attach=False):
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def add_missing_columns():
+    """
+    create_all never alters existing tables: add nullable columns introduced
+    since a database file was created, so older files keep working.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present and column.nullable and column.server_default is None:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
 
 
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables, collection version tracking and the history search index"""
     from . import models  # Import models to register them
+    from .http_cache import track_collection_versions
+    from .history_search import history_index
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    track_collection_versions(SessionLocal)
+    history_index.install(engine, SessionLocal)
 
 
@@ -0,0 +1,344 @@
+"""
+Bisheshoggo AI - Drug Dictionary
+Local brand → generic → class mappings for medicines sold in Bangladesh, with a
+trigram fuzzy-match index so OCR'd or hand-typed names ("Napa 500mg", "Losectl",
+"Seclo 20") resolve to a canonical generic without asking the LLM.
+
+Every match says how it was made: "exact" (the name, or its leading words, is a
+brand or generic in the tables) or "fuzzy" (a close spelling). Fuzzy matches are
+guesses; callers show them as such and never store or act on them as the generic.
+"""
+import re
+from functools import lru_cache
+from .metrics import register_cache
+
+# ── Drug classes ─────────────────────────────────────────────────
+# generic name -> therapeutic class
+GENERIC_CLASSES = {
+    "paracetamol": "analgesic/antipyretic",
+    "caffeine": "stimulant",
+    "ibuprofen": "NSAID",
+    "diclofenac": "NSAID",
+    "naproxen": "NSAID",
+    "aceclofenac": "NSAID",
+    "etoricoxib": "NSAID (COX-2 inhibitor)",
+    "tolfenamic acid": "NSAID",
+    "aspirin": "antiplatelet/NSAID",
+    "tramadol": "opioid analgesic",
+    "omeprazole": "proton pump inhibitor",
+    "esomeprazole": "proton pump inhibitor",
+    "pantoprazole": "proton pump inhibitor",
+    "rabeprazole": "proton pump inhibitor",
+    "ranitidine": "H2 blocker",
+    "domperidone": "antiemetic/prokinetic",
+    "ondansetron": "antiemetic",
+    "oral rehydration salts": "rehydration",
+    "zinc": "mineral supplement",
+    "chlorpheniramine": "antihistamine",
+    "fexofenadine": "antihistamine",
+    "cetirizine": "antihistamine",
+    "loratadine": "antihistamine",
+    "montelukast": "leukotriene receptor antagonist",
+    "salbutamol": "bronchodilator (beta-2 agonist)",
+    "prednisolone": "corticosteroid",
+    "amoxicillin": "penicillin antibiotic",
+    "flucloxacillin": "penicillin antibiotic",
+    "azithromycin": "macrolide antibiotic",
+    "clarithromycin": "macrolide antibiotic",
+    "ciprofloxacin": "fluoroquinolone antibiotic",
+    "levofloxacin": "fluoroquinolone antibiotic",
+    "cefixime": "cephalosporin antibiotic",
+    "cefuroxime": "cephalosporin antibiotic",
+    "ceftriaxone": "cephalosporin antibiotic",
+    "metronidazole": "nitroimidazole antimicrobial",
+    "doxycycline": "tetracycline antibiotic",
+    "albendazole": "anthelmintic",
+    "amlodipine": "calcium channel blocker",
+    "losartan": "angiotensin receptor blocker",
+    "bisoprolol": "beta blocker",
+    "atenolol": "beta blocker",
+    "atorvastatin": "statin",
+    "rosuvastatin": "statin",
+    "clopidogrel": "antiplatelet",
+    "warfarin": "anticoagulant",
+    "metformin": "biguanide antidiabetic",
+    "gliclazide": "sulfonylurea antidiabetic",
+    "glimepiride": "sulfonylurea antidiabetic",
+    "levothyroxine": "thyroid hormone",
+    "calcium carbonate": "mineral supplement",
+    "vitamin d3": "vitamin supplement",
+    "vitamin b complex": "vitamin supplement",
+    "ferrous sulfate": "iron supplement",
+    "folic acid": "vitamin supplement",
+}
+
+# ── Brand table ──────────────────────────────────────────────────
+# brand name (lower case) -> generic component(s)
+BRAND_GENERICS = {
+    "napa": ("paracetamol",),
+    "napa extra": ("paracetamol", "caffeine"),
+    "napa extend": ("paracetamol",),
+    "ace": ("paracetamol",),
+    "ace plus": ("paracetamol", "caffeine"),
+    "renova": ("paracetamol",),
+    "fast": ("paracetamol",),
+    "xpa": ("paracetamol",),
+    "inflam": ("ibuprofen",),
+    "clofenac": ("diclofenac",),
+    "voltalin": ("diclofenac",),
+    "naprosyn": ("naproxen",),
+    "flexi": ("aceclofenac",),
+    "etorix": ("etoricoxib",),
+    "tufnil": ("tolfenamic acid",),
+    "ecosprin": ("aspirin",),
+    "disprin": ("aspirin",),
+    "anadol": ("tramadol",),
+    "seclo": ("omeprazole",),
+    "losectil": ("omeprazole",),
+    "sergel": ("esomeprazole",),
+    "maxpro": ("esomeprazole",),
+    "nexum": ("esomeprazole",),
+    "esonix": ("esomeprazole",),
+    "pantonix": ("pantoprazole",),
+    "rabeca": ("rabeprazole",),
+    "neoceptin r": ("ranitidine",),
+    "motigut": ("domperidone",),
+    "omidon": ("domperidone",),
+    "emistat": ("ondansetron",),
+    "orsaline n": ("oral rehydration salts",),
+    "orsaline": ("oral rehydration salts",),
+    "xinc": ("zinc",),
+    "histacin": ("chlorpheniramine",),
+    "fexo": ("fexofenadine",),
+    "telfast": ("fexofenadine",),
+    "alatrol": ("cetirizine",),
+    "atrizin": ("cetirizine",),
+    "loratin": ("loratadine",),
+    "monas": ("montelukast",),
+    "montene": ("montelukast",),
+    "sultolin": ("salbutamol",),
+    "ventolin": ("salbutamol",),
+    "cortan": ("prednisolone",),
+    "moxacil": ("amoxicillin",),
+    "tycil": ("amoxicillin",),
+    "phylopen": ("flucloxacillin",),
+    "zimax": ("azithromycin",),
+    "azithrocin": ("azithromycin",),
+    "klaricid": ("clarithromycin",),
+    "ciprocin": ("ciprofloxacin",),
+    "neofloxin": ("ciprofloxacin",),
+    "levoking": ("levofloxacin",),
+    "cef 3": ("cefixime",),
+    "triocim": ("cefixime",),
+    "kilbac": ("cefuroxime",),
+    "ceftron": ("ceftriaxone",),
+    "filmet": ("metronidazole",),
+    "amodis": ("metronidazole",),
+    "flagyl": ("metronidazole",),
+    "doxicap": ("doxycycline",),
+    "alben": ("albendazole",),
+    "amdocal": ("amlodipine",),
+    "camlodin": ("amlodipine",),
+    "angilock": ("losartan",),
+    "losart": ("losartan",),
+    "bislol": ("bisoprolol",),
+    "concor": ("bisoprolol",),
+    "tenoren": ("atenolol",),
+    "atova": ("atorvastatin",),
+    "rosutin": ("rosuvastatin",),
+    "anclog": ("clopidogrel",),
+    "warin": ("warfarin",),
+    "comet": ("metformin",),
+    "diamicron": ("gliclazide",),
+    "secrin": ("glimepiride",),
+    "thyrox": ("levothyroxine",),
+    "calbo d": ("calcium carbonate", "vitamin d3"),
+    "neuro b": ("vitamin b complex",),
+    "fefol": ("ferrous sulfate", "folic acid"),
+}
+
+FUZZY_MATCH_THRESHOLD = 0.7
+# A fuzzy match must be about as long as the text it matched: stops "vitamin" -> "vitamin d3"
+# and "acerdil" -> "ace" riding on a shared prefix
+FUZZY_MIN_LENGTH_RATIO = 0.75
+# Leading words ("seclo" of "seclo 20") count as an exact name only if they keep this much of the text
+PREFIX_MIN_COVERAGE = 0.5
+
+_STRENGTH_RE = re.compile(r"\b\d+(\.\d+)?\s*(mg|mcg|g|ml|iu|%)\b", re.IGNORECASE)
+_FORM_RE = re.compile(
+    r"\b(tab|tablet|tablets|cap|capsule|capsules|syp|syrup|susp|suspension|inj|injection|"
+    r"drop|drops|cream|gel|sachet|er|sr|xr|dr|mups)\b\.?",
+    re.IGNORECASE,
+)
+_PAREN_RE = re.compile(r"\(([^)]*)\)")
+
+
+def _normalize(text: str) -> str:
+    """Lower-case and collapse punctuation/whitespace so "Cef-3" == "cef 3"."""
+    text = re.sub(r"[^\w\s+]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted trigram index with Dice-coefficient scoring."""
+
+    def __init__(self, terms):
+        self._terms = list(terms)
+        self._grams = [_trigrams(t) for t in self._terms]
+        self._postings = {}
+        for term_id, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(term_id)
+
+    def search(self, text: str, limit: int = 1):
+        """Return up to ``limit`` (term, score) pairs, best first."""
+        query = _trigrams(text)
+        overlap = {}
+        for gram in query:
+            for term_id in self._postings.get(gram, ()):
+                overlap[term_id] = overlap.get(term_id, 0) + 1
+
+        scored = [
+            (self._terms[term_id], 2.0 * hits / (len(query) + len(self._grams[term_id])))
+            for term_id, hits in overlap.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+
+# Single index over brands and generics; built once at import (a few hundred µs)
+_brand_index = TrigramIndex(list(BRAND_GENERICS) + list(GENERIC_CLASSES))
+
+
+def _entry(raw: str, term: str, score: float, match: str, strength: str = None):
+    if term in BRAND_GENERICS:
+        brand, components = term, BRAND_GENERICS[term]
+    else:
+        brand, components = None, (term,)
+    return {
+        "input": raw,
+        "brand": brand.title() if brand else None,
+        "generic": " + ".join(components),
+        "components": list(components),
+        "drug_class": ", ".join(dict.fromkeys(GENERIC_CLASSES.get(c, "unknown") for c in components)),
+        "strength": strength,
+        "match": match,
+        "match_score": round(score, 2),
+    }
+
+
+def _candidates(raw: str):
+    """Yield lookup keys for a free-text medicine name, most specific first."""
+    inner = _PAREN_RE.findall(raw)
+    outer = _PAREN_RE.sub(" ", raw)
+    for text in [outer, *inner]:
+        text = _normalize(_FORM_RE.sub(" ", _STRENGTH_RE.sub(" ", text)))
+        if not text:
+            continue
+        yield text
+        words = text.split()
+        # "napa extra 500" -> "napa extra", "napa"
+        for n in range(len(words) - 1, 0, -1):
+            prefix = " ".join(words[:n])
+            if len(prefix) >= PREFIX_MIN_COVERAGE * len(text):
+                yield prefix
+
+
+@lru_cache(maxsize=4096)
+def canonicalize_medicine(raw: str):
+    """
+    Resolve a free-text medicine name to its generic and class.
+    Returns None when nothing in the dictionary is close enough; otherwise
+    the entry's "match" is "exact" or "fuzzy" (see the module docstring).
+    """
+    if not raw or not raw.strip():
+        return None
+
+    strength_match = _STRENGTH_RE.search(raw)
+    strength = strength_match.group(0).replace(" ", "").lower() if strength_match else None
+
+    candidates = list(dict.fromkeys(_candidates(raw)))
+
+    # Exact hits first: plain dict lookups
+    for key in candidates:
+        if key in BRAND_GENERICS or key in GENERIC_CLASSES:
+            return _entry(raw, key, 1.0, "exact", strength)
+
+    # Fuzzy fallback for OCR noise and misspellings
+    best_term, best_score = None, 0.0
+    for key in candidates:
+        for term, score in _brand_index.search(key):
+            if min(len(key), len(term)) < FUZZY_MIN_LENGTH_RATIO * max(len(key), len(term)):
+                continue
+            if score > best_score:
+                best_term, best_score = term, score
+    if best_term and best_score >= FUZZY_MATCH_THRESHOLD:
+        return _entry(raw, best_term, best_score, "fuzzy", strength)
+    return None
+
+
+register_cache("drug_dictionary", lambda: canonicalize_medicine.cache_info()[:2])
+
+
+# ── Prescription helpers ─────────────────────────────────────────
+def iter_prescription_items(prescriptions):
+    """
+    Yield prescription entries as dicts with at least a "name" key.
+    Accepts the shapes the app produces: a list of OCR medicines, a dict with a
+    "medicines" list, a {name: details} mapping, or plain strings.
+    """
+    if not prescriptions:
+        return
+    if isinstance(prescriptions, dict):
+        if isinstance(prescriptions.get("medicines"), list):
+            prescriptions = prescriptions["medicines"]
+        else:
+            prescriptions = [
+                {"name": name, **(details if isinstance(details, dict) else {"dosage": str(details)})}
+                for name, details in prescriptions.items()
+            ]
+    for item in prescriptions:
+        if isinstance(item, str):
+            yield {"name": item}
+        elif isinstance(item, dict):
+            name = item.get("name") or item.get("medicine") or ""
+            yield {**item, "name": str(name)}
+
+
+def exact_generic(raw: str):
+    """Generic name of ``raw`` if it is an exact dictionary match, else None (fuzzy guesses included)."""
+    match = canonicalize_medicine(raw)
+    return match["generic"] if match and match["match"] == "exact" else None
+
+
+def canonicalize_prescriptions(prescriptions):
+    """Attach dictionary matches to each prescription entry."""
+    return [
+        {**item, "canonical": canonicalize_medicine(item["name"])}
+        for item in iter_prescription_items(prescriptions)
+    ]
+
+
+def format_prescriptions_for_prompt(canonical_items: list) -> str:
+    """
+    Render canonicalized prescriptions as one compact line per medicine.
+    Fuzzy matches are labelled as unverified so the model treats them as a hint.
+    """
+    lines = []
+    for item in canonical_items:
+        match = item.get("canonical")
+        label = item["name"]
+        if match and match["match"] == "exact":
+            label += f" = {match['generic']} [{match['drug_class']}]"
+        elif match:
+            label += f" (unverified spelling match, possibly {match['generic']} [{match['drug_class']}])"
+        details = ", ".join(
+            str(item[key]) for key in ("dosage", "frequency", "duration") if item.get(key)
+        )
+        lines.append(f"- {label}" + (f"; {details}" if details else ""))
+    return "\n".join(lines) or "- None listed"
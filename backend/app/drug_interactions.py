@@ -0,0 +1,175 @@
+"""
+Bisheshoggo AI - Drug Interaction Engine
+Deterministic drug-drug interaction checks over a sparse generic x generic
+matrix, built once at startup from the rules below. Known interactions are
+answered here; the LLM is only asked about whatever this table doesn't cover.
+"""
+import logging
+import threading
+from itertools import combinations
+from .drug_dictionary import GENERIC_CLASSES
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_LEVELS = ("minor", "moderate", "major")
+
+# ── Drug groups (for class-wide rules) ───────────────────────────
+DRUG_GROUPS = {
+    "nsaids": ("ibuprofen", "diclofenac", "naproxen", "aceclofenac", "etoricoxib", "tolfenamic acid"),
+    "ppis": ("omeprazole", "esomeprazole", "pantoprazole", "rabeprazole"),
+    "antihistamines": ("chlorpheniramine", "fexofenadine", "cetirizine", "loratadine"),
+    "fluoroquinolones": ("ciprofloxacin", "levofloxacin"),
+    "macrolides": ("azithromycin", "clarithromycin"),
+    "statins": ("atorvastatin", "rosuvastatin"),
+    "beta_blockers": ("bisoprolol", "atenolol"),
+    "sulfonylureas": ("gliclazide", "glimepiride"),
+    "polyvalent_cations": ("calcium carbonate", "zinc", "ferrous sulfate"),
+}
+
+# ── Interaction rules ────────────────────────────────────────────
+# (drug or @group, drug or @group, severity, description)
+INTERACTION_RULES = [
+    ("warfarin", "aspirin", "major", "greatly increased bleeding risk"),
+    ("warfarin", "@nsaids", "major", "increased bleeding risk, especially GI bleeding"),
+    ("warfarin", "clopidogrel", "major", "increased bleeding risk"),
+    ("warfarin", "metronidazole", "major", "raises INR; risk of serious bleeding"),
+    ("warfarin", "@fluoroquinolones", "moderate", "may raise INR; monitor for bleeding"),
+    ("warfarin", "@macrolides", "moderate", "may raise INR; monitor for bleeding"),
+    ("warfarin", "paracetamol", "minor", "regular high doses may raise INR"),
+    ("clopidogrel", "omeprazole", "moderate", "reduces antiplatelet effect of clopidogrel"),
+    ("clopidogrel", "esomeprazole", "moderate", "reduces antiplatelet effect of clopidogrel"),
+    ("clopidogrel", "aspirin", "moderate", "additive bleeding risk; use only if prescribed together"),
+    ("clopidogrel", "@nsaids", "moderate", "increased bleeding risk"),
+    ("aspirin", "@nsaids", "moderate", "GI bleeding risk; ibuprofen may blunt aspirin's heart protection"),
+    ("@nsaids", "@nsaids", "moderate", "two NSAIDs together add stomach and kidney risk without extra benefit"),
+    ("@nsaids", "losartan", "moderate", "reduces blood pressure control and may harm kidneys"),
+    ("@nsaids", "prednisolone", "moderate", "increased risk of stomach ulcer and bleeding"),
+    ("@fluoroquinolones", "prednisolone", "moderate", "increased risk of tendon rupture"),
+    ("@fluoroquinolones", "@polyvalent_cations", "moderate", "antibiotic absorption reduced; take 2 hours apart"),
+    ("@fluoroquinolones", "@sulfonylureas", "moderate", "risk of low or high blood sugar"),
+    ("@fluoroquinolones", "domperidone", "moderate", "QT prolongation risk"),
+    ("doxycycline", "@polyvalent_cations", "moderate", "antibiotic absorption reduced; take 2 hours apart"),
+    ("levothyroxine", "@polyvalent_cations", "moderate", "thyroxine absorption reduced; take 4 hours apart"),
+    ("levothyroxine", "@ppis", "minor", "may reduce thyroxine absorption"),
+    ("clarithromycin", "atorvastatin", "major", "risk of severe muscle damage (rhabdomyolysis)"),
+    ("clarithromycin", "domperidone", "major", "dangerous QT prolongation"),
+    ("clarithromycin", "amlodipine", "moderate", "increased amlodipine levels; low blood pressure"),
+    ("clarithromycin", "@sulfonylureas", "moderate", "risk of low blood sugar"),
+    ("azithromycin", "domperidone", "moderate", "QT prolongation risk"),
+    ("ondansetron", "domperidone", "moderate", "QT prolongation risk"),
+    ("ondansetron", "tramadol", "moderate", "serotonin syndrome risk; tramadol may work less well"),
+    ("@beta_blockers", "salbutamol", "moderate", "beta blocker can oppose the bronchodilator"),
+    ("@ppis", "@ppis", "minor", "duplicate acid suppressants; one is enough"),
+    ("@antihistamines", "@antihistamines", "minor", "duplicate antihistamines; extra drowsiness"),
+    ("@statins", "@statins", "moderate", "duplicate statins; muscle damage risk"),
+    ("@beta_blockers", "@beta_blockers", "major", "duplicate beta blockers; very slow heart rate"),
+    ("@sulfonylureas", "@sulfonylureas", "major", "duplicate sulfonylureas; severe low blood sugar"),
+]
+
+# ── Sparse matrix state (singleton) ──────────────────────────────
+_generic_ids = {}
+_generic_names = []
+_matrix = {}  # i * n + j (i < j) -> (severity index, description)
+_matrix_lock = threading.Lock()
+
+
+def _expand(term: str):
+    if term.startswith("@"):
+        return DRUG_GROUPS[term[1:]]
+    return (term,)
+
+
+def _key(i: int, j: int) -> int:
+    if i > j:
+        i, j = j, i
+    return i * len(_generic_names) + j
+
+
+def load_interaction_matrix():
+    """Build the interaction matrix. Safe to call more than once."""
+    with _matrix_lock:
+        if _matrix:
+            return len(_matrix)
+
+        names = sorted(set(GENERIC_CLASSES) | {d for group in DRUG_GROUPS.values() for d in group})
+        _generic_names[:] = names
+        _generic_ids.update({name: i for i, name in enumerate(names)})
+
+        for left, right, severity, description in INTERACTION_RULES:
+            level = SEVERITY_LEVELS.index(severity)
+            for a in _expand(left):
+                for b in _expand(right):
+                    if a == b:
+                        continue
+                    key = _key(_generic_ids[a], _generic_ids[b])
+                    # Keep the most severe rule when several cover the same pair
+                    if key not in _matrix or _matrix[key][0] < level:
+                        _matrix[key] = (level, description)
+
+        logger.info("Loaded %d interacting pairs over %d generics", len(_matrix), len(names))
+        return len(_matrix)
+
+
+def check_interactions(medicines: list):
+    """
+    Check every pair in a prescription.
+    ``medicines`` is a list of (label, [generic components]) tuples; returns
+    interaction dicts sorted most severe first.
+    """
+    if not _matrix:
+        load_interaction_matrix()
+
+    findings = []
+    for (label_a, generics_a), (label_b, generics_b) in combinations(medicines, 2):
+        for a in generics_a:
+            for b in generics_b:
+                if a == b:
+                    findings.append({
+                        "drugs": [label_a, label_b],
+                        "generics": [a, b],
+                        "severity": "major" if a == "paracetamol" else "moderate",
+                        "description": f"both contain {a}; risk of double dosing",
+                    })
+                    continue
+                i, j = _generic_ids.get(a), _generic_ids.get(b)
+                if i is None or j is None:
+                    continue
+                hit = _matrix.get(_key(i, j))
+                if hit:
+                    findings.append({
+                        "drugs": [label_a, label_b],
+                        "generics": [a, b],
+                        "severity": SEVERITY_LEVELS[hit[0]],
+                        "description": hit[1],
+                    })
+
+    findings.sort(key=lambda f: SEVERITY_LEVELS.index(f["severity"]), reverse=True)
+    return findings
+
+
+def interactions_for_prescriptions(canonical_items: list):
+    """
+    Run ``check_interactions`` over output of ``canonicalize_prescriptions``.
+    Only exact dictionary matches are checked; a fuzzy spelling match is a
+    guess, so any interaction it implies is left for the model to judge.
+    """
+    medicines = [
+        (item["name"], item["canonical"]["components"])
+        for item in canonical_items
+        if item.get("canonical") and item["canonical"]["match"] == "exact"
+    ]
+    return check_interactions(medicines)
+
+
+def format_interaction_alert(finding: dict) -> str:
+    """One-line alert text in the style of ``interactionAlerts``."""
+    return f"{finding['severity'].upper()}: {finding['drugs'][0]} + {finding['drugs'][1]} - {finding['description']}"
+
+
+def merge_interaction_alerts(known: list, model_alerts) -> list:
+    """Deterministic alerts first, then any extra ones the model reported."""
+    alerts = [format_interaction_alert(f) for f in known]
+    for alert in model_alerts or []:
+        if isinstance(alert, str) and alert not in alerts:
+            alerts.append(alert)
+    return alerts
@@ -0,0 +1,148 @@
+"""
+Bisheshoggo AI - Facility Directory
+Process-local, indexed copy of the medical facility table.
+
+Facilities change a few times a year, yet every listing and detail lookup
+used to hit SQLite. The directory is loaded at startup into an immutable
+snapshot (rows plus id/district/division/type indexes) and swapped
+atomically on refresh:
+
+  * write-through: create_facility refreshes it after committing;
+  * version bump: at most every FACILITY_DIRECTORY_CHECK_SECONDS a request
+    compares the "facilities" collection version (see http_cache) with the
+    one the snapshot was built from, catching writes made by other workers
+    or by the seed script.
+
+Listing bodies are serialized once per snapshot, filter combination and
+wire format (JSON or MessagePack).
+Conditional GETs of the listing are answered by ConditionalGetMiddleware,
+whose version read also forces a reload when the snapshot is older than it;
+single facilities carry a content-derived ETag.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from . import read_models
+from .config import settings
+from .database import SessionLocal
+from .http_cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+_BODY_CACHE_SIZE = 256  # filter combinations are user-supplied; keep the cache bounded
+
+
+def _stamp(db: Session) -> tuple:
+    """Facility collection version; bumped by every ORM insert, update or delete"""
+    return get_versions(db, [("facilities", "")])[("facilities", "")]
+
+
+class _Snapshot:
+    """Immutable facility rows plus lookup indexes; never mutated after construction."""
+
+    def __init__(self, rows: List[read_models.FacilityRow], stamp: tuple):
+        self.stamp = stamp
+        self.by_id: Dict[str, read_models.FacilityRow] = {row.id: row for row in rows}
+        self.active: List[read_models.FacilityRow] = [row for row in rows if row.is_active]
+        by_district, by_division, by_type = defaultdict(list), defaultdict(list), defaultdict(list)
+        for row in self.active:  # already in name order, so every index list is too
+            by_district[row.district].append(row)
+            by_division[row.division].append(row)
+            by_type[row.facility_type.value].append(row)
+        self.by_district = dict(by_district)
+        self.by_division = dict(by_division)
+        self.by_type = dict(by_type)
+        self.bodies: Dict[tuple, bytes] = {}
+
+
+class FacilityDirectory:
+    """Indexed, atomically refreshed view of all facilities."""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def refresh(self, db: Session = None):
+        """Reload every facility from the database and swap in a new snapshot."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            with self._lock:
+                stamp = _stamp(db)
+                rows = read_models.list_facilities(db, active_only=False)
+                self._snapshot = _Snapshot(rows, stamp)
+                self._checked_at = time.monotonic()
+        finally:
+            if own_session:
+                db.close()
+        logger.info("Facility directory loaded", extra={"facilities": len(rows), "version": stamp[0]})
+
+    def ensure_fresh(self, db: Session, force: bool = False, seen: tuple = None):
+        """
+        Reload if another writer bumped the table since the last check.
+        ``seen`` is a facilities (version, updated_at) already read for this
+        request; a snapshot older than it is reloaded regardless of the interval.
+        """
+        if self._snapshot is None:
+            return self.refresh(db)
+        if seen is not None and seen[0] > self._snapshot.stamp[0]:
+            return self.refresh(db)
+        if not force and time.monotonic() - self._checked_at < settings.FACILITY_DIRECTORY_CHECK_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+        if _stamp(db) != self._snapshot.stamp:
+            self.refresh(db)
+
+    def get(self, facility_id: str) -> Optional[read_models.FacilityRow]:
+        """Any facility (active or not) by id."""
+        return self._snapshot.by_id.get(facility_id)
+
+    def etag_for(self, row: read_models.FacilityRow) -> str:
+        return '"' + hashlib.sha1(repr(row).encode("utf-8")).hexdigest()[:20] + '"'
+
+    def query(self, facility_type: str = None, district: str = None, division: str = None) -> List[read_models.FacilityRow]:
+        """Active facilities matching every given filter, in name order."""
+        snapshot = self._snapshot
+        candidates = [snapshot.active]
+        if facility_type:
+            candidates.append(snapshot.by_type.get(facility_type, []))
+        if district:
+            candidates.append(snapshot.by_district.get(district, []))
+        if division:
+            candidates.append(snapshot.by_division.get(division, []))
+        # Walk the most selective index and check the remaining filters per row
+        rows = min(candidates, key=len)
+        return [
+            row for row in rows
+            if (not facility_type or row.facility_type.value == facility_type)
+            and (not district or row.district == district)
+            and (not division or row.division == division)
+        ]
+
+    def listing(self, render, facility_type: str = None, district: str = None, division: str = None,
+                media_type: str = "application/json") -> bytes:
+        """
+        Body of a filtered listing. ``render`` turns rows into bytes of
+        ``media_type`` and runs once per snapshot, filter combination and
+        media type.
+        """
+        snapshot = self._snapshot
+        key = (facility_type, district, division, media_type)
+        body = snapshot.bodies.get(key)
+        if body is None:
+            body = render(self.query(facility_type, district, division))
+            if len(snapshot.bodies) < _BODY_CACHE_SIZE:
+                snapshot.bodies[key] = body
+        return body
+
+
+facility_directory = FacilityDirectory()
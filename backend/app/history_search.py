@@ -0,0 +1,304 @@
+"""
+Bisheshoggo AI - Medical History Search
+SQLite FTS5 index over medical records, symptom checks and consultations.
+
+Each searchable entity becomes one row of ``history_search_docs``: a title,
+a body and an ``owners`` field holding a token per user allowed to see it
+(the patient and, where there is one, the provider). ``history_fts`` is an
+external-content FTS5 table over those rows, and triggers keep the two in
+step. An after_flush hook upserts or deletes a document whenever a flush
+changes an indexed field, in the same transaction as the write, so the
+index is never behind a commit.
+
+Access control is part of the MATCH expression: the caller's owner token
+is intersected with the query terms inside FTS5, so only the caller's own
+documents are ranked. Ranking is bm25 with titles weighted over bodies.
+
+Tokenization is unicode61 with Bengali vowel signs, virama and the zero
+width (non-)joiners declared token characters. Without them unicode61
+splits Bengali words at every vowel sign. Query terms of three or more
+characters match as prefixes, so "জ্বর" also finds inflected forms such as
+"জ্বরে". FTS5 keeps prefix indexes for 3 to 6 characters, which cover most
+such stems; without them a common prefix merges tens of thousands of
+postings before the owner filter can skip any. Writes that bypass the ORM
+are not indexed until the next startup backfill.
+"""
+import html
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import column, event, exists, inspect, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Bengali combining marks plus ZWNJ/ZWJ, kept inside tokens
+_BENGALI_MARKS = "".join(map(chr, (
+    0x0981, 0x0982, 0x0983, 0x09BC, *range(0x09BE, 0x09C5), 0x09C7, 0x09C8,
+    0x09CB, 0x09CC, 0x09CD, 0x09D7, 0x09E2, 0x09E3, 0x200C, 0x200D,
+)))
+_TOKEN = re.compile(r"[\w\u0980-\u09FF\u200c\u200d]+")
+_PREFIX_MIN_CHARS = 3
+_PREFIX_INDEXES = "3 4 5 6"  # prefix lengths (in characters) FTS5 keeps ready-merged doclists for
+_SNIPPET_TOKENS = 16
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"  # escaped, then swapped for <mark> tags
+_WEIGHTS = "2.0, 1.0, 0.0"  # bm25 weights: title, body, owners
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS history_search_docs (
+        rowid INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        doc_id TEXT NOT NULL,
+        title TEXT,
+        body TEXT,
+        owners TEXT NOT NULL,
+        occurred_at TEXT,
+        UNIQUE (kind, doc_id)
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+        title, body, owners,
+        content='history_search_docs', content_rowid='rowid', prefix='{_PREFIX_INDEXES}',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '{_BENGALI_MARKS}'"
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_docs_ai AFTER INSERT ON history_search_docs BEGIN
+        INSERT INTO history_fts (rowid, title, body, owners) VALUES (new.rowid, new.title, new.body, new.owners);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_docs_ad AFTER DELETE ON history_search_docs BEGIN
+        INSERT INTO history_fts (history_fts, rowid, title, body, owners)
+        VALUES ('delete', old.rowid, old.title, old.body, old.owners);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_docs_au AFTER UPDATE ON history_search_docs BEGIN
+        INSERT INTO history_fts (history_fts, rowid, title, body, owners)
+        VALUES ('delete', old.rowid, old.title, old.body, old.owners);
+        INSERT INTO history_fts (rowid, title, body, owners) VALUES (new.rowid, new.title, new.body, new.owners);
+    END
+    """,
+]
+
+_UPSERT = text("""
+    INSERT INTO history_search_docs (kind, doc_id, title, body, owners, occurred_at)
+    VALUES (:kind, :doc_id, :title, :body, :owners, :occurred_at)
+    ON CONFLICT (kind, doc_id) DO UPDATE SET title = excluded.title, body = excluded.body, owners = excluded.owners
+""")
+_DELETE = text("DELETE FROM history_search_docs WHERE kind = :kind AND doc_id = :doc_id")
+_DOCS = table("history_search_docs", column("kind"), column("doc_id"))
+
+
+def owner_token(user_id: str) -> str:
+    return "u" + user_id.replace("-", "").lower()
+
+
+def _flatten(value) -> List[str]:
+    """Text leaves of a JSON value (prescription lists, symptom arrays)"""
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [leaf for item in value.values() for leaf in _flatten(item)]
+    if isinstance(value, (list, tuple)):
+        return [leaf for item in value for leaf in _flatten(item)]
+    return [str(value)]
+
+
+def _join(*parts) -> Optional[str]:
+    return "\n".join(part for part in parts if part) or None
+
+
+def _medical_record(record: models.MedicalRecord) -> Tuple[Optional[str], Optional[str], tuple]:
+    return (
+        record.title,
+        _join(record.description, record.diagnosis, ", ".join(_flatten(record.prescriptions))),
+        (record.patient_id, record.provider_id),
+    )
+
+
+def _symptom_check(check: models.SymptomCheck) -> Tuple[Optional[str], Optional[str], tuple]:
+    return ", ".join(_flatten(check.symptoms)) or None, check.diagnosis, (check.user_id,)
+
+
+def _consultation(consultation: models.Consultation) -> Tuple[Optional[str], Optional[str], tuple]:
+    return consultation.symptoms, _join(consultation.diagnosis, consultation.notes), (consultation.patient_id, consultation.provider_id)
+
+
+class _Source(NamedTuple):
+    kind: str
+    document: Callable  # entity -> (title, body, owner user ids)
+    fields: Tuple[str, ...]  # attributes whose change re-indexes the entity
+
+
+# Entity -> how it is indexed
+SOURCES: Dict[type, _Source] = {
+    models.MedicalRecord: _Source(
+        "medical_record", _medical_record,
+        ("title", "description", "diagnosis", "prescriptions", "patient_id", "provider_id"),
+    ),
+    models.SymptomCheck: _Source("symptom_check", _symptom_check, ("symptoms", "diagnosis", "user_id")),
+    models.Consultation: _Source(
+        "consultation", _consultation, ("symptoms", "diagnosis", "notes", "patient_id", "provider_id"),
+    ),
+}
+KINDS = tuple(source.kind for source in SOURCES.values())
+
+
+def _document_params(source: _Source, obj, occurred_at: Optional[datetime]) -> dict:
+    title, body, owners = source.document(obj)
+    return {
+        "kind": source.kind,
+        "doc_id": obj.id,
+        "title": title,
+        "body": body,
+        "owners": " ".join(owner_token(user_id) for user_id in owners if user_id),
+        "occurred_at": occurred_at.isoformat() if occurred_at else None,
+    }
+
+
+def _index_changes(session: Session, flush_context):
+    upserts, deletes = [], []
+    for obj in session.new:
+        source = SOURCES.get(type(obj))
+        if source is not None:
+            # created_at is a server default, not loaded yet; this is close enough for display
+            upserts.append(_document_params(source, obj, datetime.now(timezone.utc)))
+    for obj in session.dirty:
+        source = SOURCES.get(type(obj))
+        if source is None:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in source.fields):
+            upserts.append(_document_params(source, obj, state.dict.get("created_at")))
+    for obj in session.deleted:
+        source = SOURCES.get(type(obj))
+        if source is not None:
+            deletes.append({"kind": source.kind, "doc_id": obj.id})
+    if not upserts and not deletes:
+        return
+    connection = session.connection()
+    if upserts:
+        connection.execute(_UPSERT, upserts)
+    if deletes:
+        connection.execute(_DELETE, deletes)
+
+
+def _match_expression(query: str, user_id: str, patient_id: Optional[str]) -> Optional[str]:
+    """FTS5 query for ``query``'s words within the documents ``user_id`` may see (and ``patient_id`` owns)"""
+    words = _TOKEN.findall(query.lower())
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' if len(word) >= _PREFIX_MIN_CHARS else f'"{word}"' for word in dict.fromkeys(words))
+    expression = f'owners : "{owner_token(user_id)}"'
+    if patient_id and patient_id != user_id:
+        expression += f' AND owners : "{owner_token(patient_id)}"'
+    return f"{expression} AND {{title body}} : ({terms})"
+
+
+def _highlighted(value: Optional[str]) -> Optional[str]:
+    """HTML-escape indexed text, then turn the match markers into <mark> tags"""
+    if value is None:
+        return None
+    return html.escape(value).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    id: str
+    title: Optional[str]
+    snippet: Optional[str]
+    score: float
+    occurred_at: Optional[str]
+
+
+class HistorySearchIndex:
+    """The FTS5 tables, their write hook and queries; unavailable where SQLite lacks FTS5."""
+
+    def __init__(self):
+        self.available = False
+
+    def install(self, engine, session_factory):
+        """Create the index tables and start indexing flushes of ``session_factory`` sessions."""
+        try:
+            with engine.begin() as connection:
+                for statement in _SCHEMA:
+                    connection.execute(text(statement))
+        except OperationalError as e:
+            logger.warning("Medical history search disabled, SQLite FTS5 unavailable: %s", e)
+            return
+        self.available = True
+        if not event.contains(session_factory, "after_flush", _index_changes):
+            event.listen(session_factory, "after_flush", _index_changes)
+
+    def backfill(self):
+        """Index entities written before the index existed (or behind its back)."""
+        if not self.available:
+            return
+        db = SessionLocal()
+        try:
+            for model, source in SOURCES.items():
+                # Only unindexed rows, and only the columns their document is built from
+                columns = [getattr(model, name) for name in ("id", "created_at", *source.fields)]
+                unindexed = ~exists().where(_DOCS.c.kind == source.kind, _DOCS.c.doc_id == model.id)
+                rows = db.execute(select(*columns).where(unindexed).execution_options(yield_per=500))
+                batch = [_document_params(source, row, row.created_at) for row in rows]
+                if batch:
+                    db.connection().execute(_UPSERT, batch)
+                    logger.info("Indexed %d %s documents for history search", len(batch), source.kind)
+            db.commit()
+        finally:
+            db.close()
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        user_id: str,
+        patient_id: str = None,
+        kinds: List[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[SearchHit]]:
+        """(total matches, one page of hits, best first)"""
+        expression = _match_expression(query, user_id, patient_id)
+        if expression is None:
+            return 0, []
+        params = {"match": expression, "offset": offset, "limit": limit}
+        kind_filter = ""
+        if kinds:
+            kind_filter = f"AND d.kind IN ({', '.join(f':kind{i}' for i in range(len(kinds)))})"
+            params.update({f"kind{i}": kind for i, kind in enumerate(kinds)})
+        matches = f"""
+            FROM history_fts JOIN history_search_docs AS d ON d.rowid = history_fts.rowid
+            WHERE history_fts MATCH :match {kind_filter}
+        """
+        if kinds:
+            total = db.execute(text(f"SELECT count(*) {matches}"), params).scalar()
+        else:
+            # The join only serves the kind filter; counting the FTS table alone is several times faster
+            total = db.execute(text("SELECT count(*) FROM history_fts WHERE history_fts MATCH :match"), params).scalar()
+        rows = db.execute(text(f"""
+            SELECT d.kind, d.doc_id, d.occurred_at,
+                   highlight(history_fts, 0, :open, :close) AS title,
+                   snippet(history_fts, 1, :open, :close, '…', {_SNIPPET_TOKENS}) AS snippet,
+                   bm25(history_fts, {_WEIGHTS}) AS rank
+            {matches}
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """), {**params, "open": _MARK_OPEN, "close": _MARK_CLOSE})
+        hits = [
+            SearchHit(row.kind, row.doc_id, _highlighted(row.title), _highlighted(row.snippet), -row.rank, row.occurred_at)
+            for row in rows
+        ]
+        return total, hits
+
+
+history_index = HistorySearchIndex()
@@ -0,0 +1,206 @@
+"""
+Bisheshoggo AI - HTTP Conditional Requests
+ETag / Last-Modified for read endpoints, backed by per-collection version stamps.
+
+Every ORM flush that touches a tracked entity bumps a (collection, scope)
+row in ``collection_versions`` inside the same transaction: scope is the
+owning user's id for per-user collections and '' for global ones. A GET on
+a registered collection path reads those few rows by primary key, derives a
+weak ETag from them, and answers 304 straight from the middleware when the
+client's If-None-Match (or If-Modified-Since) still matches, without running
+the route's query or serializing anything. Otherwise the route runs and the
+ETag and Last-Modified headers are attached to its 200.
+
+Writes that bypass the ORM (raw SQL, the sqlite3 shell) do not bump
+versions; clients then revalidate against stale tags until the next ORM write.
+"""
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from . import models
+from .auth import decode_token
+from .serialization import prefers_msgpack
+
+# (collection, per_user) stamps whose versions make up each path's ETag
+CACHED_COLLECTIONS: Dict[str, Tuple[Tuple[str, bool], ...]] = {
+    "/api/facilities": (("facilities", False),),
+    "/api/providers": (("providers", False), ("users", False)),
+    "/api/medical-records": (("medical_records", True), ("users", False)),
+    "/api/symptom-check": (("symptom_checks", True),),
+    "/api/profile": (("profile", True),),
+}
+
+
+def _user_keys(user, new: bool) -> list:
+    keys = [("profile", user.id)]
+    if not new:
+        # Names, phones and avatars appear in provider and record listings
+        keys.append(("users", ""))
+    return keys
+
+
+# Entity -> (collection, scope) stamps a change to it invalidates
+_TRACKED = {
+    models.MedicalFacility: lambda obj, new: [("facilities", "")],
+    models.ProviderProfile: lambda obj, new: [("providers", ""), ("profile", obj.user_id)],
+    models.PatientProfile: lambda obj, new: [("profile", obj.user_id)],
+    models.MedicalRecord: lambda obj, new: [("medical_records", obj.patient_id)],
+    models.SymptomCheck: lambda obj, new: [("symptom_checks", obj.user_id)],
+    models.Consultation: lambda obj, new: [("consultations", obj.patient_id)],
+    models.User: _user_keys,
+    models.ProviderSlot: lambda obj, new: [("provider_schedule", obj.provider_id)],
+}
+
+
+def _changed_keys(session: Session) -> set:
+    keys = set()
+    for objects, new in ((session.new, True), (session.dirty, False), (session.deleted, False)):
+        for obj in objects:
+            keys_for = _TRACKED.get(type(obj))
+            if keys_for is None or (objects is session.dirty and not session.is_modified(obj)):
+                continue
+            keys.update(keys_for(obj, new))
+    return keys
+
+
+def _bump_versions(session: Session, flush_context):
+    keys = _changed_keys(session)
+    if not keys:
+        return
+    now = datetime.now(timezone.utc)
+    table = models.CollectionVersion.__table__
+    connection = session.connection()
+    for collection, scope in sorted(keys):
+        stmt = insert(table).values(collection=collection, scope=scope, version=1, updated_at=now)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.collection, table.c.scope],
+            set_={"version": table.c.version + 1, "updated_at": now},
+        ))
+
+
+def track_collection_versions(session_factory):
+    """Bump collection versions on every flush of sessions from ``session_factory``."""
+    if not event.contains(session_factory, "after_flush", _bump_versions):
+        event.listen(session_factory, "after_flush", _bump_versions)
+
+
+def get_versions(db, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[int, Optional[datetime]]]:
+    """(version, updated_at) per key; (0, None) for collections never written."""
+    keys = list(keys)
+    table = models.CollectionVersion.__table__
+    rows = db.execute(select(table.c.collection, table.c.scope, table.c.version, table.c.updated_at).where(
+        or_(*(and_(table.c.collection == c, table.c.scope == s) for c, s in keys))
+    ))
+    found = {(row.collection, row.scope): (row.version, row.updated_at) for row in rows}
+    return {key: found.get(key, (0, None)) for key in keys}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: Optional[datetime]) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+class ConditionalGetMiddleware:
+    """Pure ASGI middleware answering 304 for unchanged collections in CACHED_COLLECTIONS."""
+
+    def __init__(self, app, session_factory, collections: Dict[str, Tuple[Tuple[str, bool], ...]] = None):
+        self.app = app
+        self.session_factory = session_factory
+        self.collections = collections or CACHED_COLLECTIONS
+        self._routes = {}
+
+    def _user_id(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        token_data = decode_token(token)
+        return token_data.user_id if token_data else None
+
+    def _validators(self, path: str, headers: Dict[bytes, bytes], query_string: bytes) -> Optional[Tuple[str, Optional[datetime], dict]]:
+        stamps = self.collections[path]
+        user_id = None
+        if any(per_user for _, per_user in stamps):
+            user_id = self._user_id(headers)
+            if user_id is None:
+                return None  # let the route answer 401
+        keys = [(collection, user_id if per_user else "") for collection, per_user in stamps]
+        db = self.session_factory()
+        try:
+            versions = get_versions(db, keys)
+        finally:
+            db.close()
+        wire_format = "msgpack" if prefers_msgpack(headers.get(b"accept", b"").decode("latin-1")) else "json"
+        fingerprint = repr((path, query_string, wire_format, user_id, sorted(versions.items())))
+        etag = 'W/"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20] + '"'
+        updated = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+        last_modified = max(updated).replace(tzinfo=timezone.utc) if updated else None
+        return etag, last_modified, versions
+
+    def _route(self, scope):
+        """The app's route for this path, so metrics and traces label short-circuited 304s like routed ones."""
+        path = scope["path"]
+        if path not in self._routes:
+            self._routes[path] = next((
+                route for route in getattr(scope.get("app"), "routes", ())
+                if getattr(route, "path", None) == path and "GET" in getattr(route, "methods", ())
+            ), None)
+        return self._routes[path]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["path"] not in self.collections:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        # JWT decode and the version lookup block; keep them off the event loop
+        validators = await asyncio.to_thread(self._validators, scope["path"], headers, scope.get("query_string", b""))
+        if validators is None:
+            return await self.app(scope, receive, send)
+        etag, last_modified, versions = validators
+        # Routes serving from a process-local copy read these to make sure the
+        # body they render is at least as new as the ETag attached to it
+        scope.setdefault("state", {})["collection_versions"] = versions
+
+        cache_headers = [(b"etag", etag.encode("latin-1")), (b"cache-control", b"private, no-cache")]
+        if last_modified is not None:
+            cache_headers.append((b"last-modified", format_datetime(last_modified, usegmt=True).encode("latin-1")))
+
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+        if etag_matches(if_none_match, etag) or (
+            not if_none_match and _not_modified_since(headers.get(b"if-modified-since", b"").decode("latin-1"), last_modified)
+        ):
+            route = self._route(scope)
+            if route is not None:
+                scope["route"] = route
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message["headers"] = list(message.get("headers", [])) + cache_headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,346 @@
+"""
+Bisheshoggo AI - Inference Backends
+Pluggable text-generation backends behind medgemma_service, selected by
+MEDGEMMA_INFERENCE_MODE:
+
+    local   MedGemma in this process (GPU)
+    remote  MedGemma in the inference daemon (inference_server.py)
+    stub    Deterministic offline stand-in: canned/templated outputs with
+            simulated prefill latency and token rate. Also replaces the Groq
+            client (get_groq_client), so every AI route runs without a GPU or
+            network - for load tests, profiling and CI.
+
+A backend implements ``generate`` and ``status``; register new ones with
+``register_backend``. ``generate`` blocks and is called from worker
+threads, so it must be thread-safe.
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from .config import settings
+from .inference_ipc import InferenceClient
+from .metrics import INFERENCE_SECONDS, TOKENS_GENERATED
+from .tracing import current_traceparent
+
+
+class InferenceBackend:
+    """Interface for MedGemma-compatible generation backends."""
+
+    name = ""
+
+    def generate(self, messages: list, temperature: float = 0.3, json_schema=None,
+                 endpoint: str = "chat", user_id: str = None) -> str:
+        """Return the completion for chat ``messages`` (constrained to ``json_schema`` if given)."""
+        raise NotImplementedError
+
+    def status(self) -> dict:
+        """Model state for /api/ai/medgemma/status; must include "loaded"."""
+        raise NotImplementedError
+
+    def token_budget_report(self) -> dict:
+        from .medgemma_service import _token_budget
+        return _token_budget.report()
+
+    def status_report(self) -> tuple:
+        """(status, token budget report); backends behind IPC answer both in one round trip."""
+        return self.status(), self.token_budget_report()
+
+
+class LocalBackend(InferenceBackend):
+    name = "local"
+
+    def __init__(self):
+        # Callers run in worker threads, but the GPU holds one model: generate one request at a time
+        self._gpu_lock = threading.Lock()
+
+    def generate(self, messages, temperature=0.3, json_schema=None, endpoint="chat", user_id=None):
+        from .medgemma_service import _generate_local
+        with self._gpu_lock:
+            return _generate_local(messages, temperature, json_schema, endpoint, user_id)
+
+    def status(self):
+        from .medgemma_service import _local_status
+        return _local_status()
+
+
+class RemoteBackend(InferenceBackend):
+    name = "remote"
+
+    def generate(self, messages, temperature=0.3, json_schema=None, endpoint="chat", user_id=None):
+        return InferenceClient().generate(
+            messages,
+            temperature=temperature,
+            json_schema=json_schema.__name__ if json_schema is not None else None,
+            endpoint=endpoint,
+            user_id=user_id,
+            traceparent=current_traceparent(),
+        )
+
+    def _daemon_status(self):
+        try:
+            return InferenceClient().status()
+        except Exception as e:
+            return {"loaded": False, "error": str(e), "attempted": True}
+
+    def status_report(self):
+        status = self._daemon_status()
+        token_budget = status.pop("token_budget", {})
+        return {**status, "inference": "remote"}, token_budget
+
+    def status(self):
+        return self.status_report()[0]
+
+    def token_budget_report(self):
+        return self.status_report()[1]
+
+
+# ── Stub backend ─────────────────────────────────────────────────
+_STUB_CHAT_REPLIES = (
+    "Based on what you describe, this is most likely a common viral illness. Rest, drink plenty of "
+    "clean water or oral saline (ORS), and take paracetamol for fever if needed. Please visit the "
+    "nearest Upazila Health Complex if the fever lasts more than three days, or at once if you notice "
+    "difficulty breathing, confusion, bleeding or a rash. বিশ্রাম নিন এবং প্রচুর পানি পান করুন।",
+    "Thank you for the details. Keep the medicine in a cool, dry place away from direct sunlight; a "
+    "clay pot with wet sand around it keeps it cooler when there is no refrigerator. Do not use it if "
+    "it changes colour or looks cloudy. For any doubt, a community health worker can check it for you.",
+    "Warning signs that need urgent care are: high fever that does not come down, severe abdominal "
+    "pain, repeated vomiting, bleeding from gums or nose, and extreme tiredness. If any of these "
+    "appear, go to the nearest hospital immediately. জরুরি লক্ষণ দেখা দিলে দ্রুত হাসপাতালে যান।",
+)
+
+_STUB_TRIAGE = (
+    ("Viral Fever", ["Viral Fever", "Dengue Fever", "Typhoid Fever"], "moderate", True),
+    ("Common Cold", ["Common Cold", "Allergic Rhinitis", "Sinusitis"], "low", False),
+    ("Acute Gastroenteritis", ["Acute Gastroenteritis", "Food Poisoning", "Cholera"], "high", True),
+    ("Tension Headache", ["Tension Headache", "Migraine", "Dehydration"], "low", False),
+)
+
+_STUB_OCR = {
+    "doctorName": "Dr. Stub Rahman, MBBS",
+    "date": "01/01/2026",
+    "diagnosis": "Viral Fever",
+    "medicines": [
+        {"name": "Napa 500mg (Paracetamol)", "dosage": "1 tablet", "frequency": "3 times daily", "duration": "5 days"},
+        {"name": "Seclo 20mg (Omeprazole)", "dosage": "1 capsule", "frequency": "Once daily before breakfast", "duration": "7 days"},
+        {"name": "Fexo 120mg (Fexofenadine)", "dosage": "1 tablet", "frequency": "Once at night", "duration": "5 days"},
+    ],
+    "instructions": "Drink plenty of water. Rest for 3 days.",
+    "rawText": "Rx\n1. Napa 500mg 1+1+1 x 5d\n2. Seclo 20mg 1+0+0 (a.c.) x 7d\n3. Fexo 120mg 0+0+1 x 5d",
+}
+
+
+def _prompt_text(messages: list) -> str:
+    parts = []
+    for msg in messages:
+        content = msg["content"]
+        if isinstance(content, list):
+            content = " ".join(c.get("text", "") for c in content if isinstance(c, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _listed_medicines(prompt: str) -> list:
+    """Medicine labels from the '- Brand = generic [class]; dose' lines our prompts use."""
+    section = re.search(r"MEDICINES[^\n]*\n((?:- [^\n]*\n?)+)", prompt)
+    if not section:
+        return []
+    names = []
+    for line in section.group(1).splitlines():
+        name = re.split(r" = |; ", line[2:], maxsplit=1)[0].strip()
+        if name and name != "None listed":
+            names.append(name)
+    return names
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StubBackend(InferenceBackend):
+    """
+    Offline backend with deterministic content and realistic timing.
+    Content depends only on the prompt; latency is drawn from lognormal
+    distributions around STUB_PREFILL_MS and STUB_TOKENS_PER_SECOND using a
+    generator seeded by STUB_SEED, so runs are reproducible.
+    """
+
+    name = "stub"
+
+    def __init__(self, prefill_ms: float = None, tokens_per_second: float = None,
+                 jitter: float = None, seed: int = None):
+        self.prefill_ms = settings.STUB_PREFILL_MS if prefill_ms is None else prefill_ms
+        self.tokens_per_second = settings.STUB_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+        self.jitter = settings.STUB_LATENCY_JITTER if jitter is None else jitter
+        self._rng = random.Random(settings.STUB_SEED if seed is None else seed)
+        self._rng_lock = threading.Lock()
+
+    # ── content ──
+    def render(self, prompt: str, endpoint: str, json_schema=None) -> str:
+        """Canned or templated completion for ``prompt``."""
+        pick = zlib.crc32(prompt.encode("utf-8"))
+        schema_name = json_schema.__name__ if json_schema is not None else endpoint
+        if schema_name in ("SymptomAnalysisOutput", "symptom_analysis"):
+            return json.dumps(self._triage(prompt, pick), ensure_ascii=False)
+        if schema_name in ("MedicineAnalysisOutput", "medicine_analysis"):
+            return json.dumps(self._medicine_review(prompt), ensure_ascii=False)
+        if endpoint == "ocr":
+            return json.dumps(_STUB_OCR, ensure_ascii=False)
+        return _STUB_CHAT_REPLIES[pick % len(_STUB_CHAT_REPLIES)]
+
+    def _triage(self, prompt: str, pick: int) -> dict:
+        diagnosis, conditions, urgency, see_doctor = _STUB_TRIAGE[pick % len(_STUB_TRIAGE)]
+        symptoms = re.search(r"SYMPTOMS: ([^\n]*)", prompt)
+        return {
+            "diagnosis": diagnosis,
+            "suggested_conditions": conditions,
+            "recommendations": (
+                f"Symptoms reported: {symptoms.group(1) if symptoms else 'not stated'}. Rest, drink oral "
+                "saline and monitor temperature. বিশ্রাম নিন ও পর্যাপ্ত পানি পান করুন।"
+            ),
+            "urgency_level": urgency,
+            "home_remedies": ["Oral saline (ORS)", "Warm water with honey and ginger"],
+            "warning_signs": ["Fever above 103°F", "Difficulty breathing", "Bleeding"],
+            "should_see_doctor": see_doctor,
+            "triage_reasoning": "Stub triage: deterministic template for offline testing.",
+            "follow_up": "Follow up in 3 days if not improving.",
+        }
+
+    def _medicine_review(self, prompt: str) -> dict:
+        return {
+            "suggestions": [
+                {
+                    "medicine": name,
+                    "reason": "Appropriate for the stated diagnosis at the prescribed dose.",
+                    "shouldTake": "YES - Continue taking",
+                    "alternatives": [],
+                    "precautions": ["Take after meals"],
+                    "interactions": [],
+                    "effectiveness": "moderate",
+                }
+                for name in _listed_medicines(prompt)
+            ],
+            "overallRecommendation": "Continue the prescribed course and review with a doctor if symptoms persist.",
+            "warnings": ["Do not exceed the prescribed dose."],
+            "interactionAlerts": [],
+        }
+
+    # ── timing ──
+    def _timings(self, tokens: int):
+        with self._rng_lock:
+            prefill_scale = self._rng.lognormvariate(0.0, self.jitter)
+            rate_scale = self._rng.lognormvariate(0.0, self.jitter / 2)
+        prefill = self.prefill_ms / 1000 * prefill_scale
+        per_token = 1.0 / (self.tokens_per_second * rate_scale) if self.tokens_per_second > 0 else 0.0
+        return prefill, per_token
+
+    def _complete(self, messages, json_schema, endpoint, user_id, budget):
+        text = self.render(_prompt_text(messages), endpoint, json_schema)
+        tokens = _estimate_tokens(text)
+        if budget:
+            # Exercise the same token budgeting/quota path as the real model
+            from .medgemma_service import _token_budget
+            max_new_tokens = _token_budget.budget_for(endpoint, user_id)
+            tokens = min(tokens, max_new_tokens)
+            _token_budget.record(endpoint, user_id, max_new_tokens, tokens)
+            TOKENS_GENERATED.inc(tokens, endpoint=endpoint)
+        return text, tokens
+
+    def _generate(self, messages, json_schema=None, endpoint="chat", user_id=None, budget=True):
+        text, tokens = self._complete(messages, json_schema, endpoint, user_id, budget)
+        prefill, per_token = self._timings(tokens)
+        # Blocking sleeps on purpose: like local MedGemma, this runs in a worker thread
+        time.sleep(prefill)
+        time.sleep(per_token * tokens)
+        if budget:
+            INFERENCE_SECONDS.observe(prefill, endpoint=endpoint, phase="prefill")
+            INFERENCE_SECONDS.observe(per_token * tokens, endpoint=endpoint, phase="decode")
+        return text
+
+    def generate(self, messages, temperature=0.3, json_schema=None, endpoint="chat", user_id=None):
+        return self._generate(messages, json_schema, endpoint, user_id)
+
+    def stream(self, messages, endpoint="chat", user_id=None, budget=True):
+        """Yield the completion in ~4-character token pieces at the simulated token rate."""
+        text, tokens = self._complete(messages, None, endpoint, user_id, budget)
+        prefill, per_token = self._timings(tokens)
+        time.sleep(prefill)
+        for i in range(0, len(text), 4):
+            if per_token:
+                time.sleep(per_token)
+            yield text[i:i + 4]
+
+    def status(self):
+        return {
+            "loaded": True,
+            "model": "stub",
+            "display_name": "stub",
+            "device": "cpu",
+            "inference": "stub",
+            "prefill_ms": self.prefill_ms,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class StubGroqClient:
+    """Quacks like ``groq.Groq`` for the calls our routers make, backed by StubBackend."""
+
+    def __init__(self, backend: StubBackend):
+        self._backend = backend
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: list, stream: bool = False, response_format: dict = None, **kwargs):
+        # Groq is not our GPU, so these completions skip the local token budget
+        if stream:
+            return (
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+                for piece in self._backend.stream(messages, budget=False)
+            )
+        endpoint = "chat"
+        if response_format and response_format.get("type") == "json_object":
+            system = messages[0]["content"].lower() if messages else ""
+            endpoint = "ocr" if "ocr" in system else "medicine_analysis"
+        content = self._backend._generate(messages, endpoint=endpoint, budget=False)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+# ── Registry ─────────────────────────────────────────────────────
+BACKENDS = {
+    "local": LocalBackend,
+    "remote": RemoteBackend,
+    "stub": StubBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(name: str, backend_cls):
+    """Make ``backend_cls`` selectable as MEDGEMMA_INFERENCE_MODE=``name``."""
+    BACKENDS[name] = backend_cls
+
+
+def get_inference_backend() -> InferenceBackend:
+    """The backend for the current MEDGEMMA_INFERENCE_MODE (one instance per mode)."""
+    mode = settings.MEDGEMMA_INFERENCE_MODE
+    backend = _instances.get(mode)
+    if backend is None:
+        with _instances_lock:
+            backend = _instances.get(mode)
+            if backend is None:
+                if mode not in BACKENDS:
+                    raise ValueError(f"Unknown MEDGEMMA_INFERENCE_MODE {mode!r}")
+                backend = _instances[mode] = BACKENDS[mode]()
+    return backend
+
+
+def get_groq_client():
+    """Groq client, or its offline stand-in when running the stub backend."""
+    backend = get_inference_backend()
+    if isinstance(backend, StubBackend):
+        return StubGroqClient(backend)
+    from groq import Groq
+    return Groq(api_key=settings.GROQ_API_KEY)
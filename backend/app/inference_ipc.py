@@ -0,0 +1,189 @@
+"""
+Bisheshoggo AI - Inference IPC
+Wire protocol between API workers and the MedGemma inference daemon
+(see inference_server.py) over a Unix socket.
+
+Frame layout (network byte order):
+    magic "BSHG" | version u8 | flags u8 | op/status u16 | body length u32 | body
+The body is UTF-8 JSON. Bodies larger than INFERENCE_SHM_THRESHOLD (e.g.
+base64 images, long histories) are written to a POSIX shared-memory block
+instead and the frame body carries only the block name and size; the
+receiver copies it out and unlinks it. A sender whose frame never reaches
+the peer unlinks the block itself (release_frame). Blocks orphaned any
+other way (a peer that died mid-request, a reply written to a client that
+had just timed out) carry their creation time in their name, and the daemon
+unlinks them once they are older than INFERENCE_SHM_LEASE_SECONDS
+(sweep_shared_memory).
+"""
+import json
+import os
+import secrets
+import socket
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from .config import settings
+
+MAGIC = b"BSHG"
+VERSION = 1
+HEADER = struct.Struct("!4sBBHI")
+
+FLAG_SHARED_MEMORY = 0x01
+SHM_PREFIX = "bshg_"
+
+# Request op codes
+OP_GENERATE = 1
+OP_STATUS = 2
+
+# Response status codes
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class InferenceIPCError(RuntimeError):
+    """Protocol or transport failure talking to the inference daemon."""
+
+
+def _untrack(shm):
+    # Ownership passes to the peer, which unlinks the block; stop this
+    # process's resource tracker from unlinking it again (or warning) at exit.
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _shm_name() -> str:
+    # Creation time first, so sweep_shared_memory can expire blocks nobody claimed
+    return f"{SHM_PREFIX}{int(time.time())}_{os.getpid()}_{secrets.token_hex(4)}"
+
+
+def _unlink(name: str):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()  # also drops this process's resource-tracker entry
+
+
+def encode_frame(code: int, payload: dict, shm_threshold: int = None) -> bytes:
+    """
+    Serialize ``payload`` into a frame, spilling large bodies to shared memory.
+    If the frame cannot be delivered, pass it to ``release_frame``.
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    threshold = settings.INFERENCE_SHM_THRESHOLD if shm_threshold is None else shm_threshold
+    flags = 0
+    if threshold and len(body) > threshold:
+        shm = shared_memory.SharedMemory(name=_shm_name(), create=True, size=len(body))
+        shm.buf[:len(body)] = body
+        _untrack(shm)
+        body = json.dumps({"shm": shm.name, "size": len(body)}).encode("utf-8")
+        shm.close()
+        flags |= FLAG_SHARED_MEMORY
+    return HEADER.pack(MAGIC, VERSION, flags, code, len(body)) + body
+
+
+def release_frame(frame: bytes):
+    """Unlink the shared-memory body of a frame that never reached its peer."""
+    flags, _, length = decode_header(frame[:HEADER.size])
+    if flags & FLAG_SHARED_MEMORY:
+        _unlink(json.loads(frame[HEADER.size:HEADER.size + length])["shm"])
+
+
+def sweep_shared_memory(max_age: float = None, shm_dir: str = "/dev/shm") -> int:
+    """Unlink frame bodies older than ``max_age`` seconds that no receiver claimed; returns how many."""
+    max_age = settings.INFERENCE_SHM_LEASE_SECONDS if max_age is None else max_age
+    try:
+        names = os.listdir(shm_dir)
+    except OSError:
+        return 0  # POSIX shared memory is not listable here (e.g. macOS)
+    cutoff = time.time() - max_age
+    swept = 0
+    for name in names:
+        if not name.startswith(SHM_PREFIX):
+            continue
+        try:
+            created = int(name[len(SHM_PREFIX):].split("_", 1)[0])
+        except ValueError:
+            continue
+        if created < cutoff:
+            _unlink(name)
+            swept += 1
+    return swept
+
+
+def decode_header(header: bytes):
+    """Return (flags, code, body_length) for a frame header."""
+    magic, version, flags, code, length = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise InferenceIPCError(f"Bad frame header (magic={magic!r}, version={version})")
+    return flags, code, length
+
+
+def decode_body(flags: int, body: bytes) -> dict:
+    """Parse a frame body, reading (and releasing) shared memory if flagged."""
+    if flags & FLAG_SHARED_MEMORY:
+        ref = json.loads(body)
+        shm = shared_memory.SharedMemory(name=ref["shm"])
+        try:
+            body = bytes(shm.buf[:ref["size"]])
+        finally:
+            shm.close()
+            shm.unlink()
+    return json.loads(body)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise InferenceIPCError("Inference daemon closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class InferenceClient:
+    """Blocking client used by medgemma_service in remote inference mode."""
+
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        self.socket_path = socket_path or settings.INFERENCE_SOCKET_PATH
+        self.timeout = timeout or settings.INFERENCE_TIMEOUT_SECONDS
+
+    def request(self, op: int, payload: dict) -> dict:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                frame = encode_frame(op, payload)
+                try:
+                    sock.sendall(frame)
+                except OSError:
+                    release_frame(frame)
+                    raise
+                flags, code, length = decode_header(_recv_exact(sock, HEADER.size))
+                response = decode_body(flags, _recv_exact(sock, length))
+        except OSError as e:
+            raise InferenceIPCError(f"Inference daemon unreachable at {self.socket_path}: {e}") from e
+
+        if code != STATUS_OK:
+            raise InferenceIPCError(response.get("error", "Inference daemon error"))
+        return response
+
+    def generate(self, messages: list, temperature: float, json_schema: str = None,
+                 endpoint: str = "chat", user_id: str = None, traceparent: str = None) -> str:
+        response = self.request(OP_GENERATE, {
+            "messages": messages,
+            "temperature": temperature,
+            "json_schema": json_schema,
+            "endpoint": endpoint,
+            "user_id": user_id,
+            "traceparent": traceparent,
+        })
+        return response["text"]
+
+    def status(self) -> dict:
+        return self.request(OP_STATUS, {})
@@ -0,0 +1,138 @@
+"""
+Bisheshoggo AI - MedGemma Inference Daemon
+Owns the single MedGemma model instance and serves generation requests from
+any number of API workers over a Unix socket (protocol in inference_ipc.py).
+Requests are accepted concurrently but generation runs one at a time on a
+dedicated thread, since the GPU holds exactly one model.
+
+Run from backend/:  python -m app.inference_server
+Then start API workers with MEDGEMMA_INFERENCE_MODE=remote.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from . import medgemma_service, schemas
+from .config import settings
+from .logging_config import setup_logging
+from .tracing import SPAN_KIND_SERVER, configure_tracing, parse_traceparent, shutdown_tracing, start_span
+from .inference_ipc import (
+    HEADER, OP_GENERATE, OP_STATUS, STATUS_OK, STATUS_ERROR,
+    encode_frame, decode_header, decode_body, release_frame, sweep_shared_memory,
+)
+
+logger = logging.getLogger(__name__)
+
+# Structured-output schemas a client may ask for, by name
+JSON_SCHEMAS = {
+    "SymptomAnalysisOutput": schemas.SymptomAnalysisOutput,
+    "MedicineAnalysisOutput": schemas.MedicineAnalysisOutput,
+}
+
+_gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="medgemma-gpu")
+
+
+def _generate(request: dict) -> dict:
+    schema_name = request.get("json_schema")
+    endpoint = request.get("endpoint", "chat")
+    # Continue the API worker's trace so the GPU work shows up under its request
+    with start_span("inference.generate", {"endpoint": endpoint}, kind=SPAN_KIND_SERVER,
+                    parent=parse_traceparent(request.get("traceparent"))):
+        text = medgemma_service._generate_local(
+            request["messages"],
+            temperature=request.get("temperature", 0.3),
+            json_schema=JSON_SCHEMAS[schema_name] if schema_name else None,
+            endpoint=endpoint,
+            user_id=request.get("user_id"),
+        )
+    return {"text": text}
+
+
+def _status() -> dict:
+    return {
+        **medgemma_service.get_model_status(),
+        "token_budget": medgemma_service.get_token_budget_report(),
+    }
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    loop = asyncio.get_running_loop()
+    try:
+        flags, op, length = decode_header(await reader.readexactly(HEADER.size))
+        request = decode_body(flags, await reader.readexactly(length))
+
+        if op == OP_GENERATE:
+            response = await loop.run_in_executor(_gpu_executor, _generate, request)
+        elif op == OP_STATUS:
+            response = _status()
+        else:
+            raise ValueError(f"Unknown op code {op}")
+        frame = encode_frame(STATUS_OK, response)
+    except asyncio.IncompleteReadError:
+        writer.close()
+        return
+    except Exception as e:
+        logger.exception("Request failed: %s", e)
+        frame = encode_frame(STATUS_ERROR, {"error": str(e)})
+
+    # A client that gave up (timeout) or died will never claim a shared-memory reply
+    try:
+        if writer.is_closing():
+            release_frame(frame)
+        else:
+            writer.write(frame)
+            await writer.drain()
+    except ConnectionError:
+        release_frame(frame)
+    finally:
+        writer.close()
+
+
+async def _sweep_shared_memory():
+    """Unlink shared-memory bodies orphaned by peers that died mid-request."""
+    while True:
+        swept = sweep_shared_memory()
+        if swept:
+            logger.warning("Unlinked %d unclaimed shared-memory bodies", swept)
+        await asyncio.sleep(settings.INFERENCE_SHM_LEASE_SECONDS / 2)
+
+
+async def serve(socket_path: str = None):
+    """Load the model and serve until cancelled."""
+    socket_path = socket_path or settings.INFERENCE_SOCKET_PATH
+    # The daemon is always the in-process backend, whatever the shared .env says
+    settings.MEDGEMMA_INFERENCE_MODE = "local"
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    loop = asyncio.get_running_loop()
+    logger.info("Loading MedGemma...")
+    loaded = await loop.run_in_executor(_gpu_executor, medgemma_service._load_model)
+    if not loaded:
+        logger.warning("Model unavailable (%s); requests will fail over to the API fallback",
+                       medgemma_service._model_load_error)
+
+    server = await asyncio.start_unix_server(_handle_connection, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    logger.info("Listening on %s", socket_path)
+    sweeper = asyncio.create_task(_sweep_shared_memory())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    settings.OTEL_SERVICE_NAME = "bisheshoggo-inference"  # Shares .env with the API workers
+    configure_tracing()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        shutdown_tracing()
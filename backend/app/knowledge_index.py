@@ -0,0 +1,389 @@
+"""
+Bisheshoggo AI - Medical Knowledge Retrieval
+Local vector index over curated medical knowledge, for prompt augmentation.
+
+Sources are the offline knowledge base the web app ships
+(lib/offline/knowledge-base.ts; one English and one Bengali chunk per
+entry) plus any .md/.txt clinical guidelines under the paths in
+KNOWLEDGE_SOURCES, split into paragraph chunks.
+
+Embeddings are computed locally by hashing features into
+KNOWLEDGE_EMBEDDING_DIM signed buckets. The features are words plus
+character trigrams, so Bengali inflections and misspellings still
+overlap. Each bucket is idf-weighted and the vector is L2-normalized. This
+needs no model download and no extra dependency, and the file format
+holds any dense float32 embedding should a neural encoder replace it.
+
+The index is a single file: a header, bucket idf, IVF centroids, list
+offsets and the vectors grouped by list. It is memory-mapped on load, so
+startup costs one mmap however large the index is. A search ranks the
+centroids, scans the KNOWLEDGE_NPROBE closest lists and returns the top-k
+chunks by cosine similarity. The query vector is sparse, so each
+candidate costs one lookup per query feature rather than a full dot
+product. A JSON sidecar holds the chunk texts and a fingerprint of the
+sources. The index is rebuilt whenever the sources or the embedder change.
+
+Run from backend/:  python -m app.knowledge_index "fever for three days"
+"""
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+KNOWLEDGE_BASE_TS = _REPO_ROOT / "lib" / "offline" / "knowledge-base.ts"
+
+_MAGIC = b"BKIX"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIII")  # magic, version, dim, vectors, lists
+_EMBEDDER = "hashing-v1"  # part of the fingerprint; bump when features change
+
+_TOKEN = re.compile(r"[\w\u0980-\u09FF]+")  # \w alone splits Bengali words at vowel signs
+_WORD_WEIGHT, _TRIGRAM_WEIGHT = 1.0, 0.5
+_KMEANS_ITERATIONS = 8
+_KMEANS_SAMPLE = 4096  # centroids are trained on at most this many chunks
+_GUIDELINE_CHUNK_WORDS = 120
+
+
+class Chunk(NamedTuple):
+    id: str
+    title: str
+    text: str
+    language: str  # 'en' or 'bn'
+    source: str
+
+
+class Hit(NamedTuple):
+    chunk: Chunk
+    score: float
+
+
+# ── Sources ──────────────────────────────────────────────────────
+
+def _ts_array_to_json(source: str) -> list:
+    """The medicalKnowledgeBase literal as JSON: quote the keys, drop trailing commas"""
+    start = source.index("= [", source.index("medicalKnowledgeBase")) + 2
+    end = source.index("\n]", start) + 2
+    literal = re.sub(r"^(\s*)(\w+):", r'\1"\2":', source[start:end], flags=re.MULTILINE)
+    literal = re.sub(r",(\s*[\]}])", r"\1", literal)
+    return json.loads(literal)
+
+
+def load_knowledge_base(path: Path = KNOWLEDGE_BASE_TS) -> List[Chunk]:
+    entries = _ts_array_to_json(path.read_text(encoding="utf-8"))
+    chunks = []
+    for entry in entries:
+        keywords = ", ".join(entry.get("keywords", []))
+        for language, title, content in (("en", entry["title"], entry["content"]),
+                                         ("bn", entry["titleBn"], entry["contentBn"])):
+            # Keywords mix both languages, so either chunk matches a query in either
+            chunks.append(Chunk(f"{entry['id']}:{language}", title, f"{content}\n({keywords})", language, path.name))
+    return chunks
+
+
+def load_guidelines(path: Path) -> List[Chunk]:
+    """Paragraph chunks of a .md/.txt file, merged up to ~_GUIDELINE_CHUNK_WORDS words, titled by the last heading"""
+    title = path.stem.replace("-", " ").replace("_", " ")
+    chunks, pending = [], []
+
+    def flush():
+        if pending:
+            text = "\n\n".join(pending)
+            language = "bn" if re.search(r"[\u0980-\u09FF]", text) else "en"
+            chunks.append(Chunk(f"{path.stem}:{len(chunks)}", title, text, language, path.name))
+            pending.clear()
+
+    for block in re.split(r"\n\s*\n", path.read_text(encoding="utf-8")):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#"):
+            flush()
+            title = block.splitlines()[0].lstrip("#").strip() or title
+            block = "\n".join(block.splitlines()[1:]).strip()
+            if not block:
+                continue
+        pending.append(block)
+        if sum(len(part.split()) for part in pending) >= _GUIDELINE_CHUNK_WORDS:
+            flush()
+    flush()
+    return chunks
+
+
+def source_paths() -> List[Path]:
+    paths = [KNOWLEDGE_BASE_TS] if KNOWLEDGE_BASE_TS.exists() else []
+    for entry in filter(None, (part.strip() for part in settings.KNOWLEDGE_SOURCES.split(","))):
+        root = Path(entry)
+        candidates = sorted(root.rglob("*")) if root.is_dir() else [root]
+        paths.extend(path for path in candidates if path.suffix in (".md", ".txt") and path.is_file())
+    return paths
+
+
+def load_chunks(paths: List[Path]) -> List[Chunk]:
+    chunks = []
+    for path in paths:
+        chunks.extend(load_knowledge_base(path) if path.suffix == ".ts" else load_guidelines(path))
+    return chunks
+
+
+def fingerprint(paths: List[Path]) -> str:
+    digest = hashlib.sha1(f"{_EMBEDDER}:{settings.KNOWLEDGE_EMBEDDING_DIM}:{sys.byteorder}".encode())
+    for path in paths:
+        digest.update(str(path).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+# ── Embedding ────────────────────────────────────────────────────
+
+def _features(text: str) -> Counter:
+    features = Counter()
+    for word in _TOKEN.findall(text.lower()):
+        features["w:" + word] += _WORD_WEIGHT
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += _TRIGRAM_WEIGHT
+    return features
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) of a feature; the sign keeps collisions from only ever adding up"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def hashed_counts(text: str, dim: int) -> Dict[int, float]:
+    """Sparse, signed, sublinear term counts by bucket"""
+    vector: Dict[int, float] = defaultdict(float)
+    for feature, count in _features(text).items():
+        bucket, sign = _bucket(feature, dim)
+        vector[bucket] += sign * (1.0 + math.log(count) if count > 1 else count)
+    return vector
+
+
+def _weighted(counts: Dict[int, float], idf) -> Dict[int, float]:
+    vector = {bucket: value * idf[bucket] for bucket, value in counts.items() if value}
+    norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+    return {bucket: value / norm for bucket, value in vector.items()}
+
+
+def _sparse_dot(sparse: Dict[int, float], dense, offset: int = 0) -> float:
+    return sum(value * dense[offset + bucket] for bucket, value in sparse.items())
+
+
+# ── Index file ───────────────────────────────────────────────────
+
+def _kmeans(vectors: List[Dict[int, float]], lists: int, dim: int) -> List[array]:
+    """Spherical k-means over sparse unit vectors; dense unit centroids"""
+    rng = random.Random(0)
+    sample = vectors if len(vectors) <= _KMEANS_SAMPLE else rng.sample(vectors, _KMEANS_SAMPLE)
+    centroids = []
+    for seed in rng.sample(sample, lists):
+        centroid = array("f", bytes(4 * dim))
+        for bucket, value in seed.items():
+            centroid[bucket] = value
+        centroids.append(centroid)
+    for _ in range(_KMEANS_ITERATIONS):
+        sums = [[0.0] * dim for _ in range(lists)]
+        for vector in sample:
+            best = max(range(lists), key=lambda i: _sparse_dot(vector, centroids[i]))
+            for bucket, value in vector.items():
+                sums[best][bucket] += value
+        for i, total in enumerate(sums):
+            norm = math.sqrt(sum(value * value for value in total))
+            if norm:
+                centroids[i] = array("f", (value / norm for value in total))
+    return centroids
+
+
+def build_index(chunks: List[Chunk], path: Path, source_fingerprint: str, dim: int = None):
+    """Embed ``chunks`` and write the index file plus its JSON sidecar (atomically replaced)."""
+    dim = dim or settings.KNOWLEDGE_EMBEDDING_DIM
+    counts = [hashed_counts(f"{chunk.title}\n{chunk.text}", dim) for chunk in chunks]
+    document_frequency = Counter(bucket for vector in counts for bucket in vector)
+    idf = array("f", (math.log((1 + len(chunks)) / (1 + document_frequency[bucket])) + 1.0 for bucket in range(dim)))
+    vectors = [_weighted(vector, idf) for vector in counts]
+
+    lists = max(1, min(len(vectors), round(math.sqrt(len(vectors)))))
+    centroids = _kmeans(vectors, lists, dim) if vectors else [array("f", bytes(4 * dim))]
+    members = defaultdict(list)
+    for position, vector in enumerate(vectors):
+        members[max(range(len(centroids)), key=lambda i: _sparse_dot(vector, centroids[i]))].append(position)
+
+    order = [position for i in range(len(centroids)) for position in members[i]]
+    offsets = array("I", [0])
+    for i in range(len(centroids)):
+        offsets.append(offsets[-1] + len(members[i]))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, dim, len(order), len(centroids)))
+        idf.tofile(out)
+        for centroid in centroids:
+            centroid.tofile(out)
+        offsets.tofile(out)
+        for position in order:
+            dense = array("f", bytes(4 * dim))
+            for bucket, value in vectors[position].items():
+                dense[bucket] = value
+            dense.tofile(out)
+    meta_tmp = path.with_name(path.name + ".json.tmp")
+    meta_tmp.write_text(json.dumps({
+        "fingerprint": source_fingerprint,
+        "chunks": [chunks[position]._asdict() for position in order],
+    }, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    os.replace(meta_tmp, path.with_name(path.name + ".json"))
+    logger.info("Knowledge index built", extra={"chunks": len(order), "lists": len(centroids), "dim": dim})
+
+
+class _MappedIndex:
+    """Read-only view of an index file through mmap; float arrays are memoryview casts, nothing is copied."""
+
+    def __init__(self, path: Path, meta: dict):
+        self.chunks = [Chunk(**chunk) for chunk in meta["chunks"]]
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, dim, count, lists = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION or count != len(self.chunks):
+            raise ValueError(f"{path} is not a compatible knowledge index")
+        self.dim, self.count, self.lists = dim, count, lists
+        view = memoryview(self._mmap)
+        position = _HEADER.size
+        self.idf = view[position:position + 4 * dim].cast("f")
+        position += 4 * dim
+        self.centroids = view[position:position + 4 * dim * lists].cast("f")
+        position += 4 * dim * lists
+        self.offsets = view[position:position + 4 * (lists + 1)].cast("I")
+        position += 4 * (lists + 1)
+        self.vectors = view[position:position + 4 * dim * count].cast("f")
+
+    def search(self, query: str, k: int, nprobe: int) -> List[Hit]:
+        vector = _weighted(hashed_counts(query, self.dim), self.idf)
+        if not vector or not self.count:
+            return []
+        nearest = sorted(range(self.lists), key=lambda i: -_sparse_dot(vector, self.centroids, i * self.dim))
+        scored = []
+        for i in nearest[:nprobe]:
+            for row in range(self.offsets[i], self.offsets[i + 1]):
+                scored.append((_sparse_dot(vector, self.vectors, row * self.dim), row))
+        scored.sort(reverse=True)
+        return [Hit(self.chunks[row], score) for score, row in scored[:k]]
+
+    def close(self):
+        for view in (self.idf, self.centroids, self.offsets, self.vectors):
+            view.release()
+        self._mmap.close()
+
+
+# ── Service ──────────────────────────────────────────────────────
+
+def _estimate_tokens(text: str) -> int:
+    # Imported here: patient_context pulls in the ORM, which the inference daemon never loads
+    from .patient_context import estimate_tokens
+    return estimate_tokens(text)
+
+
+class KnowledgeIndex:
+    """The process's knowledge index: built when stale, memory-mapped, searched per prompt."""
+
+    def __init__(self, path: str = None):
+        self._path = Path(path or settings.KNOWLEDGE_INDEX_PATH)
+        self._index: Optional[_MappedIndex] = None
+        self._lock = threading.Lock()
+
+    def load(self, rebuild: bool = False) -> Optional[_MappedIndex]:
+        """Map the index file, (re)building it first if the sources changed since it was written."""
+        with self._lock:
+            if self._index is not None and not rebuild:
+                return self._index
+            paths = source_paths()
+            if not paths:
+                logger.warning("No knowledge sources found; prompts get no reference notes")
+                return None
+            current = fingerprint(paths)
+            meta_path = self._path.with_name(self._path.name + ".json")
+            meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() and self._path.exists() else None
+            if rebuild or meta is None or meta.get("fingerprint") != current:
+                build_index(load_chunks(paths), self._path, current)
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if self._index is not None:
+                self._index.close()
+            self._index = _MappedIndex(self._path, meta)
+            return self._index
+
+    def preload(self):
+        """Load (building if stale) at startup, so the first prompt doesn't pay for it; failures only disable retrieval."""
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            logger.warning("Knowledge index unavailable: %s", e)
+
+    def search(self, query: str, k: int = None) -> List[Hit]:
+        """Top-``k`` chunks for ``query`` at or above KNOWLEDGE_MIN_SCORE"""
+        if not query or not query.strip():
+            return []
+        try:
+            index = self._index or self.load()
+        except (OSError, ValueError) as e:
+            logger.warning("Knowledge index unavailable: %s", e)
+            return []
+        if index is None:
+            return []
+        hits = index.search(query, k or settings.KNOWLEDGE_TOP_K, settings.KNOWLEDGE_NPROBE)
+        return [hit for hit in hits if hit.score >= settings.KNOWLEDGE_MIN_SCORE]
+
+    def reference_notes(self, query: str) -> str:
+        """Retrieved chunks as prompt lines, one per knowledge entry, within KNOWLEDGE_MAX_TOKENS"""
+        lines, seen, used = [], set(), 0
+        for hit in self.search(query):
+            entry = hit.chunk.id.rsplit(":", 1)[0]
+            if entry in seen:
+                continue  # the other language's chunk of the same entry adds nothing
+            line = f"- {hit.chunk.title}: {' '.join(hit.chunk.text.split())}"
+            cost = _estimate_tokens(line)
+            if used + cost > settings.KNOWLEDGE_MAX_TOKENS:
+                break
+            seen.add(entry)
+            lines.append(line)
+            used += cost
+        return "\n".join(lines)
+
+
+knowledge_index = KnowledgeIndex()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge index and run a query against it")
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    index = knowledge_index.load(rebuild=args.rebuild)
+    print(json.dumps({
+        "index": str(knowledge_index._path),
+        "chunks": index.count if index else 0,
+        "lists": index.lists if index else 0,
+        "hits": [{"id": hit.chunk.id, "title": hit.chunk.title, "score": round(hit.score, 4)}
+                 for hit in knowledge_index.search(args.query)] if args.query else [],
+        "notes": knowledge_index.reference_notes(args.query) if args.query else "",
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Bisheshoggo AI - Logging
+Structured JSON logs written off the event loop.
+
+Every logger hands records to a QueueHandler (a non-blocking put); a single
+QueueListener thread formats them and does the actual write to stdout (or
+stderr with LOG_STREAM=stderr). Each record carries the current request ID,
+set per request by RequestIDMiddleware and echoed back in the X-Request-ID
+response header. High-volume INFO/DEBUG events can be sampled by passing
+``extra={"sample": True}``.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from .config import settings
+from .tracing import current_span
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_listener = None
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample"}
+
+
+class RequestIDFilter(logging.Filter):
+    """Stamp records with the request ID (and trace ID, if traced) of the coroutine/thread that logged them."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        span = current_span()
+        if span.is_recording:
+            record.trace_id = span.context.trace_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records marked ``sample``; warnings and above always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, "sample", False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched. The stock prepare()
+    renders the message and copies the record on the caller's thread so it
+    can be pickled; our queue never leaves the process, so that work is left
+    to the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = None, fmt: str = None):
+    """
+    Route all logging through a queue to a background writer thread.
+    Safe to call more than once; later calls only adjust the level.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if settings.SQL_ECHO else logging.WARNING
+    )
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr if settings.LOG_STREAM == "stderr" else sys.stdout)
+    if (fmt or settings.LOG_FORMAT) == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        ))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _InProcessQueueHandler(log_queue)
+    # Filters run on the caller's side so sampled-out records never hit the queue
+    # and the request ID is captured before the record changes threads
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+    queue_handler.addFilter(RequestIDFilter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIDMiddleware:
+    """Pure ASGI middleware assigning each HTTP/WebSocket request a correlation ID."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -2,11 +2,27 @@
 Bisheshoggo AI - Main FastAPI Application
 বিশেষজ্ঞ AI - Rural Healthcare Platform for Bangladesh
 """
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from .database import init_db
+from .database import init_db, engine, SessionLocal
 from .config import settings
+from .drug_interactions import load_interaction_matrix
+from .facility_directory import facility_directory
+from .chat import chat_broker
+from .scheduling import backfill_slots
+from .history_search import history_index
+from .knowledge_index import knowledge_index
+from .metrics import MetricsMiddleware, instrument_engine, render_metrics
+from .logging_config import RequestIDMiddleware, setup_logging
+from .tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from .profiling import ProfilingMiddleware
+from .serialization import DefaultJSONResponse, MessagePackBodyMiddleware
+from .http_cache import ConditionalGetMiddleware
+from .compression import CompressionMiddleware
 from .routers import (
     auth,
     profile,
@@ -16,21 +32,42 @@ from .routers import (
     providers,
     medical_records,
     symptom_check,
+    history,
     ai,
-    ocr
+    ocr,
+    admin
 )
 
 
+setup_logging()
+configure_tracing()
+logger = logging.getLogger("app")
+
+
+def _warm_up():
+    """Backfills and cache preloads, run once the app is serving so startup doesn't wait on them"""
+    for step in (facility_directory.refresh, backfill_slots, history_index.backfill, knowledge_index.preload):
+        try:
+            step()
+        except Exception:
+            logger.exception("Startup task %s failed", step.__qualname__)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
     # Startup: Initialize database
-    print("[+] Starting Bisheshoggo AI Backend...")
+    logger.info("Starting Bisheshoggo AI Backend...")
     init_db()
-    print("[+] Database initialized")
+    logger.info("Database initialized")
+    load_interaction_matrix()
+    warm_up = asyncio.create_task(asyncio.to_thread(_warm_up))
     yield
     # Shutdown
-    print("[*] Shutting down Bisheshoggo AI...")
+    logger.info("Shutting down Bisheshoggo AI...")
+    await warm_up  # a worker thread can't be cancelled; let its writes finish before the pool goes away
+    await chat_broker.close()
+    shutdown_tracing()
 
 
 # Create FastAPI application
@@ -54,9 +91,19 @@ app = FastAPI(
     - 📱 Offline-First Support
     """,
     version="1.0.0",
+    default_response_class=DefaultJSONResponse,
     lifespan=lifespan
 )
 
+# MessagePack request bodies (offline sync uploads) reach the routes as JSON
+app.add_middleware(MessagePackBodyMiddleware)
+
+# 304s for unchanged collections (inside CORS so they still carry CORS headers)
+app.add_middleware(ConditionalGetMiddleware, session_factory=SessionLocal)
+
+# Negotiated br/zstd/gzip; wraps the ETag'd responses so 304s stay body-less
+app.add_middleware(CompressionMiddleware)
+
 # Configure CORS - allow all localhost origins for development
 app.add_middleware(
     CORSMiddleware,
@@ -75,6 +122,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Each add_middleware wraps everything added before it, so the last one added is outermost.
+# Request latency metrics wrap CORS, compression and conditional GETs, so those count in the
+# timings; the tracing, profiling and request-ID layers added after it are outside it.
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIDMiddleware)
+instrument_engine(engine)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
@@ -84,8 +140,10 @@ app.include_router(facilities.router, prefix="/api")
 app.include_router(providers.router, prefix="/api")
 app.include_router(medical_records.router, prefix="/api")
 app.include_router(symptom_check.router, prefix="/api")
+app.include_router(history.router, prefix="/api")
 app.include_router(ai.router, prefix="/api")
 app.include_router(ocr.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/")
@@ -106,5 +164,11 @@ async def health_check():
     return {"status": "healthy", "service": "Bisheshoggo AI"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # Run with: uvicorn app.main:app --reload --port 8000
 
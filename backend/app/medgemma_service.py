@@ -6,18 +6,34 @@ Falls back to Gemma API (google-genai) or Groq if local model is unavailable.
 This fulfills the MedGemma Impact Challenge requirement of using real MedGemma
 from Google's Health AI Developer Foundations (HAI-DEF).
 """
+import asyncio
 import json
 import os
-import re
 import threading
-import traceback
+import logging
+import time
+from collections import deque
 
 # Prevent transformers from importing TensorFlow (saves ~500MB RAM)
 os.environ["USE_TF"] = "0"
 os.environ["TRANSFORMERS_NO_ADVISORY_WARNINGS"] = "1"
 
-import torch
+# NOTE: torch and transformers are imported inside the functions that need
+# them, so API workers that never run the local model (no GPU, API fallback
+# only) start in well under a second instead of paying for the ML stack.
+from pydantic import ValidationError
 from .config import settings
+from .inference_backends import get_inference_backend
+from .metrics import INFERENCE_SECONDS, TOKENS_GENERATED, record_backend
+from .tracing import SPAN_KIND_CLIENT, SPAN_KIND_INTERNAL, current_span, start_span
+from .schemas import SymptomAnalysisOutput, MedicineAnalysisOutput
+from .drug_dictionary import canonicalize_prescriptions, format_prescriptions_for_prompt
+from .knowledge_index import knowledge_index
+from .drug_interactions import (
+    interactions_for_prescriptions, format_interaction_alert, merge_interaction_alerts,
+)
+
+logger = logging.getLogger(__name__)
 
 # ── Model identifiers ────────────────────────────────────────────
 MEDGEMMA_MODEL_ID = "unsloth/medgemma-4b-it-bnb-4bit"  # Pre-quantized 4-bit (non-gated mirror)
@@ -31,6 +47,8 @@ _processor = None
 _model_lock = threading.Lock()
 _model_load_attempted = False
 _model_load_error = None
+_draft_model = None          # Optional small model for speculative (assisted) decoding
+_draft_tokenizer = None
 
 
 def _get_hf_token():
@@ -39,6 +57,49 @@ def _get_hf_token():
     return token if token else None
 
 
+def _load_draft_model(hf_token):
+    """
+    Load the draft model named in MEDGEMMA_DRAFT_MODEL_ID for assisted generation.
+    Failure is non-fatal: generation just runs without speculation.
+    """
+    global _draft_model, _draft_tokenizer
+
+    draft_id = settings.MEDGEMMA_DRAFT_MODEL_ID
+    if not draft_id:
+        return False
+
+    try:
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        logger.info("Loading draft model %s for speculative decoding...", draft_id)
+        _draft_tokenizer = AutoTokenizer.from_pretrained(draft_id, token=hf_token)
+        _draft_model = AutoModelForCausalLM.from_pretrained(
+            draft_id,
+            dtype=torch.bfloat16,
+            device_map="cuda:0",
+            token=hf_token,
+        )
+        _draft_model.generation_config.num_assistant_tokens = settings.MEDGEMMA_NUM_ASSISTANT_TOKENS
+        logger.info("Draft model loaded (%s assistant tokens)", settings.MEDGEMMA_NUM_ASSISTANT_TOKENS)
+        return True
+    except Exception as e:
+        logger.warning("Draft model unavailable (%s), speculative decoding disabled", e)
+        _draft_model = None
+        _draft_tokenizer = None
+        return False
+
+
+def _check_json_enforcement():
+    """Say once, at load time, whether structured outputs are schema-constrained."""
+    import importlib.util
+    if importlib.util.find_spec("lmformatenforcer") is None:
+        logger.warning(
+            "lm-format-enforcer not installed: JSON outputs are not schema-constrained "
+            "(only the opening brace is forced); pip install lm-format-enforcer to enable"
+        )
+
+
 def _load_model():
     """Load MedGemma-4B-IT with 4-bit quantization (bitsandbytes NF4)."""
     global _model, _processor, _model_load_attempted, _model_load_error
@@ -49,21 +110,22 @@ def _load_model():
         _model_load_attempted = True
 
         try:
+            import torch
             from transformers import AutoProcessor, AutoModelForImageTextToText
 
             if not torch.cuda.is_available():
                 _model_load_error = "CUDA not available - MedGemma requires a GPU"
-                print(f"[MedGemma] {_model_load_error}")
+                logger.warning("%s", _model_load_error)
                 return False
 
             # Check if system has enough free RAM (need ~4 GB to safely load 3 GB model)
             try:
                 import psutil
                 free_ram_gb = psutil.virtual_memory().available / 1024**3
-                print(f"[MedGemma] Available RAM: {free_ram_gb:.1f} GB")
+                logger.info("Available RAM: %.1f GB", free_ram_gb)
                 if free_ram_gb < 3.5:
                     _model_load_error = f"Insufficient RAM ({free_ram_gb:.1f} GB free, need 3.5+ GB). Using API fallback."
-                    print(f"[MedGemma] {_model_load_error}")
+                    logger.warning("%s", _model_load_error)
                     return False
             except ImportError:
                 pass  # psutil not installed, try anyway
@@ -72,8 +134,8 @@ def _load_model():
 
             gpu_name = torch.cuda.get_device_name(0)
             vram_total = torch.cuda.get_device_properties(0).total_memory / 1024**3
-            print(f"[MedGemma] Loading {MEDGEMMA_MODEL_ID} (pre-quantized 4-bit)...")
-            print(f"[MedGemma] GPU: {gpu_name}, VRAM: {vram_total:.1f} GB")
+            logger.info("Loading %s (pre-quantized 4-bit)...", MEDGEMMA_MODEL_ID)
+            logger.info("GPU: %s, VRAM: %.1f GB", gpu_name, vram_total)
 
             # Try the original gated model first, then fall back to unsloth mirror
             model_id = MEDGEMMA_MODEL_ID
@@ -100,10 +162,12 @@ def _load_model():
                     )
                     model_id = MEDGEMMA_ORIGINAL_ID
                     vram_used = torch.cuda.memory_allocated(0) / 1024**3
-                    print(f"[MedGemma] Original model loaded! VRAM used: {vram_used:.1f} GB")
+                    logger.info("Original model loaded! VRAM used: %.1f GB", vram_used)
+                    _load_draft_model(hf_token)
+                    _check_json_enforcement()
                     return True
                 except Exception as orig_err:
-                    print(f"[MedGemma] Original model unavailable ({orig_err}), using pre-quantized mirror...")
+                    logger.warning("Original model unavailable (%s), using pre-quantized mirror...", orig_err)
 
             # Load pre-quantized unsloth mirror (no gating required)
             _processor = AutoProcessor.from_pretrained(
@@ -125,13 +189,14 @@ def _load_model():
             )
 
             vram_used = torch.cuda.memory_allocated(0) / 1024**3
-            print(f"[MedGemma] Model loaded! VRAM used: {vram_used:.1f} GB")
+            logger.info("Model loaded! VRAM used: %.1f GB", vram_used)
+            _load_draft_model(hf_token)
+            _check_json_enforcement()
             return True
 
         except Exception as e:
             _model_load_error = str(e)
-            print(f"[MedGemma] Failed to load model: {e}")
-            traceback.print_exc()
+            logger.exception("Failed to load model: %s", e)
             _model = None
             _processor = None
             return False
@@ -145,19 +210,35 @@ def _start_preload():
 
 # NOTE: Auto-preload disabled to save RAM on memory-constrained systems (8 GB).
 # Model loads lazily on first request instead. Un-comment to preload:
+# import torch
 # if torch.cuda.is_available():
 #     _start_preload()
 
 
 # ── Public helpers ────────────────────────────────────────────
-def is_model_loaded():
-    """Check if the local MedGemma model is loaded and ready."""
+def _local_model_loaded():
     return _model is not None and _processor is not None
 
 
+def is_model_loaded():
+    """Check if the configured inference backend is loaded and ready."""
+    return bool(get_inference_backend().status().get("loaded"))
+
+
 def get_model_status():
     """Return a dict describing current model state."""
-    if is_model_loaded():
+    return get_inference_backend().status()
+
+
+def get_status_report():
+    """(model status, token budget report) from a single backend query."""
+    return get_inference_backend().status_report()
+
+
+def _local_status():
+    """Status of the in-process model."""
+    if _local_model_loaded():
+        import torch
         vram = torch.cuda.memory_allocated(0) / 1024**3
         return {
             "loaded": True,
@@ -165,6 +246,7 @@ def get_model_status():
             "display_name": MEDGEMMA_TEXT_MODEL,
             "vram_used_gb": round(vram, 1),
             "device": "cuda",
+            "draft_model": settings.MEDGEMMA_DRAFT_MODEL_ID if _draft_model is not None else None,
         }
     return {
         "loaded": False,
@@ -173,13 +255,261 @@ def get_model_status():
     }
 
 
+# ── Structured (JSON) decoding ───────────────────────────────
+def _scan_json(text: str, state: dict) -> bool:
+    """
+    Advance a minimal JSON lexer over ``text``.
+    ``state`` holds depth / opened / in_string / escaped; returns True once
+    the top-level object has closed. Closers before the first opener (stray
+    "}" or "]" in leading prose) are ignored.
+    """
+    for ch in text:
+        if not state["opened"] and ch not in "{[":
+            continue
+        if state["in_string"]:
+            if state["escaped"]:
+                state["escaped"] = False
+            elif ch == "\\":
+                state["escaped"] = True
+            elif ch == '"':
+                state["in_string"] = False
+        elif ch == '"':
+            state["in_string"] = True
+        elif ch in "{[":
+            state["depth"] += 1
+            state["opened"] = True
+        elif ch in "}]":
+            state["depth"] -= 1
+            if state["depth"] <= 0:
+                return True
+    return False
+
+
+def _json_stopping_criteria(prompt_length: int, initial_depth: int):
+    """Stop generation at the brace that closes the top-level JSON object."""
+    import torch
+    from transformers import StoppingCriteria
+
+    tokenizer = _processor.tokenizer
+
+    class JsonObjectComplete(StoppingCriteria):
+        def __init__(self):
+            self.position = prompt_length
+            self.state = {"depth": initial_depth, "opened": initial_depth > 0, "in_string": False, "escaped": False}
+            self.done = False
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if not self.done:
+                new_tokens = input_ids[0, self.position:].tolist()
+                self.position = input_ids.shape[-1]
+                self.done = _scan_json(tokenizer.decode(new_tokens), self.state)
+            return torch.full((input_ids.shape[0],), self.done, dtype=torch.bool, device=input_ids.device)
+
+    return JsonObjectComplete()
+
+
+def _first_token_timer():
+    """
+    A never-stopping criterion that timestamps its first call, i.e. the end
+    of prefill, so inference time can be split into prefill and decode.
+    """
+    import torch
+    from transformers import StoppingCriteria
+
+    class FirstTokenTimer(StoppingCriteria):
+        def __init__(self):
+            self.first_token_at = None
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+
+    return FirstTokenTimer()
+
+
+def _json_prefix_allowed_tokens_fn(schema):
+    """
+    Token-level schema enforcement via lm-format-enforcer, if installed.
+    Returns None when the package is unavailable.
+    """
+    try:
+        from lmformatenforcer import JsonSchemaParser
+        from lmformatenforcer.integrations.transformers import build_transformers_prefix_allowed_tokens_fn
+    except ImportError:
+        return None
+    return build_transformers_prefix_allowed_tokens_fn(
+        _processor.tokenizer, JsonSchemaParser(schema.model_json_schema())
+    )
+
+
+def _parse_json_response(response_text: str, schema, fallback: dict) -> dict:
+    """
+    Parse the first JSON object in a model response and validate it against
+    ``schema``. Unvalidated JSON is still returned as-is; ``fallback`` is used
+    only when no object can be decoded at all.
+    """
+    start = response_text.find("{")
+    if start == -1:
+        return fallback
+    try:
+        data, _ = json.JSONDecoder().raw_decode(response_text[start:])
+    except json.JSONDecodeError:
+        return fallback
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError:
+        return data
+
+
+# ── Token budgeting ──────────────────────────────────────────
+MIN_NEW_TOKENS = 128
+
+# Starting budget, hard ceiling and extra stop strings per calling endpoint
+ENDPOINT_TOKEN_POLICIES = {
+    "chat": {"initial": 1024, "ceiling": 2048, "stop_strings": ["<start_of_turn>", "\nUser:"]},
+    "symptom_analysis": {"initial": 768, "ceiling": 1536, "stop_strings": []},
+    "medicine_analysis": {"initial": 1024, "ceiling": 2048, "stop_strings": []},
+}
+
+
+class TokenQuotaExceeded(RuntimeError):
+    """Raised when a user has used up their local GPU token quota."""
+
+
+class TokenBudgetPolicy:
+    """
+    Picks ``max_new_tokens`` per endpoint from the observed output-length
+    distribution (p95 plus headroom) and caps it by a rolling per-user quota.
+    """
+
+    WINDOW = 200       # output lengths remembered per endpoint
+    MIN_SAMPLES = 20   # before this, use the configured initial budget
+    HEADROOM = 1.25
+
+    def __init__(self, policies: dict, max_new_tokens: int, user_tokens_per_minute: int):
+        self._policies = policies
+        self._max_new_tokens = max_new_tokens
+        self._user_quota = user_tokens_per_minute
+        self._lock = threading.Lock()
+        self._observed = {name: deque(maxlen=self.WINDOW) for name in policies}
+        self._user_usage = {}
+        self._stats = {
+            name: {"requests": 0, "tokens_generated": 0, "ceiling_reduction": 0, "truncated": 0}
+            for name in policies
+        }
+
+    def _learned_budget(self, endpoint: str) -> int:
+        policy = self._policies[endpoint]
+        ceiling = min(policy["ceiling"], self._max_new_tokens)
+        observed = self._observed[endpoint]
+        if len(observed) < self.MIN_SAMPLES:
+            return min(policy["initial"], ceiling)
+        lengths = sorted(observed)
+        p95 = lengths[int(0.95 * (len(lengths) - 1))]
+        return max(MIN_NEW_TOKENS, min(int(p95 * self.HEADROOM), ceiling))
+
+    def _user_tokens_used(self, user_id: str, now: float) -> int:
+        usage = self._user_usage.get(user_id)
+        if not usage:
+            return 0
+        while usage and now - usage[0][0] > 60:
+            usage.popleft()
+        return sum(tokens for _, tokens in usage)
+
+    def stop_strings(self, endpoint: str) -> list:
+        return self._policies[endpoint]["stop_strings"]
+
+    def budget_for(self, endpoint: str, user_id: str = None) -> int:
+        """Token budget for the next generation on ``endpoint``."""
+        with self._lock:
+            budget = self._learned_budget(endpoint)
+            if user_id and self._user_quota:
+                remaining = self._user_quota - self._user_tokens_used(user_id, time.monotonic())
+                if remaining < MIN_NEW_TOKENS:
+                    raise TokenQuotaExceeded(f"Local inference quota used up for user {user_id}")
+                budget = min(budget, remaining)
+            return budget
+
+    def record(self, endpoint: str, user_id: str, budget: int, tokens_used: int):
+        """Feed back the actual output length of a finished generation."""
+        with self._lock:
+            self._observed[endpoint].append(tokens_used)
+            stats = self._stats[endpoint]
+            stats["requests"] += 1
+            stats["tokens_generated"] += tokens_used
+            # Unused headroom cut from the flat ceiling, not generated tokens avoided
+            stats["ceiling_reduction"] += max(self._max_new_tokens - budget, 0)
+            if tokens_used >= budget:
+                stats["truncated"] += 1
+            if user_id:
+                self._user_usage.setdefault(user_id, deque()).append((time.monotonic(), tokens_used))
+
+    def report(self) -> dict:
+        """
+        Per-endpoint budgets and usage. ``ceiling_reduction`` sums how far each
+        budget sat below the flat ``max_new_tokens`` ceiling; ``truncated``
+        counts generations that hit their budget.
+        """
+        with self._lock:
+            return {
+                name: {**self._stats[name], "current_budget": self._learned_budget(name)}
+                for name in self._policies
+            }
+
+
+_token_budget = TokenBudgetPolicy(
+    ENDPOINT_TOKEN_POLICIES,
+    max_new_tokens=settings.MEDGEMMA_MAX_NEW_TOKENS,
+    user_tokens_per_minute=settings.MEDGEMMA_USER_TOKENS_PER_MINUTE,
+)
+
+
+def get_token_budget_report():
+    """Return token budget stats for the status endpoint."""
+    return get_inference_backend().token_budget_report()
+
+
 # ── Core generation ──────────────────────────────────────────
-def _generate_text(messages: list, max_new_tokens: int = 2048, temperature: float = 0.3):
-    """Generate text using the local MedGemma model."""
-    if not is_model_loaded():
-        if not _load_model():
+def _backend_label() -> str:
+    """AI backend metrics label of the active inference mode: medgemma_local, medgemma_remote or medgemma_stub."""
+    return f"medgemma_{settings.MEDGEMMA_INFERENCE_MODE}"
+
+
+def _generate_text(messages: list, temperature: float = 0.3, json_schema=None,
+                   endpoint: str = "chat", user_id: str = None):
+    """
+    Generate text with the backend selected by MEDGEMMA_INFERENCE_MODE
+    (in-process MedGemma, the inference daemon, or the offline stub).
+    Blocks for the whole generation; async callers run it via asyncio.to_thread.
+    """
+    backend = get_inference_backend()
+    with start_span("medgemma.generate", {"endpoint": endpoint, "inference.mode": backend.name},
+                    kind=SPAN_KIND_CLIENT if backend.name == "remote" else SPAN_KIND_INTERNAL):
+        return backend.generate(messages, temperature, json_schema, endpoint, user_id)
+
+
+def _generate_local(messages: list, temperature: float = 0.3, json_schema=None,
+                    endpoint: str = "chat", user_id: str = None, speculative: bool = True):
+    """
+    Generate text using the in-process MedGemma model.
+    ``max_new_tokens`` comes from the token budget policy for ``endpoint``.
+    With ``json_schema`` (a pydantic model) the output is constrained to a
+    single JSON object and generation stops at its closing brace.
+    When a draft model is loaded and ``speculative`` is set, decoding is
+    assisted by it; greedy outputs are identical to plain decoding.
+    """
+    import torch
+    from transformers import StoppingCriteriaList
+
+    if not _local_model_loaded():
+        with start_span("medgemma.load_model"):
+            loaded = _load_model()
+        if not loaded:
             raise RuntimeError(f"MedGemma model not available: {_model_load_error}")
 
+    max_new_tokens = _token_budget.budget_for(endpoint, user_id)
+
     # Convert plain string content to structured format for Gemma 3 chat template
     formatted_messages = []
     for msg in messages:
@@ -196,11 +526,41 @@ def _generate_text(messages: list, max_new_tokens: int = 2048, temperature: floa
         tokenize=False,
     )
 
+    generate_kwargs = {}
+    prefill = ""
+    if json_schema is not None:
+        prefix_fn = _json_prefix_allowed_tokens_fn(json_schema)
+        if prefix_fn is not None:
+            generate_kwargs["prefix_allowed_tokens_fn"] = prefix_fn
+        else:
+            # No grammar engine: force the opening brace so the model can't
+            # wander into prose or code fences before the object
+            prefill = "{"
+            prompt_text += prefill
+
     inputs = _processor(
         text=prompt_text,
         return_tensors="pt",
     ).to("cuda")
 
+    timer = _first_token_timer()
+    stopping_criteria = [timer]
+    if json_schema is not None:
+        stopping_criteria.append(_json_stopping_criteria(
+            inputs["input_ids"].shape[-1], initial_depth=1 if prefill else 0,
+        ))
+    generate_kwargs["stopping_criteria"] = StoppingCriteriaList(stopping_criteria)
+    if _token_budget.stop_strings(endpoint):
+        generate_kwargs["stop_strings"] = _token_budget.stop_strings(endpoint)
+        generate_kwargs["tokenizer"] = _processor.tokenizer
+    if speculative and _draft_model is not None:
+        generate_kwargs["assistant_model"] = _draft_model
+        if _draft_model.config.vocab_size != _model.config.get_text_config().vocab_size:
+            # Universal assisted decoding re-tokenizes between the two vocabularies
+            generate_kwargs["tokenizer"] = _processor.tokenizer
+            generate_kwargs["assistant_tokenizer"] = _draft_tokenizer
+
+    start = time.perf_counter()
     with torch.no_grad():
         output = _model.generate(
             **inputs,
@@ -208,13 +568,32 @@ def _generate_text(messages: list, max_new_tokens: int = 2048, temperature: floa
             temperature=temperature if temperature > 0 else None,
             do_sample=temperature > 0,
             top_p=0.9 if temperature > 0 else None,
+            **generate_kwargs,
         )
 
+    end = time.perf_counter()
+
+    new_tokens = output[0][inputs["input_ids"].shape[-1]:]
+    _token_budget.record(endpoint, user_id, max_new_tokens, len(new_tokens))
+    prefill_end = timer.first_token_at or end
+    INFERENCE_SECONDS.observe(prefill_end - start, endpoint=endpoint, phase="prefill")
+    INFERENCE_SECONDS.observe(end - prefill_end, endpoint=endpoint, phase="decode")
+    TOKENS_GENERATED.inc(len(new_tokens), endpoint=endpoint)
+    current_span().set_attributes({
+        "gen_ai.usage.output_tokens": len(new_tokens),
+        "gen_ai.usage.input_tokens": inputs["input_ids"].shape[-1],
+        "medgemma.max_new_tokens": max_new_tokens,
+        "medgemma.prefill_ms": round((prefill_end - start) * 1000, 1),
+        "medgemma.speculative": "assistant_model" in generate_kwargs,
+    })
+
     response = _processor.decode(
-        output[0][inputs["input_ids"].shape[-1]:],
+        new_tokens,
         skip_special_tokens=True,
     )
-    return response
+    for stop in _token_budget.stop_strings(endpoint):
+        response = response.split(stop, 1)[0]
+    return prefill + response
 
 
 # ── Gemma API fallback ────────────────────────────────────────
@@ -226,6 +605,14 @@ def _get_gemma_fallback_client():
     return genai.Client(api_key=settings.GOOGLE_API_KEY)
 
 
+def _gemma_api_span(endpoint: str):
+    return start_span(
+        "gemma_api.generate_content",
+        {"endpoint": endpoint, "gen_ai.request.model": GEMMA_FALLBACK_MODEL},
+        kind=SPAN_KIND_CLIENT,
+    )
+
+
 # ── System instruction ───────────────────────────────────────
 MEDGEMMA_SYSTEM_INSTRUCTION = """You are a medical AI assistant powered by MedGemma, part of Google's Health AI Developer Foundations (HAI-DEF). 
 You serve Bisheshoggo AI, a healthcare platform for rural Bangladesh's Hill Tracts region.
@@ -254,22 +641,54 @@ You are built on Google's MedGemma model, specifically designed for healthcare a
 #  PUBLIC API  (same signatures the rest of the app relies on)
 # ═══════════════════════════════════════════════════════════════
 
-async def medgemma_chat(messages: list, stream: bool = False):
+def with_patient_context(system_prompt: str, patient_context: str = "") -> str:
+    """
+    Append the patient's summary (see patient_context) to a system prompt.
+    It goes after the fixed instructions so their prefix stays identical
+    across patients.
+    """
+    if not patient_context:
+        return system_prompt
+    return f"{system_prompt}\n\nPatient background (from their records):\n{patient_context}"
+
+
+def with_reference_notes(system_prompt: str, query: str) -> str:
+    """
+    Append the knowledge-base snippets retrieved for ``query`` (see
+    knowledge_index), if any clear the relevance threshold.
+    """
+    notes = knowledge_index.reference_notes(query)
+    if not notes:
+        return system_prompt
+    return f"{system_prompt}\n\nReference notes (local knowledge base; use where relevant):\n{notes}"
+
+
+def last_user_message(messages: list) -> str:
+    return next((m["content"] for m in reversed(messages) if m["role"] == "user" and isinstance(m["content"], str)), "")
+
+
+async def medgemma_chat(messages: list, stream: bool = False, user_id: str = None, patient_context: str = ""):
     """
     Chat with MedGemma for medical Q&A.
     Tries local model first, falls back to Gemma API.
     """
+    system_instruction = with_reference_notes(
+        with_patient_context(MEDGEMMA_SYSTEM_INSTRUCTION, patient_context), last_user_message(messages)
+    )
+
     # ── Try local MedGemma ──
     try:
-        chat_messages = [{"role": "system", "content": MEDGEMMA_SYSTEM_INSTRUCTION}]
+        chat_messages = [{"role": "system", "content": system_instruction}]
         for msg in messages:
             role = "user" if msg["role"] == "user" else "assistant"
             chat_messages.append({"role": role, "content": msg["content"]})
 
-        response = _generate_text(chat_messages)
+        response = await asyncio.to_thread(_generate_text, chat_messages, endpoint="chat", user_id=user_id)
+        record_backend(_backend_label(), True)
         return {"content": response, "model": MEDGEMMA_TEXT_MODEL}
     except Exception as e:
-        print(f"[MedGemma] Local chat failed ({e}), falling back to Gemma API...")
+        record_backend(_backend_label(), False)
+        logger.warning("Local chat failed (%s), falling back to Gemma API...", e)
 
     # ── Gemma API fallback ──
     try:
@@ -279,7 +698,7 @@ async def medgemma_chat(messages: list, stream: bool = False):
         contents = [
             types.Content(
                 role="user",
-                parts=[types.Part(text=f"[System Instructions]\n{MEDGEMMA_SYSTEM_INSTRUCTION}\n[End System Instructions]\nPlease acknowledge and follow these instructions.")]
+                parts=[types.Part(text=f"[System Instructions]\n{system_instruction}\n[End System Instructions]\nPlease acknowledge and follow these instructions.")]
             ),
             types.Content(
                 role="model",
@@ -290,30 +709,38 @@ async def medgemma_chat(messages: list, stream: bool = False):
             role = "user" if msg["role"] == "user" else "model"
             contents.append(types.Content(role=role, parts=[types.Part(text=msg["content"])]))
 
-        response = client.models.generate_content(
-            model=GEMMA_FALLBACK_MODEL,
-            contents=contents,
-            config=types.GenerateContentConfig(temperature=0.3, max_output_tokens=2048),
-        )
+        with _gemma_api_span("chat"):
+            response = client.models.generate_content(
+                model=GEMMA_FALLBACK_MODEL,
+                contents=contents,
+                config=types.GenerateContentConfig(temperature=0.3, max_output_tokens=_token_budget.budget_for("chat")),
+            )
+        record_backend("gemma_api", True)
         return {"content": response.text, "model": GEMMA_FALLBACK_MODEL}
     except Exception as e2:
-        print(f"[MedGemma] Gemma API fallback also failed: {e2}")
+        record_backend("gemma_api", False)
+        logger.error("Gemma API fallback also failed: %s", e2)
         raise
 
 
-async def medgemma_symptom_analysis(symptoms: list, severity: str, duration: str, additional_notes: str = ""):
-    """Use MedGemma for evidence-based symptom analysis and triage."""
+def _symptom_analysis_prompt(symptoms: list, severity: str, duration: str, additional_notes: str = "",
+                             patient_context: str = ""):
+    """Build the triage prompt shared by the local model and the Gemma fallback."""
     symptoms_text = ", ".join(symptoms)
+    notes = knowledge_index.reference_notes(f"{symptoms_text}. {additional_notes}")
+    reference = f"\nREFERENCE NOTES (local knowledge base, use where relevant):\n{notes}\n" if notes else ""
 
-    prompt = f"""Analyze the following patient symptoms and provide a structured medical assessment.
+    return f"""Analyze the following patient symptoms and provide a structured medical assessment.
 
 PATIENT SYMPTOMS: {symptoms_text}
 SEVERITY: {severity}
 DURATION: {duration}
 ADDITIONAL NOTES: {additional_notes or "None provided"}
+PATIENT BACKGROUND:
+{patient_context or "Not on record"}
 
 CONTEXT: Patient is in rural Bangladesh with limited healthcare access.
-
+{reference}
 Provide your analysis in the following JSON format:
 {{
     "diagnosis": "Most likely condition name",
@@ -330,73 +757,89 @@ Provide your analysis in the following JSON format:
 Be thorough but practical. Consider common conditions in Bangladesh (tropical diseases, waterborne illnesses, nutritional deficiencies).
 Respond ONLY with the JSON object, no additional text."""
 
+
+async def medgemma_symptom_analysis(symptoms: list, severity: str, duration: str, additional_notes: str = "",
+                                    user_id: str = None, patient_context: str = ""):
+    """Use MedGemma for evidence-based symptom analysis and triage."""
+    prompt = _symptom_analysis_prompt(symptoms, severity, duration, additional_notes, patient_context)
+
     # ── Try local MedGemma ──
     try:
         chat_messages = [
             {"role": "system", "content": "You are a medical AI triage assistant. Respond only with valid JSON."},
             {"role": "user", "content": prompt},
         ]
-        response_text = _generate_text(chat_messages, temperature=0.2)
+        response_text = await asyncio.to_thread(
+            _generate_text, chat_messages, temperature=0.2, json_schema=SymptomAnalysisOutput,
+            endpoint="symptom_analysis", user_id=user_id,
+        )
         model_used = MEDGEMMA_TEXT_MODEL
+        record_backend(_backend_label(), True)
     except Exception as e:
-        print(f"[MedGemma] Local symptom analysis failed ({e}), falling back to Gemma API...")
+        record_backend(_backend_label(), False)
+        logger.warning("Local symptom analysis failed (%s), falling back to Gemma API...", e)
         # ── Gemma API fallback ──
         try:
             from google.genai import types
             client = _get_gemma_fallback_client()
             full_prompt = "[System: You are a medical AI triage assistant. Respond only with valid JSON.]\n\n" + prompt
-            response = client.models.generate_content(
-                model=GEMMA_FALLBACK_MODEL,
-                contents=[types.Content(role="user", parts=[types.Part(text=full_prompt)])],
-                config=types.GenerateContentConfig(temperature=0.2, max_output_tokens=2048),
-            )
+            with _gemma_api_span("symptom_analysis"):
+                response = client.models.generate_content(
+                    model=GEMMA_FALLBACK_MODEL,
+                    contents=[types.Content(role="user", parts=[types.Part(text=full_prompt)])],
+                    config=types.GenerateContentConfig(
+                        temperature=0.2, max_output_tokens=_token_budget.budget_for("symptom_analysis"),
+                    ),
+                )
             response_text = response.text
             model_used = GEMMA_FALLBACK_MODEL
+            record_backend("gemma_api", True)
         except Exception as e2:
-            print(f"[MedGemma] Gemma API fallback also failed: {e2}")
+            record_backend("gemma_api", False)
+            logger.error("Gemma API fallback also failed: %s", e2)
             raise
 
     # Parse JSON response
-    response_text = response_text.strip()
-    if response_text.startswith("```"):
-        response_text = response_text.split("\n", 1)[1]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3].strip()
-
-    try:
-        result = json.loads(response_text)
-    except json.JSONDecodeError:
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            result = json.loads(json_match.group())
-        else:
-            result = {
-                "diagnosis": "Unable to parse AI response",
-                "suggested_conditions": ["Please consult a healthcare professional"],
-                "recommendations": response_text,
-                "urgency_level": "moderate",
-                "home_remedies": [],
-                "warning_signs": ["If symptoms worsen, seek immediate medical care"],
-                "should_see_doctor": True,
-                "triage_reasoning": "AI response could not be structured",
-                "follow_up": "Consult a healthcare professional as soon as possible"
-            }
+    result = _parse_json_response(response_text, SymptomAnalysisOutput, fallback={
+        "diagnosis": "Unable to parse AI response",
+        "suggested_conditions": ["Please consult a healthcare professional"],
+        "recommendations": response_text.strip(),
+        "urgency_level": "moderate",
+        "home_remedies": [],
+        "warning_signs": ["If symptoms worsen, seek immediate medical care"],
+        "should_see_doctor": True,
+        "triage_reasoning": "AI response could not be structured",
+        "follow_up": "Consult a healthcare professional as soon as possible"
+    })
 
     result["model"] = model_used
     return result
 
 
-async def medgemma_medicine_analysis(prescriptions: list, diagnosis: str = "", patient_history: str = ""):
+async def medgemma_medicine_analysis(prescriptions: list, diagnosis: str = "", patient_history: str = "",
+                                     user_id: str = None, patient_context: str = ""):
     """Use MedGemma for medicine interaction checking and recommendations."""
+    # Resolve brands to generics locally so the model doesn't have to
+    medicines = canonicalize_prescriptions(prescriptions)
+    known_interactions = interactions_for_prescriptions(medicines)
+    known_text = "\n".join(f"- {format_interaction_alert(f)}" for f in known_interactions) or "- None"
+    notes = knowledge_index.reference_notes(f"{diagnosis}. {patient_history}")
+    reference = f"REFERENCE NOTES (local knowledge base, use where relevant):\n{notes}\n\n" if notes else ""
+
     prompt = f"""As a medical AI assistant, analyze these prescribed medicines for a patient in rural Bangladesh.
 
-PRESCRIBED MEDICINES:
-{json.dumps(prescriptions, indent=2)}
+PRESCRIBED MEDICINES (brand = generic [class]):
+{format_prescriptions_for_prompt(medicines)}
+
+KNOWN INTERACTIONS (already checked, do not repeat):
+{known_text}
 
 DIAGNOSIS: {diagnosis or "Not specified"}
 PATIENT HISTORY: {patient_history or "Not provided"}
+PATIENT RECORD:
+{patient_context or "Not on record"}
 
-Provide analysis in JSON format:
+{reference}Provide analysis in JSON format:
 {{
     "suggestions": [
         {{
@@ -411,7 +854,7 @@ Provide analysis in JSON format:
     ],
     "overallRecommendation": "Summary guidance",
     "warnings": ["Critical warnings"],
-    "interactionAlerts": ["Any dangerous drug interactions found"]
+    "interactionAlerts": ["Any OTHER dangerous drug interactions not listed above"]
 }}
 
 Consider medicine availability and cost in rural Bangladesh. Respond ONLY with JSON."""
@@ -422,44 +865,44 @@ Consider medicine availability and cost in rural Bangladesh. Respond ONLY with J
             {"role": "system", "content": "You are a medical pharmacology AI. Respond only with valid JSON."},
             {"role": "user", "content": prompt},
         ]
-        response_text = _generate_text(chat_messages, temperature=0.2)
+        response_text = await asyncio.to_thread(
+            _generate_text, chat_messages, temperature=0.2, json_schema=MedicineAnalysisOutput,
+            endpoint="medicine_analysis", user_id=user_id,
+        )
         model_used = MEDGEMMA_TEXT_MODEL
+        record_backend(_backend_label(), True)
     except Exception as e:
-        print(f"[MedGemma] Local medicine analysis failed ({e}), falling back to Gemma API...")
+        record_backend(_backend_label(), False)
+        logger.warning("Local medicine analysis failed (%s), falling back to Gemma API...", e)
         # ── Gemma API fallback ──
         try:
             from google.genai import types
             client = _get_gemma_fallback_client()
             full_prompt = "[System: You are a medical pharmacology AI. Respond only with valid JSON.]\n\n" + prompt
-            response = client.models.generate_content(
-                model=GEMMA_FALLBACK_MODEL,
-                contents=[types.Content(role="user", parts=[types.Part(text=full_prompt)])],
-                config=types.GenerateContentConfig(temperature=0.2, max_output_tokens=2048),
-            )
+            with _gemma_api_span("medicine_analysis"):
+                response = client.models.generate_content(
+                    model=GEMMA_FALLBACK_MODEL,
+                    contents=[types.Content(role="user", parts=[types.Part(text=full_prompt)])],
+                    config=types.GenerateContentConfig(
+                        temperature=0.2, max_output_tokens=_token_budget.budget_for("medicine_analysis"),
+                    ),
+                )
             response_text = response.text
             model_used = GEMMA_FALLBACK_MODEL
+            record_backend("gemma_api", True)
         except Exception as e2:
-            print(f"[MedGemma] Gemma API fallback also failed: {e2}")
+            record_backend("gemma_api", False)
+            logger.error("Gemma API fallback also failed: %s", e2)
             raise
 
-    response_text = response_text.strip()
-    if response_text.startswith("```"):
-        response_text = response_text.split("\n", 1)[1]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3].strip()
-
-    try:
-        result = json.loads(response_text)
-    except json.JSONDecodeError:
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            result = json.loads(json_match.group())
-        else:
-            result = {
-                "suggestions": [],
-                "overallRecommendation": "Unable to analyze. Please consult a healthcare professional.",
-                "warnings": ["AI analysis unavailable. Seek professional medical advice."]
-            }
+    result = _parse_json_response(response_text, MedicineAnalysisOutput, fallback={
+        "suggestions": [],
+        "overallRecommendation": "Unable to analyze. Please consult a healthcare professional.",
+        "warnings": ["AI analysis unavailable. Seek professional medical advice."]
+    })
 
+    result["interactionAlerts"] = merge_interaction_alerts(known_interactions, result.get("interactionAlerts"))
+    result["known_interactions"] = known_interactions
     result["model"] = model_used
+    result["canonical_medicines"] = [item["canonical"] for item in medicines if item["canonical"]]
     return result
@@ -0,0 +1,262 @@
+"""
+Bisheshoggo AI - Metrics
+Minimal Prometheus-compatible counters and histograms, exposed at /metrics.
+
+Recording is lock-free: every thread writes to its own shard of each metric
+and the shards are only summed when /metrics is scraped. Values that are
+cheap to read on demand (cache stats, RSS, VRAM) are produced by collector
+callbacks at scrape time and cost nothing on the hot path.
+"""
+import logging
+import os
+import sys
+import time
+from bisect import bisect_left
+from threading import get_ident
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_collectors = []
+_caches = {}  # cache name -> callable returning (hits, misses)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = {}  # thread id -> {label values: [values]}
+        _registry.append(self)
+
+    def _slot(self, labels: dict, size: int):
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(get_ident(), {})
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0.0] * size
+        return values
+
+    def _merged(self):
+        merged = {}
+        for shard in list(self._shards.values()):
+            for key, values in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(values)
+                else:
+                    for i, v in enumerate(values):
+                        total[i] += v
+        return merged
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        self._slot(labels, 1)[0] += amount
+
+    def render(self):
+        for key, (value,) in sorted(self._merged().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        # layout: [count per bucket..., +Inf count, sum]
+        values = self._slot(labels, len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the elapsed wall time."""
+        return _Timer(self, labels)
+
+    def render(self):
+        for key, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative:g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative:g}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {values[-1]:g}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def register_collector(fn):
+    """
+    Register a scrape-time callback returning (name, kind, help, [(labels, value)]).
+    Usable as a decorator.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def register_cache(name: str, stats_fn):
+    """Expose a cache's hit/miss counts; ``stats_fn`` returns (hits, misses)."""
+    _caches[name] = stats_fn
+
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            logger.warning("Collector %s failed: %s", collector.__name__, e)
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Application metrics ──────────────────────────────────────────
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+INFERENCE_SECONDS = Histogram(
+    "medgemma_inference_seconds", "Local MedGemma inference time split into prefill and decode",
+    ("endpoint", "phase"),
+)
+TOKENS_GENERATED = Counter(
+    "medgemma_tokens_generated_total", "Tokens generated by the local MedGemma model", ("endpoint",),
+)
+AI_BACKEND_REQUESTS = Counter(
+    "ai_backend_requests_total", "AI backend attempts in the fallback chain", ("backend", "outcome"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+def record_backend(backend: str, success: bool):
+    """Count one attempt against an AI backend."""
+    AI_BACKEND_REQUESTS.inc(backend=backend, outcome="success" if success else "failure")
+
+
+# ── Instrumentation hooks ────────────────────────────────────────
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_holder[0],
+            )
+
+
+def instrument_engine(engine):
+    """Time every SQL statement executed through ``engine``."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation=operation)
+
+
+# ── Scrape-time collectors ───────────────────────────────────────
+@register_collector
+def _process_memory():
+    rss = None
+    try:
+        import psutil
+        rss = psutil.Process().memory_info().rss
+    except ImportError:
+        try:
+            with open("/proc/self/statm") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            pass
+    families = []
+    if rss is not None:
+        families.append(("process_resident_memory_bytes", "gauge", "Resident set size", [({}, rss)]))
+
+    # Only report VRAM if the ML stack is already loaded; never import torch here
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        families.append((
+            "medgemma_vram_allocated_bytes", "gauge", "CUDA memory allocated by this process",
+            [({"device": "cuda:0"}, torch.cuda.memory_allocated(0))],
+        ))
+    return families
+
+
+@register_collector
+def _cache_hit_rates():
+    samples = []
+    for name, stats_fn in list(_caches.items()):
+        hits, misses = stats_fn()
+        samples.append(({"cache": name, "result": "hit"}, hits))
+        samples.append(({"cache": name, "result": "miss"}, misses))
+    return [("cache_requests_total", "counter", "Cache lookups by cache and result", samples)]
@@ -3,7 +3,7 @@ Bisheshoggo AI - SQLAlchemy Database Models
 """
 from sqlalchemy import (
     Column, String, Integer, Float, Boolean, Text, DateTime, 
-    ForeignKey, Enum, JSON, Date
+    ForeignKey, Enum, JSON, Date, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -110,6 +110,8 @@ class ProviderProfile(Base):
     is_available = Column(Boolean, default=True)
     languages = Column(JSON, default=list)
     bio = Column(Text, nullable=True)
+    latitude = Column(Float, nullable=True)  # Practice location, for distance search
+    longitude = Column(Float, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="provider_profile")
@@ -185,6 +187,20 @@ class Consultation(Base):
     patient = relationship("User", foreign_keys=[patient_id], back_populates="patient_consultations")
     provider = relationship("User", foreign_keys=[provider_id], back_populates="provider_consultations")
     messages = relationship("ConsultationMessage", back_populates="consultation")
+    slots = relationship("ProviderSlot", back_populates="consultation", cascade="all, delete-orphan")
+
+
+# Provider Booked Slots (one row per schedule grid slot a consultation occupies)
+class ProviderSlot(Base):
+    __tablename__ = "provider_slots"
+    
+    # The composite primary key is what rejects a double booking, per slot row
+    provider_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    slot_start = Column(DateTime, primary_key=True)  # naive UTC, aligned to CONSULTATION_SLOT_MINUTES
+    consultation_id = Column(String, ForeignKey("consultations.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Relationships
+    consultation = relationship("Consultation", back_populates="slots")
 
 
 # Emergency SOS
@@ -246,6 +262,11 @@ class ConsultationMessage(Base):
     # Relationships
     consultation = relationship("Consultation", back_populates="messages")
     sender = relationship("User")
+    
+    # Keyset pagination over (created_at, id) within a consultation
+    __table_args__ = (
+        Index("ix_consultation_messages_keyset", "consultation_id", "created_at", "id"),
+    )
 
 
 # Offline Sync Queue
@@ -261,3 +282,12 @@ class OfflineSyncQueue(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     synced_at = Column(DateTime(timezone=True), nullable=True)
 
+
+# Collection Version Stamps (HTTP conditional requests)
+class CollectionVersion(Base):
+    __tablename__ = "collection_versions"
+    
+    collection = Column(String, primary_key=True)  # 'facilities', 'medical_records', ...
+    scope = Column(String, primary_key=True, default="")  # user id for per-user collections, '' for global
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,178 @@
+"""
+Bisheshoggo AI - Patient Context
+Compact, token-budgeted clinical summary of a patient for AI prompts.
+
+Every AI endpoint that personalizes its prompt gets the patient's
+background from here. The summary covers demographics, allergies, current
+medications, known conditions and the most recent diagnoses, taken from
+completed consultations and medical records. It is built once and reused
+until the patient's "profile", "medical_records" or "consultations"
+collection version changes (see http_cache), so a prompt costs one
+primary-key version read instead of three queries and the formatting.
+
+The summary stays within PATIENT_CONTEXT_MAX_TOKENS. When it would not fit,
+items are dropped from the lowest-priority fields first: older diagnoses,
+then demographics, conditions and medications. Allergies go last, because
+a prompt without them is the unsafe one. Dropped items are counted
+("+2 more") rather than silently lost.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .http_cache import get_versions
+from .metrics import register_cache
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt tokens: ~4 ASCII characters per token, ~2 for Bengali and other scripts"""
+    ascii_chars = sum(1 for char in text if char < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def _age(born: Optional[date], today: date) -> Optional[int]:
+    if born is None:
+        return None
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def _day(value) -> Optional[date]:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _recent_diagnoses(db: Session, patient_id: str, limit: int) -> List[str]:
+    """Newest first, from completed consultations and medical records, one entry per distinct diagnosis"""
+    consultation, record = models.Consultation, models.MedicalRecord
+    entries = [
+        (_day(ended_at or created_at), diagnosis, prescription)
+        for diagnosis, prescription, ended_at, created_at in db.execute(
+            select(consultation.diagnosis, consultation.prescription, consultation.ended_at, consultation.created_at)
+            .where(consultation.patient_id == patient_id,
+                   consultation.status == models.ConsultationStatus.completed,
+                   consultation.diagnosis.isnot(None))
+            .order_by(consultation.created_at.desc()).limit(limit)
+        )
+    ]
+    entries += [
+        (_day(record_date or created_at), diagnosis, None)
+        for diagnosis, record_date, created_at in db.execute(
+            select(record.diagnosis, record.record_date, record.created_at)
+            .where(record.patient_id == patient_id, record.diagnosis.isnot(None))
+            .order_by(record.record_date.desc(), record.created_at.desc()).limit(limit)
+        )
+    ]
+    entries.sort(key=lambda entry: entry[0] or date.min, reverse=True)
+
+    seen, diagnoses = set(), []
+    for day, diagnosis, prescription in entries:
+        diagnosis = diagnosis.strip()
+        if not diagnosis or diagnosis.lower() in seen:
+            continue
+        seen.add(diagnosis.lower())
+        text = f"{day.isoformat()} {diagnosis}" if day else diagnosis
+        if prescription and prescription.strip():
+            text += f" (Rx: {prescription.strip()})"
+        diagnoses.append(text)
+    return diagnoses[:limit]
+
+
+_DISPLAY_ORDER = ("Patient", "Allergies", "Current medications", "Conditions", "Recent diagnoses")
+
+
+def _fit(fields: List[Tuple[str, List[str]]], budget: int) -> str:
+    """
+    Render "Label: item; item" lines, taking items field by field in
+    priority order (the order of ``fields``) while they fit ``budget``.
+    Lines come out in the order of ``_DISPLAY_ORDER``.
+    """
+    kept = {label: [] for label, _ in fields}
+    dropped = {label: 0 for label, _ in fields}
+    used = 0
+    for label, items in fields:
+        for item in items:
+            cost = estimate_tokens(f"{item}; ") + (0 if kept[label] else estimate_tokens(f"{label}: \n"))
+            if dropped[label] or used + cost > budget:
+                dropped[label] += 1
+                continue
+            kept[label].append(item)
+            used += cost
+    lines = []
+    for label in _DISPLAY_ORDER:
+        if label not in kept or not (kept[label] or dropped[label]):
+            continue
+        text = "; ".join(kept[label])
+        if dropped[label]:
+            text = f"{text}; +{dropped[label]} more" if text else f"({dropped[label]} omitted)"
+        lines.append(f"{label}: {text}")
+    return "\n".join(lines)
+
+
+def build_patient_context(db: Session, patient_id: str, max_tokens: int = None, today: date = None) -> str:
+    """The summary for ``patient_id``, or "" when nothing is on record"""
+    today = today or date.today()
+    profile = db.execute(select(
+        models.PatientProfile.date_of_birth, models.PatientProfile.gender, models.PatientProfile.blood_group,
+        models.PatientProfile.district, models.PatientProfile.allergies,
+        models.PatientProfile.current_medications, models.PatientProfile.medical_conditions,
+    ).where(models.PatientProfile.user_id == patient_id)).first()
+
+    demographics, allergies, medications, conditions = [], [], [], []
+    if profile is not None:
+        age = _age(profile.date_of_birth, today)
+        demographics = [value for value in (
+            f"{age}y" if age is not None else None,
+            profile.gender,
+            f"blood group {profile.blood_group}" if profile.blood_group else None,
+            f"{profile.district} district" if profile.district else None,
+        ) if value]
+        allergies = [str(item) for item in profile.allergies or [] if item]
+        medications = [str(item) for item in profile.current_medications or [] if item]
+        conditions = [str(item) for item in profile.medical_conditions or [] if item]
+    diagnoses = _recent_diagnoses(db, patient_id, settings.PATIENT_CONTEXT_RECENT_DIAGNOSES)
+
+    return _fit([
+        ("Allergies", allergies),
+        ("Current medications", medications),
+        ("Conditions", conditions),
+        ("Patient", demographics),
+        ("Recent diagnoses", diagnoses),
+    ], max_tokens or settings.PATIENT_CONTEXT_MAX_TOKENS)
+
+
+class PatientContextCache:
+    """Per-patient summaries (LRU-bounded), rebuilt when the patient's collection versions move."""
+
+    def __init__(self, max_entries: int = None):
+        self._entries: "OrderedDict[str, Tuple[tuple, str]]" = OrderedDict()
+        self._max_entries = max_entries or settings.PATIENT_CONTEXT_CACHE_SIZE
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, patient_id: str) -> str:
+        keys = [("profile", patient_id), ("medical_records", patient_id), ("consultations", patient_id)]
+        versions = get_versions(db, keys)
+        # Ages change on birthdays, so the day is part of the stamp too
+        stamp = (tuple(versions[key][0] for key in keys), date.today())
+        with self._lock:
+            cached = self._entries.get(patient_id)
+            if cached is not None and cached[0] == stamp:
+                self._entries.move_to_end(patient_id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        context = build_patient_context(db, patient_id, today=stamp[1])
+        with self._lock:
+            self._entries[patient_id] = (stamp, context)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+
+patient_contexts = PatientContextCache()
+register_cache("patient_context", lambda: (patient_contexts.hits, patient_contexts.misses))
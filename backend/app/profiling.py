@@ -0,0 +1,199 @@
+"""
+Bisheshoggo AI - Sampling Profiler
+Low-overhead wall-clock profiler for a running worker.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks. Nothing
+is hooked into the interpreter, so the profiled code runs at full speed; the
+cost is one stack walk per thread per tick on the sampler thread. Output is
+the collapsed-stack format understood by flamegraph.pl, speedscope and
+inferno:
+
+    MainThread;uvicorn.server:serve;...;sqlalchemy.orm.loading:instances 42
+
+Two ways in:
+  * an admin starts/stops a worker-wide profile (routers/admin.py);
+  * a single request opts in with ``X-Profile: <PROFILER_REQUEST_TOKEN>``;
+    its profile is kept under the request ID for the admin endpoint to fetch.
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+from .config import settings
+from .logging_config import request_id_var
+
+# Leaf frames of threads that are parked, not working. Dropping them keeps
+# idle thread-pool workers and an idle event loop out of the flamegraph.
+_IDLE_LEAVES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("logging.handlers", "dequeue"),
+    ("selectors", "select"),
+    ("concurrent.futures.thread", "_worker"),
+}
+
+_MAX_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    """Collect collapsed stacks of all threads until stopped or ``max_seconds`` elapse."""
+
+    def __init__(self, interval: float = None, max_seconds: float = None, include_idle: bool = False):
+        self.interval = max(interval or settings.PROFILER_INTERVAL_MS / 1000, 0.001)
+        self.max_seconds = max_seconds or settings.PROFILER_MAX_SECONDS
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                break
+            self._sample(own_id)
+        self.stopped_at = time.time()
+
+    def _sample(self, own_id: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if not self.include_idle:
+                leaf = (frame.f_globals.get("__name__"), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES:
+                    continue
+            labels = []
+            while frame is not None and len(labels) < _MAX_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """Flamegraph-compatible ``stack count`` lines, heaviest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "duration_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+
+# ── Worker-wide session (admin endpoint) ─────────────────────────
+_lock = threading.Lock()
+_session: Optional[SamplingProfiler] = None
+
+
+def start_profiling(interval_ms: float = None, max_seconds: float = None, include_idle: bool = False) -> SamplingProfiler:
+    """Start the worker-wide profiler; raises RuntimeError if one is already running."""
+    global _session
+    with _lock:
+        if _session is not None and _session.running:
+            raise RuntimeError("Profiler already running")
+        _session = SamplingProfiler(
+            interval=interval_ms / 1000 if interval_ms else None,
+            max_seconds=max_seconds,
+            include_idle=include_idle,
+        ).start()
+        return _session
+
+
+def stop_profiling() -> Optional[SamplingProfiler]:
+    """Stop the worker-wide profiler (if any) and return it with its samples."""
+    global _session
+    with _lock:
+        session, _session = _session, None
+    return session.stop() if session is not None else None
+
+
+def profiling_status() -> dict:
+    session = _session
+    return session.summary() if session is not None else {"running": False}
+
+
+# ── Per-request profiles (X-Profile header) ──────────────────────
+_request_profiles: "OrderedDict[str, SamplingProfiler]" = OrderedDict()
+
+
+def get_request_profile(request_id: str) -> Optional[SamplingProfiler]:
+    return _request_profiles.get(request_id)
+
+
+def _keep_request_profile(request_id: str, profiler: SamplingProfiler):
+    with _lock:
+        _request_profiles[request_id] = profiler
+        _request_profiles.move_to_end(request_id)
+        while len(_request_profiles) > settings.PROFILER_REQUEST_HISTORY:
+            _request_profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that send ``X-Profile`` with the
+    configured token, from the first byte in to the last byte out. Samples
+    cover the whole worker, so requests running concurrently on the same
+    event loop show up too; profile on a quiet worker for a clean picture.
+    """
+
+    def __init__(self, app, header: str = "x-profile"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        token = settings.PROFILER_REQUEST_TOKEN
+        if scope["type"] != "http" or not token:
+            return await self.app(scope, receive, send)
+        if not any(name == self.header and value.decode("latin-1") == token for name, value in scope["headers"]):
+            return await self.app(scope, receive, send)
+
+        profiler = SamplingProfiler().start()
+        request_id = request_id_var.get()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # stop() joins the sampler thread (up to one interval); don't stall the loop on it
+            await asyncio.to_thread(profiler.stop)
+            _keep_request_profile(request_id, profiler)
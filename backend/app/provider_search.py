@@ -0,0 +1,224 @@
+"""
+Bisheshoggo AI - Provider Search
+Process-local inverted index over available providers.
+
+The snapshot of every available provider (read_models.list_providers) is
+rebuilt whenever the "providers" or "users" collection version changes
+(see http_cache). A version check is a primary-key read, made once per
+search. The snapshot holds:
+
+  * a term index: token -> {provider: weighted term frequency} over name,
+    specialization, qualification, languages and bio, plus a sorted
+    vocabulary for prefix matches ("cardio" -> "cardiology");
+  * exact-value posting sets for specialization, language and telemedicine;
+  * fee and experience arrays sorted for bisect range filters.
+
+A search intersects the posting sets smallest first. It computes distance
+only for the surviving candidates, then ranks and paginates. Text
+relevance is a BM25-style tf-idf; ties go to more experienced, then
+nearer providers.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from . import read_models
+from .http_cache import get_versions
+
+_TOKEN = re.compile(r"[\w\u0980-\u09FF]+")  # \w alone splits Bengali words at vowel signs
+_FIELD_WEIGHTS = (("specialization", 3.0), ("full_name", 2.0), ("qualification", 1.5), ("languages", 1.0), ("bio", 1.0))
+_PREFIX_FACTOR = 0.6  # a prefix match counts for less than the whole word
+_EARTH_RADIUS_KM = 6371.0
+_VERSION_KEYS = [("providers", ""), ("users", "")]
+
+SORTS = ("relevance", "distance", "fee", "experience")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class SearchHit(NamedTuple):
+    provider: read_models.ProviderRow
+    score: float
+    distance_km: Optional[float]
+
+
+def _field_text(row: read_models.ProviderRow, field: str) -> Optional[str]:
+    if field == "full_name":
+        return row.user.full_name
+    if field == "languages":
+        return " ".join(row.languages or [])
+    return getattr(row, field)
+
+
+def _sorted_range(values: List[Tuple[float, int]]) -> Tuple[list, list]:
+    values.sort()
+    return [value for value, _ in values], [position for _, position in values]
+
+
+class _Snapshot:
+    """Immutable provider rows plus their indexes."""
+
+    def __init__(self, rows: List[read_models.ProviderRow], stamp: tuple):
+        self.stamp = stamp
+        self.rows = rows
+        terms: Dict[str, Dict[int, float]] = defaultdict(dict)
+        specializations, languages = defaultdict(set), defaultdict(set)
+        fees, experience = [], []
+        self.telemedicine: Set[int] = set()
+        for position, row in enumerate(rows):
+            for field, weight in _FIELD_WEIGHTS:
+                for token in tokenize(_field_text(row, field)):
+                    postings = terms[token]
+                    postings[position] = postings.get(position, 0.0) + weight
+            if row.specialization:
+                specializations[row.specialization.lower()].add(position)
+            for language in row.languages or []:
+                languages[language.lower()].add(position)
+            if row.available_for_telemedicine:
+                self.telemedicine.add(position)
+            if row.consultation_fee is not None:
+                fees.append((row.consultation_fee, position))
+            if row.years_of_experience is not None:
+                experience.append((row.years_of_experience, position))
+        self.terms = dict(terms)
+        self.vocabulary = sorted(self.terms)
+        self.specializations = dict(specializations)
+        self.languages = dict(languages)
+        self.fees = _sorted_range(fees)
+        self.experience = _sorted_range(experience)
+
+    def in_range(self, index: Tuple[list, list], low: Optional[float], high: Optional[float]) -> Set[int]:
+        values, positions = index
+        start = bisect_left(values, low) if low is not None else 0
+        end = bisect_right(values, high) if high is not None else len(values)
+        return set(positions[start:end])
+
+    def text_scores(self, query: str) -> Dict[int, float]:
+        """tf-idf per provider, summed over query tokens (whole-word or prefix matches)"""
+        scores: Dict[int, float] = defaultdict(float)
+        total = len(self.rows)
+        for token in set(tokenize(query)):
+            matches = [(token, 1.0)] if token in self.terms else []
+            if len(token) >= 3:
+                i = bisect_left(self.vocabulary, token)
+                while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+                    if self.vocabulary[i] != token:
+                        matches.append((self.vocabulary[i], _PREFIX_FACTOR))
+                    i += 1
+            best: Dict[int, float] = {}
+            for term, factor in matches:
+                postings = self.terms[term]
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, tf in postings.items():
+                    # Saturating tf (BM25 with k1 = 1.2, no length normalization)
+                    score = factor * idf * tf * 2.2 / (tf + 1.2)
+                    if score > best.get(position, 0.0):
+                        best[position] = score
+            for position, score in best.items():
+                scores[position] += score
+        return scores
+
+
+class ProviderSearchIndex:
+    """Searchable, version-checked view of the available providers."""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    def ensure_fresh(self, db: Session) -> _Snapshot:
+        versions = get_versions(db, _VERSION_KEYS)
+        stamp = tuple(versions[key][0] for key in _VERSION_KEYS)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.stamp != stamp:
+            with self._lock:
+                snapshot = _Snapshot(read_models.list_providers(db), stamp)
+                self._snapshot = snapshot
+        return snapshot
+
+    def search(
+        self,
+        db: Session,
+        query: str = None,
+        specialization: str = None,
+        languages: List[str] = None,
+        min_fee: float = None,
+        max_fee: float = None,
+        min_experience: int = None,
+        telemedicine: bool = None,
+        latitude: float = None,
+        longitude: float = None,
+        radius_km: float = None,
+        sort: str = "relevance",
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[SearchHit]]:
+        """(total matches, one ranked page of hits)"""
+        snapshot = self.ensure_fresh(db)
+
+        filters: List[Set[int]] = []
+        if specialization:
+            filters.append(snapshot.specializations.get(specialization.lower(), set()))
+        if languages:
+            filters.append(set().union(*(snapshot.languages.get(language.lower(), set()) for language in languages)))
+        if min_fee is not None or max_fee is not None:
+            filters.append(snapshot.in_range(snapshot.fees, min_fee, max_fee))
+        if min_experience is not None:
+            filters.append(snapshot.in_range(snapshot.experience, min_experience, None))
+        if telemedicine is not None:
+            filters.append(snapshot.telemedicine if telemedicine else set(range(len(snapshot.rows))) - snapshot.telemedicine)
+        scores = snapshot.text_scores(query) if query and query.strip() else None
+        if scores is not None:
+            filters.append(set(scores))
+
+        if filters:
+            filters.sort(key=len)
+            candidates = set(filters[0]).intersection(*filters[1:])
+        else:
+            candidates = set(range(len(snapshot.rows)))
+
+        located = latitude is not None and longitude is not None
+        hits = []
+        for position in candidates:
+            row = snapshot.rows[position]
+            distance = None
+            if located:
+                if row.latitude is None or row.longitude is None:
+                    if radius_km is not None:
+                        continue
+                else:
+                    distance = haversine_km(latitude, longitude, row.latitude, row.longitude)
+                    if radius_km is not None and distance > radius_km:
+                        continue
+            hits.append(SearchHit(row, scores.get(position, 0.0) if scores else 0.0, distance))
+
+        far = float("inf")
+        if sort == "distance" or (sort == "relevance" and scores is None and located):
+            key = lambda hit: (far if hit.distance_km is None else hit.distance_km, -hit.score)
+        elif sort == "fee":
+            key = lambda hit: (far if hit.provider.consultation_fee is None else hit.provider.consultation_fee, -hit.score)
+        elif sort == "experience":
+            key = lambda hit: (-(hit.provider.years_of_experience or 0), -hit.score)
+        else:
+            key = lambda hit: (
+                -hit.score,
+                -(hit.provider.years_of_experience or 0),
+                far if hit.distance_km is None else hit.distance_km,
+            )
+        page = heapq.nsmallest(offset + limit, hits, key=lambda hit: (*key(hit), hit.provider.user.full_name, hit.provider.id))
+        return len(hits), page[offset:]
+
+
+provider_index = ProviderSearchIndex()
@@ -0,0 +1,181 @@
+"""
+Bisheshoggo AI - Read Models
+Narrow column projections for list endpoints.
+
+Loading full ORM entities for a listing costs an identity-map entry, instance
+state and attribute instrumentation per row, plus whole joined rows
+(password hashes included) for relationships we read one or two fields
+from. These queries select only the columns a listing returns and hand back
+plain named tuples. Field names mirror the entity attributes, so the
+response schemas validate a read row and an ORM instance alike. Write paths
+and single-item routes keep using the ORM entities.
+"""
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, aliased
+from . import models
+
+
+class FacilityRow(NamedTuple):
+    id: str
+    name: str
+    facility_type: models.FacilityType
+    phone: Optional[str]
+    address: str
+    village: Optional[str]
+    district: str
+    division: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    operating_hours: Optional[str]
+    services_offered: Optional[list]
+    has_ambulance: bool
+    has_emergency: bool
+    is_active: bool
+    contact_person: Optional[str]
+    created_by: Optional[str]
+    created_at: Optional[datetime]
+
+
+class ProviderUserRow(NamedTuple):
+    full_name: str
+    email: str
+    phone: Optional[str]
+    avatar_url: Optional[str]
+
+
+class ProviderRow(NamedTuple):
+    id: str
+    user_id: str
+    specialization: Optional[str]
+    license_number: Optional[str]
+    qualification: Optional[str]
+    years_of_experience: Optional[int]
+    consultation_fee: Optional[float]
+    available_for_telemedicine: bool
+    is_available: bool
+    languages: Optional[list]
+    bio: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    user: ProviderUserRow
+
+
+class RecordProviderRow(NamedTuple):
+    full_name: str
+
+
+class MedicalRecordRow(NamedTuple):
+    id: str
+    patient_id: str
+    provider_id: Optional[str]
+    consultation_id: Optional[str]
+    record_type: str
+    title: str
+    description: Optional[str]
+    diagnosis: Optional[str]
+    prescriptions: Optional[dict]
+    attachments: Optional[list]
+    document_url: Optional[str]
+    record_date: date
+    created_at: Optional[datetime]
+    provider: Optional[RecordProviderRow]
+
+
+class ConsultationMessageRow(NamedTuple):
+    id: str
+    consultation_id: str
+    sender_id: str
+    message: str
+    attachment_url: Optional[str]
+    created_at: datetime
+
+
+def _columns(entity, row_type, exclude=()) -> list:
+    return [getattr(entity, field) for field in row_type._fields if field not in exclude]
+
+
+FACILITY_COLUMNS = _columns(models.MedicalFacility, FacilityRow)
+PROVIDER_COLUMNS = _columns(models.ProviderProfile, ProviderRow, exclude=("user",))
+PROVIDER_USER_COLUMNS = _columns(models.User, ProviderUserRow)
+MEDICAL_RECORD_COLUMNS = _columns(models.MedicalRecord, MedicalRecordRow, exclude=("provider",))
+CONSULTATION_MESSAGE_COLUMNS = _columns(models.ConsultationMessage, ConsultationMessageRow)
+
+
+def list_facilities(db: Session, facility_type: str = None, district: str = None, active_only: bool = True) -> List[FacilityRow]:
+    """Facilities ordered by name (active ones only, unless ``active_only`` is False)"""
+    stmt = select(*FACILITY_COLUMNS)
+    if active_only:
+        stmt = stmt.where(models.MedicalFacility.is_active == True)
+    if facility_type:
+        stmt = stmt.where(models.MedicalFacility.facility_type == facility_type)
+    if district:
+        stmt = stmt.where(models.MedicalFacility.district == district)
+    stmt = stmt.order_by(models.MedicalFacility.name)
+    return [FacilityRow._make(row) for row in db.execute(stmt)]
+
+
+def list_providers(db: Session, specialization: str = None) -> List[ProviderRow]:
+    """Available providers with the contact fields of their user account"""
+    stmt = select(*PROVIDER_COLUMNS, *PROVIDER_USER_COLUMNS).join(
+        models.User, models.ProviderProfile.user_id == models.User.id
+    ).where(models.ProviderProfile.is_available == True)
+    if specialization:
+        stmt = stmt.where(models.ProviderProfile.specialization == specialization)
+    split = len(PROVIDER_COLUMNS)
+    return [
+        ProviderRow(*row[:split], ProviderUserRow._make(row[split:]))
+        for row in db.execute(stmt)
+    ]
+
+
+def list_medical_records(db: Session, patient_id: str) -> List[MedicalRecordRow]:
+    """A patient's records, newest first, with the provider's name"""
+    provider = aliased(models.User)
+    stmt = select(*MEDICAL_RECORD_COLUMNS, provider.full_name).outerjoin(
+        provider, models.MedicalRecord.provider_id == provider.id
+    ).where(
+        models.MedicalRecord.patient_id == patient_id
+    ).order_by(models.MedicalRecord.created_at.desc())
+    return [
+        MedicalRecordRow(*row[:-1], RecordProviderRow(row[-1]) if row[-1] is not None else None)
+        for row in db.execute(stmt)
+    ]
+
+
+def list_consultation_messages(
+    db: Session, consultation_id: str, before: str = None, after: str = None, limit: int = 50
+) -> Optional[Tuple[List[ConsultationMessageRow], bool]]:
+    """
+    One page of a consultation's messages in chronological order, plus whether
+    more exist beyond it. Keyset-paginated on (created_at, id): ``before`` or
+    ``after`` is a message id, and the page is the ``limit`` messages right
+    before it (default: the latest ones) or right after it. Returns None if
+    the cursor message is not in this consultation.
+    """
+    message = models.ConsultationMessage
+    stmt = select(*CONSULTATION_MESSAGE_COLUMNS).where(message.consultation_id == consultation_id)
+    cursor_id = after or before
+    if cursor_id:
+        cursor_at = db.execute(select(message.created_at).where(
+            message.id == cursor_id, message.consultation_id == consultation_id
+        )).scalar_one_or_none()
+        if cursor_at is None:
+            return None
+    if after:
+        stmt = stmt.where(or_(
+            message.created_at > cursor_at, and_(message.created_at == cursor_at, message.id > cursor_id)
+        )).order_by(message.created_at, message.id)
+    else:
+        if before:
+            stmt = stmt.where(or_(
+                message.created_at < cursor_at, and_(message.created_at == cursor_at, message.id < cursor_id)
+            ))
+        stmt = stmt.order_by(message.created_at.desc(), message.id.desc())
+    rows = [ConsultationMessageRow._make(row) for row in db.execute(stmt.limit(limit + 1))]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+    return rows, has_more
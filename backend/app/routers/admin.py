@@ -0,0 +1,51 @@
+"""
+Bisheshoggo AI - Admin Routes
+Operational tooling for the worker serving the request.
+"""
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from .. import models
+from ..auth import get_current_admin
+from ..profiling import get_request_profile, profiling_status, start_profiling, stop_profiling
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.post("/profiler/start")
+async def start_profiler(
+    interval_ms: float = Query(None, gt=0, le=1000),
+    max_seconds: float = Query(None, gt=0, le=3600),
+    include_idle: bool = False,
+    admin: models.User = Depends(get_current_admin)
+):
+    """Start sampling every thread of this worker"""
+    try:
+        session = start_profiling(interval_ms=interval_ms, max_seconds=max_seconds, include_idle=include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "data": session.summary()}
+
+
+@router.get("/profiler/status")
+async def profiler_status(admin: models.User = Depends(get_current_admin)):
+    """Whether a profile is running and how many samples it holds"""
+    return {"data": profiling_status()}
+
+
+@router.post("/profiler/stop", response_class=PlainTextResponse)
+async def stop_profiler(admin: models.User = Depends(get_current_admin)):
+    """Stop the profiler and return collapsed stacks (flamegraph.pl / speedscope input)"""
+    session = await asyncio.to_thread(stop_profiling)  # joins the sampler thread
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is not running")
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Samples": str(session.samples)})
+
+
+@router.get("/profiler/requests/{request_id}", response_class=PlainTextResponse)
+async def get_request_profile_stacks(request_id: str, admin: models.User = Depends(get_current_admin)):
+    """Collapsed stacks of a request sent with the X-Profile header"""
+    profile = get_request_profile(request_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile for this request")
+    return PlainTextResponse(profile.collapsed(), headers={"X-Profile-Samples": str(profile.samples)})
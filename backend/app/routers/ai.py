@@ -3,16 +3,34 @@ Bisheshoggo AI - AI Chat and Medicine Suggestion Routes
 Powered by MedGemma (Google HAI-DEF) and Groq
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import iterate_in_threadpool
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Iterable, Iterator, List
+import asyncio
 import json
+import time
 import os
+import logging
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_user
 from ..config import settings
-from ..medgemma_service import medgemma_chat, medgemma_symptom_analysis, medgemma_medicine_analysis
+from ..metrics import record_backend
+from ..inference_backends import get_groq_client
+from ..tracing import start_span
+from ..medgemma_service import (
+    medgemma_chat, medgemma_symptom_analysis, medgemma_medicine_analysis,
+    last_user_message, with_patient_context, with_reference_notes,
+)
+from ..knowledge_index import knowledge_index
+from ..patient_context import patient_contexts
+from ..drug_dictionary import canonicalize_prescriptions, format_prescriptions_for_prompt
+from ..drug_interactions import (
+    interactions_for_prescriptions, format_interaction_alert, merge_interaction_alerts,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
@@ -38,6 +56,33 @@ Important guidelines:
 When asked about health data or patterns, provide insights with statistics."""
 
 
+def _system_prompt(request: schemas.ChatRequest, patient_context: str) -> str:
+    """SYSTEM_PROMPT plus the patient's background and knowledge-base notes for the latest question"""
+    messages = [{"role": m.role, "content": m.content} for m in request.messages]
+    return with_reference_notes(with_patient_context(SYSTEM_PROMPT, patient_context), last_user_message(messages))
+
+
+def batch_deltas(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Coalesce token deltas into fewer SSE events. A batch is emitted once it
+    is SSE_BATCH_MAX_CHARS long or SSE_BATCH_MS have passed since the last
+    event; the first delta always goes out alone to keep time-to-first-token.
+    """
+    window = settings.SSE_BATCH_MS / 1000
+    pending = []
+    size = 0
+    last_emit = None
+    for delta in deltas:
+        pending.append(delta)
+        size += len(delta)
+        now = time.monotonic()
+        if last_emit is None or size >= settings.SSE_BATCH_MAX_CHARS or now - last_emit >= window:
+            yield "".join(pending)
+            pending, size, last_emit = [], 0, now
+    if pending:
+        yield "".join(pending)
+
+
 @router.post("/chat")
 async def chat(
     request: schemas.ChatRequest,
@@ -45,21 +90,25 @@ async def chat(
     db: Session = Depends(get_db)
 ):
     """AI Chat endpoint - tries MedGemma first (non-streaming), falls back to Groq streaming"""
+    patient_context = patient_contexts.get(db, current_user.id)
     
     # Try MedGemma first (non-streaming but higher quality medical reasoning)
     try:
         messages = [{"role": m.role, "content": m.content} for m in request.messages]
-        result = await medgemma_chat(messages)
+        result = await medgemma_chat(messages, user_id=current_user.id, patient_context=patient_context)
         
         # Return as SSE format for compatibility with frontend
         async def generate_medgemma():
-            content = result["content"]
-            # Send in chunks to simulate streaming
-            chunk_size = 50
-            for i in range(0, len(content), chunk_size):
-                chunk = content[i:i+chunk_size]
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-            yield "data: [DONE]\n\n"
+            with start_span("sse.stream", {"ai.backend": "medgemma"}, attach=False) as span:
+                content = result["content"]
+                # Send in chunks to simulate streaming
+                chunk_size = 50
+                chunks = 0
+                for chunk in batch_deltas(content[i:i+chunk_size] for i in range(0, len(content), chunk_size)):
+                    chunks += 1
+                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+                yield "data: [DONE]\n\n"
+                span.set_attribute("sse.chunks", chunks)
         
         return StreamingResponse(
             generate_medgemma(),
@@ -70,32 +119,39 @@ async def chat(
             }
         )
     except Exception as medgemma_error:
-        print(f"[MedGemma] Streaming chat failed, falling back to Groq: {medgemma_error}")
+        logger.warning("MedGemma streaming chat failed, falling back to Groq: %s", medgemma_error)
     
     # Fallback to Groq streaming
     try:
-        from groq import Groq
-        
-        client = Groq(api_key=settings.GROQ_API_KEY)
+        client = get_groq_client()
         
         # Prepare messages with system prompt
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages = [{"role": "system", "content": _system_prompt(request, patient_context)}]
         messages.extend([{"role": m.role, "content": m.content} for m in request.messages])
         
         # Create streaming response
         async def generate():
-            stream = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=messages,
-                stream=True
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield f"data: {json.dumps({'content': chunk.choices[0].delta.content})}\n\n"
-            
-            yield "data: [DONE]\n\n"
+            with start_span("sse.stream", {"ai.backend": "groq"}, attach=False) as span:
+                stream = await asyncio.to_thread(
+                    client.chat.completions.create,
+                    model="llama-3.3-70b-versatile",
+                    messages=messages,
+                    stream=True
+                )
+                
+                chunks = 0
+                deltas = (chunk.choices[0].delta.content for chunk in stream if chunk.choices[0].delta.content)
+                # Each delta blocks on the network (or the stub's token rate); read them off the event loop
+                async for content in iterate_in_threadpool(batch_deltas(deltas)):
+                    if not chunks:
+                        span.add_event("first_chunk")
+                    chunks += 1
+                    yield f"data: {json.dumps({'content': content})}\n\n"
+                
+                yield "data: [DONE]\n\n"
+                span.set_attribute("sse.chunks", chunks)
         
+        record_backend("groq", True)
         return StreamingResponse(
             generate(),
             media_type="text/event-stream",
@@ -106,7 +162,8 @@ async def chat(
         )
     
     except Exception as e:
-        print(f"[Bisheshoggo AI] Chat Error: {e}")
+        record_backend("groq", False)
+        logger.error("Groq chat error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process chat request"
@@ -116,13 +173,15 @@ async def chat(
 @router.post("/chat/simple")
 async def chat_simple(
     request: schemas.ChatRequest,
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """Non-streaming AI Chat endpoint - uses MedGemma with Groq fallback"""
+    patient_context = patient_contexts.get(db, current_user.id)
     try:
         # Try MedGemma first (HAI-DEF model)
         messages = [{"role": m.role, "content": m.content} for m in request.messages]
-        result = await medgemma_chat(messages)
+        result = await medgemma_chat(messages, user_id=current_user.id, patient_context=patient_context)
         
         return {
             "content": result["content"],
@@ -131,21 +190,21 @@ async def chat_simple(
             "powered_by": "MedGemma (Google HAI-DEF)"
         }
     except Exception as medgemma_error:
-        print(f"[MedGemma] Chat failed, falling back to Groq: {medgemma_error}")
+        logger.warning("MedGemma chat failed, falling back to Groq: %s", medgemma_error)
         try:
-            from groq import Groq
-            
-            client = Groq(api_key=settings.GROQ_API_KEY)
+            client = get_groq_client()
             
             # Prepare messages with system prompt
-            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            messages = [{"role": "system", "content": _system_prompt(request, patient_context)}]
             messages.extend([{"role": m.role, "content": m.content} for m in request.messages])
             
-            response = client.chat.completions.create(
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model="llama-3.3-70b-versatile",
                 messages=messages
             )
             
+            record_backend("groq", True)
             return {
                 "content": response.choices[0].message.content,
                 "role": "assistant",
@@ -154,7 +213,8 @@ async def chat_simple(
             }
         
         except Exception as e:
-            print(f"[Bisheshoggo AI] Chat Error: {e}")
+            record_backend("groq", False)
+            logger.error("Groq chat error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to process chat request"
@@ -168,40 +228,37 @@ async def get_medicine_suggestions(
     db: Session = Depends(get_db)
 ):
     """Get AI-powered medicine suggestions - MedGemma primary, Groq fallback"""
+    patient_context = patient_contexts.get(db, current_user.id)
     
     # Try MedGemma first
     try:
         result = await medgemma_medicine_analysis(
             prescriptions=request.prescriptions,
             diagnosis=request.diagnosis or "",
-            patient_history=request.patientHistory or ""
+            patient_history=request.patientHistory or "",
+            user_id=current_user.id,
+            patient_context=patient_context
         )
         return result
     except Exception as medgemma_error:
-        print(f"[MedGemma] Medicine suggestions failed, falling back to Groq: {medgemma_error}")
+        logger.warning("MedGemma medicine suggestions failed, falling back to Groq: %s", medgemma_error)
     
     # Fallback to Groq
     try:
-        from groq import Groq
-        
-        client = Groq(api_key=settings.GROQ_API_KEY)
+        client = get_groq_client()
         
-        # Get patient's medical history
-        consultations = db.query(models.Consultation).filter(
-            models.Consultation.patient_id == current_user.id,
-            models.Consultation.status == models.ConsultationStatus.completed
-        ).order_by(models.Consultation.created_at.desc()).limit(5).all()
-        
-        # Build consultation history context
-        consultation_history = "\n\n".join([
-            f"Diagnosis: {c.diagnosis or 'N/A'}\nSymptoms: {c.symptoms or 'N/A'}\nPrescription: {c.prescription or 'N/A'}"
-            for c in consultations
-        ])
+        medicines = canonicalize_prescriptions(request.prescriptions)
+        known_interactions = interactions_for_prescriptions(medicines)
+        known_text = "\n".join(f"- {format_interaction_alert(f)}" for f in known_interactions) or "- None"
+        notes = knowledge_index.reference_notes(f"{request.diagnosis or ''}. {request.patientHistory or ''}")
         
         prompt = f"""As a medical AI assistant for rural Bangladesh, analyze this prescription and patient's current condition to provide personalized medicine recommendations.
 
-PRESCRIPTION MEDICINES:
-{json.dumps(request.prescriptions, indent=2)}
+PRESCRIPTION MEDICINES (brand = generic [class]):
+{format_prescriptions_for_prompt(medicines)}
+
+KNOWN DRUG INTERACTIONS (already checked, do not repeat):
+{known_text}
 
 ORIGINAL DIAGNOSIS: {request.diagnosis or "Not specified"}
 
@@ -209,7 +266,10 @@ PATIENT'S CURRENT INFORMATION:
 {request.patientHistory or "Not provided"}
 
 PREVIOUS MEDICAL HISTORY:
-{consultation_history or "No previous records"}
+{patient_context or "No previous records"}
+
+REFERENCE NOTES (local knowledge base, use where relevant):
+{notes or "None"}
 
 IMPORTANT: The patient has provided information about:
 1. How long they've been taking these medicines
@@ -237,7 +297,8 @@ Respond in this JSON format:
         }}
     ],
     "overallRecommendation": "Clear guidance on which medicines to take NOW based on current symptoms, and which to stop or consult about",
-    "warnings": ["Important warnings about medicine usage, stopping, or seeking medical help"]
+    "warnings": ["Important warnings about medicine usage, stopping, or seeking medical help"],
+    "interactionAlerts": ["Any OTHER dangerous drug interactions not listed above"]
 }}
 
 Consider:
@@ -247,7 +308,8 @@ Consider:
 - Safety of continuing/stopping medicines
 - When to seek immediate medical help"""
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": "You are a medical AI assistant. Always respond with valid JSON."},
@@ -257,10 +319,13 @@ Consider:
         )
         
         result = json.loads(response.choices[0].message.content)
+        result["interactionAlerts"] = merge_interaction_alerts(known_interactions, result.get("interactionAlerts"))
+        record_backend("groq", True)
         return result
     
     except Exception as e:
-        print(f"[Bisheshoggo AI] Medicine Suggestion Error: {e}")
+        record_backend("groq", False)
+        logger.error("Groq medicine suggestion error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate suggestions"
@@ -275,15 +340,17 @@ Consider:
 @router.post("/medgemma/chat")
 async def medgemma_chat_endpoint(
     request: schemas.ChatRequest,
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     MedGemma-powered medical chat endpoint.
     Uses Google's MedGemma model from HAI-DEF for more accurate medical reasoning.
     """
+    patient_context = patient_contexts.get(db, current_user.id)
     try:
         messages = [{"role": m.role, "content": m.content} for m in request.messages]
-        result = await medgemma_chat(messages)
+        result = await medgemma_chat(messages, user_id=current_user.id, patient_context=patient_context)
         
         return {
             "content": result["content"],
@@ -298,17 +365,18 @@ async def medgemma_chat_endpoint(
             detail=str(e)
         )
     except Exception as e:
-        print(f"[MedGemma] Chat Error: {e}")
+        logger.warning("MedGemma chat failed, falling back to Groq: %s", e)
         # Fallback to Groq if MedGemma fails
         try:
-            from groq import Groq
-            client = Groq(api_key=settings.GROQ_API_KEY)
-            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            client = get_groq_client()
+            messages = [{"role": "system", "content": _system_prompt(request, patient_context)}]
             messages.extend([{"role": m.role, "content": m.content} for m in request.messages])
-            response = client.chat.completions.create(
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model="llama-3.3-70b-versatile",
                 messages=messages
             )
+            record_backend("groq", True)
             return {
                 "content": response.choices[0].message.content,
                 "role": "assistant",
@@ -316,7 +384,8 @@ async def medgemma_chat_endpoint(
                 "powered_by": "Groq (Fallback)"
             }
         except Exception as fallback_error:
-            print(f"[MedGemma] Fallback also failed: {fallback_error}")
+            record_backend("groq", False)
+            logger.error("Groq fallback also failed: %s", fallback_error)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Both MedGemma and fallback AI services unavailable"
@@ -340,7 +409,9 @@ async def medgemma_symptom_analysis_endpoint(
             symptoms=symptoms_list,
             severity=request.severity or "moderate",
             duration=request.duration or "",
-            additional_notes=request.additional_notes or ""
+            additional_notes=request.additional_notes or "",
+            user_id=current_user.id,
+            patient_context=patient_contexts.get(db, current_user.id)
         )
         
         # Store in database
@@ -375,7 +446,7 @@ async def medgemma_symptom_analysis_endpoint(
         }
     
     except Exception as e:
-        print(f"[MedGemma] Symptom Analysis Error: {e}")
+        logger.error("MedGemma symptom analysis error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"MedGemma symptom analysis failed: {str(e)}"
@@ -385,7 +456,8 @@ async def medgemma_symptom_analysis_endpoint(
 @router.post("/medgemma/medicine-analysis")
 async def medgemma_medicine_analysis_endpoint(
     request: schemas.MedicineSuggestionRequest,
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     MedGemma-powered medicine interaction analysis.
@@ -395,7 +467,9 @@ async def medgemma_medicine_analysis_endpoint(
         result = await medgemma_medicine_analysis(
             prescriptions=request.prescriptions,
             diagnosis=request.diagnosis or "",
-            patient_history=request.patientHistory or ""
+            patient_history=request.patientHistory or "",
+            user_id=current_user.id,
+            patient_context=patient_contexts.get(db, current_user.id)
         )
         
         return {
@@ -404,7 +478,7 @@ async def medgemma_medicine_analysis_endpoint(
         }
     
     except Exception as e:
-        print(f"[MedGemma] Medicine Analysis Error: {e}")
+        logger.error("MedGemma medicine analysis error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"MedGemma medicine analysis failed: {str(e)}"
@@ -416,12 +490,12 @@ async def medgemma_status():
     """Check MedGemma service availability"""
     try:
         from ..medgemma_service import (
-            get_model_status, is_model_loaded,
-            MEDGEMMA_TEXT_MODEL, GEMMA_FALLBACK_MODEL, MEDGEMMA_MODEL_ID,
+            get_status_report, MEDGEMMA_TEXT_MODEL, GEMMA_FALLBACK_MODEL, MEDGEMMA_MODEL_ID,
         )
-        status = get_model_status()
+        # One backend query (one daemon round trip in remote mode) for everything below
+        status, token_budget = get_status_report()
 
-        if is_model_loaded():
+        if status.get("loaded"):
             return {
                 "status": "available",
                 "primary_model": MEDGEMMA_MODEL_ID,
@@ -429,6 +503,7 @@ async def medgemma_status():
                 "fallback_model": GEMMA_FALLBACK_MODEL,
                 "vram_used_gb": status.get("vram_used_gb"),
                 "inference": "local_gpu",
+                "token_budget": token_budget,
                 "powered_by": "Google HAI-DEF (Health AI Developer Foundations)"
             }
         else:
@@ -438,6 +513,7 @@ async def medgemma_status():
                 "fallback_model": GEMMA_FALLBACK_MODEL,
                 "error": status.get("error"),
                 "message": "MedGemma local model not loaded. Using Gemma API fallback.",
+                "token_budget": token_budget,
                 "powered_by": "Google HAI-DEF (Health AI Developer Foundations)"
             }
     except Exception as e:
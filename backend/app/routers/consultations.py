@@ -1,16 +1,52 @@
 """
 Bisheshoggo AI - Consultations Routes
+
+A consultation created with a provider and scheduled_at claims that
+provider's slots (see scheduling); a clash is a 409 naming the next free slot.
+
+Chat between a consultation's patient and provider:
+
+  * POST /{id}/messages sends a message. It returns once the message is written.
+  * GET /{id}/messages pages through the history with keyset cursors.
+  * WS /{id}/ws?token=...&after=<message id> is a live channel. It first
+    replays messages after the cursor. Clients should de-duplicate by
+    message id, because a message sent during the replay can arrive twice.
+
+Client -> server socket events:
+    {"type": "message", "client_id": ..., "message": ..., "attachment_url": ...}
+    {"type": "delivered", "id": <message id>}
+
+Server -> client socket events:
+    {"type": "message", "client_id": ..., "data": <message>}  (to every socket)
+    {"type": "persisted", "client_id": ..., "id": ...}  (sender: message is durable)
+    {"type": "delivered", "id": ..., "user_id": ...}  (relayed receipt)
+    {"type": "failed", "id": ...}  (the message was not saved; drop it)
+    {"type": "error", "client_id": ..., "detail": ...}
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_
-from typing import List
-from .. import models, schemas
-from ..database import get_db
-from ..auth import get_current_user
+from typing import List, Optional
+from .. import models, schemas, read_models, scheduling
+from ..database import SessionLocal, get_db
+from ..auth import get_current_user, get_user_from_token
+from ..chat import Subscription, chat_broker
+from ..scheduling import schedule_index
+from ..serialization import get_adapter, negotiated_response
 
 router = APIRouter(prefix="/consultations", tags=["Consultations"])
 
+ConsultationList = schemas.DataResponse[List[schemas.ConsultationResponse]]
+_consultation_list = get_adapter(ConsultationList)
+_message_page = get_adapter(schemas.ConsultationMessagePage)
+_message = get_adapter(schemas.ConsultationMessageResponse)
+
+_REPLAY_PAGE_SIZE = 200
+
 
 @router.post("", response_model=dict)
 async def create_consultation(
@@ -18,19 +54,33 @@ async def create_consultation(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Create a new consultation"""
+    """Create a new consultation (409 if the provider is already booked at scheduled_at)"""
+    scheduled_at = scheduling.to_utc(consultation_data.scheduled_at) if consultation_data.scheduled_at else None
+    books_provider = scheduled_at is not None and consultation_data.provider_id is not None
+    
+    # Fast path: most conflicts are visible in this worker's index
+    if books_provider and schedule_index.is_booked(db, consultation_data.provider_id, scheduled_at):
+        raise _slot_taken(db, consultation_data.provider_id, scheduled_at)
+    
     db_consultation = models.Consultation(
         patient_id=current_user.id,
         provider_id=consultation_data.provider_id,
         consultation_type=consultation_data.consultation_type,
-        scheduled_at=consultation_data.scheduled_at,
+        scheduled_at=scheduled_at,
         symptoms=consultation_data.symptoms,
         notes=consultation_data.notes,
         status=models.ConsultationStatus.pending
     )
+    if books_provider:
+        scheduling.claim_slots(db_consultation)
     
     db.add(db_consultation)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race for one of the slots (slot primary key)
+        db.rollback()
+        raise _slot_taken(db, consultation_data.provider_id, scheduled_at)
     db.refresh(db_consultation)
     
     # Load relationships
@@ -39,11 +89,12 @@ async def create_consultation(
         joinedload(models.Consultation.provider)
     ).filter(models.Consultation.id == db_consultation.id).first()
     
-    return {"success": True, "data": db_consultation}
+    return {"success": True, "data": schemas.ConsultationResponse.model_validate(db_consultation)}
 
 
-@router.get("", response_model=dict)
+@router.get("", response_model=ConsultationList)
 async def get_consultations(
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -58,7 +109,7 @@ async def get_consultations(
         )
     ).order_by(models.Consultation.created_at.desc()).all()
     
-    return {"data": consultations}
+    return negotiated_response(request, _consultation_list, {"data": consultations})
 
 
 @router.get("/{consultation_id}", response_model=schemas.ConsultationResponse)
@@ -119,6 +170,8 @@ async def update_consultation(
     
     if new_status:
         consultation.status = new_status
+        if new_status in scheduling.RELEASED_STATUSES:
+            scheduling.release_slots(consultation)
     if diagnosis:
         consultation.diagnosis = diagnosis
     if prescription:
@@ -131,3 +184,204 @@ async def update_consultation(
     return {"success": True}
 
 
+def _slot_taken(db: Session, provider_id: str, scheduled_at) -> HTTPException:
+    next_free = scheduling.next_free_slot(schedule_index.get(db, provider_id), scheduled_at)
+    detail = "Provider is already booked at that time"
+    if next_free:
+        detail += f"; next free slot is {next_free.isoformat()}Z"
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def _is_participant(consultation: models.Consultation, user: models.User) -> bool:
+    return user.id in (consultation.patient_id, consultation.provider_id)
+
+
+def _require_participant(db: Session, consultation_id: str, user: models.User) -> models.Consultation:
+    """The consultation, or 404/403 unless ``user`` is its patient or provider"""
+    consultation = db.query(models.Consultation).filter(
+        models.Consultation.id == consultation_id
+    ).first()
+    
+    if not consultation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Consultation not found"
+        )
+    
+    if not _is_participant(consultation, user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this consultation"
+        )
+    
+    return consultation
+
+
+@router.post("/{consultation_id}/messages", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def send_message(
+    consultation_id: str,
+    message_data: schemas.ConsultationMessageCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Send a chat message to a consultation (delivered live to connected sockets)"""
+    _require_participant(db, consultation_id, current_user)
+    
+    message = await chat_broker.send(consultation_id, current_user.id, message_data)
+    
+    return {"success": True, "data": message}
+
+
+@router.get("/{consultation_id}/messages", response_model=schemas.ConsultationMessagePage)
+async def get_messages(
+    request: Request,
+    consultation_id: str,
+    before: Optional[str] = Query(None, description="Message id: return the messages before it"),
+    after: Optional[str] = Query(None, description="Message id: return the messages after it"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Page through a consultation's messages, oldest first within a page"""
+    _require_participant(db, consultation_id, current_user)
+    
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both"
+        )
+    
+    # Read-your-writes: include messages still waiting in the write batch
+    await chat_broker.flush()
+    page = read_models.list_consultation_messages(db, consultation_id, before=before, after=after, limit=limit)
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown message cursor"
+        )
+    messages, has_more = page
+    
+    next_cursor = None
+    if has_more and messages:
+        next_cursor = messages[-1].id if after else messages[0].id
+    
+    return negotiated_response(request, _message_page, {"data": messages, "next_cursor": next_cursor})
+
+
+@router.websocket("/{consultation_id}/ws")
+async def consultation_socket(
+    websocket: WebSocket,
+    consultation_id: str,
+    token: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """Live chat channel for a consultation's patient and provider"""
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token)
+        consultation = db.query(models.Consultation).filter(
+            models.Consultation.id == consultation_id
+        ).first() if user else None
+        allowed = consultation is not None and _is_participant(consultation, user)
+        user_id = user.id if user else None
+    finally:
+        db.close()
+    
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscription = chat_broker.subscribe(consultation_id, user_id)
+    try:
+        if after and not await _replay(websocket, consultation_id, after):
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Unknown message cursor")
+            return
+        await _pump(websocket, subscription)
+    finally:
+        chat_broker.unsubscribe(subscription)
+
+
+async def _replay(websocket: WebSocket, consultation_id: str, after: str) -> bool:
+    """Send every stored message after ``after``; False if the cursor is unknown"""
+    await chat_broker.flush()
+    db = SessionLocal()
+    try:
+        while True:
+            page = read_models.list_consultation_messages(db, consultation_id, after=after, limit=_REPLAY_PAGE_SIZE)
+            if page is None:
+                return False
+            messages, has_more = page
+            for message in messages:
+                data = _message.dump_python(_message.validate_python(message, from_attributes=True), mode="json")
+                await websocket.send_text(json.dumps({"type": "message", "client_id": None, "data": data}, ensure_ascii=False))
+            if not has_more:
+                return True
+            after = messages[-1].id
+    finally:
+        db.close()
+
+
+async def _pump(websocket: WebSocket, subscription: Subscription):
+    """Run the socket's reader and writer until either side ends the connection."""
+    
+    def reply(event: dict):
+        # Everything goes through the subscription queue: only the writer task sends
+        subscription.deliver(json.dumps(event, ensure_ascii=False))
+    
+    def on_written(client_id):
+        def callback(future: asyncio.Future):
+            if future.cancelled() or future.exception() is not None:
+                reply({"type": "error", "client_id": client_id, "detail": "Message could not be saved"})
+            else:
+                reply({"type": "persisted", "client_id": client_id, "id": future.result()["id"]})
+        return callback
+    
+    async def reader():
+        while True:
+            try:
+                event = await websocket.receive_json()
+            except WebSocketDisconnect:
+                return
+            except ValueError:
+                reply({"type": "error", "client_id": None, "detail": "Events must be JSON objects"})
+                continue
+            event_type = event.get("type") if isinstance(event, dict) else None
+            client_id = event.get("client_id") if isinstance(event, dict) else None
+            if event_type == "message":
+                try:
+                    data = schemas.ConsultationMessageCreate.model_validate(event)
+                except ValidationError as e:
+                    reply({"type": "error", "client_id": client_id, "detail": e.errors(include_url=False, include_context=False)})
+                    continue
+                future = chat_broker.send(subscription.consultation_id, subscription.user_id, data, client_id=client_id)
+                future.add_done_callback(on_written(client_id))
+            elif event_type == "delivered" and isinstance(event.get("id"), str):
+                chat_broker.publish(
+                    subscription.consultation_id,
+                    {"type": "delivered", "id": event["id"], "user_id": subscription.user_id},
+                    exclude=subscription,
+                )
+            else:
+                reply({"type": "error", "client_id": client_id, "detail": "Unknown event type"})
+    
+    async def writer():
+        while True:
+            event = await subscription.queue.get()
+            if event is None:
+                # Fell too far behind; the client reconnects with ?after=<last message id>
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(event)
+    
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(writer())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,15 +1,19 @@
 """
 Bisheshoggo AI - Emergency SOS Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_user
+from ..serialization import get_adapter, negotiated_response
 
 router = APIRouter(prefix="/emergency", tags=["Emergency"])
 
+EmergencyList = schemas.DataResponse[List[schemas.EmergencyResponse]]
+_emergency_list = get_adapter(EmergencyList)
+
 
 @router.post("", response_model=dict)
 async def create_emergency(
@@ -32,11 +36,12 @@ async def create_emergency(
     db.commit()
     db.refresh(db_emergency)
     
-    return {"success": True, "data": db_emergency}
+    return {"success": True, "data": schemas.EmergencyResponse.model_validate(db_emergency)}
 
 
-@router.get("", response_model=dict)
+@router.get("", response_model=EmergencyList)
 async def get_emergencies(
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -53,7 +58,7 @@ async def get_emergencies(
         models.EmergencySOS.created_at.desc()
     ).limit(50).all()
     
-    return {"data": emergencies}
+    return negotiated_response(request, _emergency_list, {"data": emergencies})
 
 
 @router.put("/{emergency_id}")
@@ -1,59 +1,58 @@
 """
 Bisheshoggo AI - Medical Facilities Routes
+Reads are served from the in-memory facility directory; conditional GETs of
+the listing are answered by ConditionalGetMiddleware. The listing is also
+available as MessagePack (Accept: application/msgpack).
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_user_optional
+from ..facility_directory import facility_directory
+from ..http_cache import etag_matches
+from ..serialization import MSGPACK_MEDIA_TYPE, dump_json, dump_msgpack, get_adapter, prefers_msgpack
 
 router = APIRouter(prefix="/facilities", tags=["Facilities"])
 
+FacilityList = schemas.DataResponse[List[schemas.FacilityListItem]]
+_facility_list = get_adapter(FacilityList)
+_facility = get_adapter(schemas.FacilityResponse)
 
-@router.get("", response_model=dict)
+
+def _conditional(request: Request, body: bytes, etag: str) -> Response:
+    """200 with the body, or an empty 304 if the client already holds this ETag"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("", response_model=FacilityList)
 async def get_facilities(
+    request: Request,
     type: Optional[str] = Query(None, description="Filter by facility type"),
     district: Optional[str] = Query(None, description="Filter by district"),
+    division: Optional[str] = Query(None, description="Filter by division"),
     db: Session = Depends(get_db)
 ):
     """Get all active medical facilities"""
-    query = db.query(models.MedicalFacility).filter(
-        models.MedicalFacility.is_active == True
+    # The ETag comes from the version ConditionalGetMiddleware read; never pair it with an older body
+    versions = getattr(request.state, "collection_versions", None) or {}
+    facility_directory.ensure_fresh(db, seen=versions.get(("facilities", "")))
+    if prefers_msgpack(request.headers.get("accept", "")):
+        media_type, dump = MSGPACK_MEDIA_TYPE, dump_msgpack
+    else:
+        media_type, dump = "application/json", dump_json
+    body = facility_directory.listing(
+        lambda rows: dump(_facility_list, {"data": rows}),
+        facility_type=type if type != "all" else None,
+        district=district if district != "all" else None,
+        division=division if division != "all" else None,
+        media_type=media_type,
     )
-    
-    if type and type != "all":
-        query = query.filter(models.MedicalFacility.facility_type == type)
-    
-    if district and district != "all":
-        query = query.filter(models.MedicalFacility.district == district)
-    
-    facilities = query.order_by(models.MedicalFacility.name).all()
-    
-    # Convert to dict for serialization
-    facilities_data = []
-    for facility in facilities:
-        facilities_data.append({
-            "id": facility.id,
-            "name": facility.name,
-            "facility_type": facility.facility_type,
-            "phone": facility.phone,
-            "address": facility.address,
-            "village": facility.village,
-            "district": facility.district,
-            "division": facility.division,
-            "latitude": facility.latitude,
-            "longitude": facility.longitude,
-            "operating_hours": facility.operating_hours,
-            "services_offered": facility.services_offered,
-            "has_ambulance": facility.has_ambulance,
-            "has_emergency": facility.has_emergency,
-            "is_active": facility.is_active,
-            "contact_person": facility.contact_person,
-            "created_at": facility.created_at.isoformat() if facility.created_at else None
-        })
-    
-    return {"data": facilities_data}
+    return Response(content=body, media_type=media_type)
 
 
 @router.post("", response_model=dict)
@@ -67,30 +66,36 @@ async def create_facility(
         **facility_data.model_dump(),
         created_by=current_user.id if current_user else None
     )
-    
+
     db.add(db_facility)
     db.commit()
     db.refresh(db_facility)
-    
-    return {"success": True, "data": db_facility}
+
+    # Write-through so this worker serves the new facility immediately
+    facility_directory.refresh(db)
+
+    return {"success": True, "data": schemas.FacilityResponse.model_validate(db_facility)}
 
 
 @router.get("/{facility_id}", response_model=schemas.FacilityResponse)
 async def get_facility(
+    request: Request,
     facility_id: str,
     db: Session = Depends(get_db)
 ):
     """Get a specific facility"""
-    facility = db.query(models.MedicalFacility).filter(
-        models.MedicalFacility.id == facility_id
-    ).first()
-    
+    facility_directory.ensure_fresh(db)
+    facility = facility_directory.get(facility_id)
+
+    if not facility:
+        # Possibly created by another worker since our last check
+        facility_directory.ensure_fresh(db, force=True)
+        facility = facility_directory.get(facility_id)
+
     if not facility:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Facility not found"
         )
-    
-    return facility
 
+    return _conditional(request, dump_json(_facility, facility), facility_directory.etag_for(facility))
@@ -0,0 +1,57 @@
+"""
+Bisheshoggo AI - Medical History Search Routes
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import models, schemas, history_search
+from ..database import get_db
+from ..auth import get_current_user
+from ..history_search import history_index
+from ..serialization import get_adapter, negotiated_response
+
+router = APIRouter(prefix="/history", tags=["Medical History"])
+
+_history_search_page = get_adapter(schemas.HistorySearchPage)
+
+
+@router.get("/search", response_model=schemas.HistorySearchPage)
+async def search_history(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; 3+ letter words also match as prefixes"),
+    kind: Optional[List[str]] = Query(None, description="medical_record, symptom_check or consultation (repeatable)"),
+    patient_id: Optional[str] = Query(None, description="Providers: only this patient's history"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Ranked search over the medical records, symptom checks and consultations visible to the current user"""
+    if not history_index.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="History search is not available on this server"
+        )
+    
+    kinds = [name.strip() for value in kind or [] for name in value.split(",") if name.strip()]
+    unknown = set(kinds) - set(history_search.KINDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"kind must be one of: {', '.join(history_search.KINDS)}"
+        )
+    
+    total, hits = history_index.search(
+        db,
+        q,
+        current_user.id,
+        patient_id=patient_id,
+        kinds=kinds,
+        offset=(page - 1) * page_size,
+        limit=page_size,
+    )
+    results = [{**hit._asdict(), "score": round(hit.score, 4)} for hit in hits]
+    
+    return negotiated_response(request, _history_search_page, {
+        "data": results, "total": total, "page": page, "page_size": page_size
+    })
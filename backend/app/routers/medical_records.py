@@ -1,15 +1,19 @@
 """
 Bisheshoggo AI - Medical Records Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session, joinedload
 from typing import List
-from .. import models, schemas
+from .. import models, schemas, read_models
 from ..database import get_db
 from ..auth import get_current_user
+from ..serialization import get_adapter, negotiated_response
 
 router = APIRouter(prefix="/medical-records", tags=["Medical Records"])
 
+MedicalRecordList = schemas.DataResponse[List[schemas.MedicalRecordListItem]]
+_medical_record_list = get_adapter(MedicalRecordList)
+
 
 @router.post("", response_model=dict)
 async def create_medical_record(
@@ -34,44 +38,19 @@ async def create_medical_record(
     db.commit()
     db.refresh(db_record)
     
-    return {"success": True, "data": db_record}
+    return {"success": True, "data": schemas.MedicalRecordResponse.model_validate(db_record)}
 
 
-@router.get("", response_model=dict)
+@router.get("", response_model=MedicalRecordList)
 async def get_medical_records(
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all medical records for current user"""
-    records = db.query(models.MedicalRecord).options(
-        joinedload(models.MedicalRecord.provider)
-    ).filter(
-        models.MedicalRecord.patient_id == current_user.id
-    ).order_by(models.MedicalRecord.created_at.desc()).all()
-    
-    # Format response
-    result = []
-    for record in records:
-        result.append({
-            "id": record.id,
-            "patient_id": record.patient_id,
-            "provider_id": record.provider_id,
-            "consultation_id": record.consultation_id,
-            "record_type": record.record_type,
-            "title": record.title,
-            "description": record.description,
-            "diagnosis": record.diagnosis,
-            "prescriptions": record.prescriptions,
-            "attachments": record.attachments,
-            "document_url": record.document_url,
-            "record_date": record.record_date,
-            "created_at": record.created_at,
-            "provider": {
-                "full_name": record.provider.full_name if record.provider else None
-            } if record.provider else None
-        })
+    records = read_models.list_medical_records(db, current_user.id)
     
-    return {"data": result}
+    return negotiated_response(request, _medical_record_list, {"data": records})
 
 
 @router.get("/{record_id}", response_model=schemas.MedicalRecordResponse)
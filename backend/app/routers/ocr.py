@@ -5,13 +5,19 @@ Powered by MedGemma (Google HAI-DEF) with Groq fallback
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
 import json
 import base64
+import logging
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_user
 from ..config import settings
 from ..medgemma_service import medgemma_medicine_analysis
+from ..inference_backends import get_groq_client
+from ..drug_dictionary import exact_generic
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ocr", tags=["OCR"])
 
@@ -27,9 +33,7 @@ async def process_prescription(
     # Try MedGemma first for prescription text analysis
     groq_result = None
     try:
-        from groq import Groq
-        
-        client = Groq(api_key=settings.GROQ_API_KEY)
+        client = get_groq_client()
         
         # Enhanced prompt for better medicine extraction
         prompt = f"""You are an advanced OCR system specialized in reading medical prescriptions from Bangladesh.
@@ -85,7 +89,8 @@ Response format (JSON):
 
 Extract ALL information visible in the prescription."""
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="llama-3.3-70b-versatile",
             messages=[
                 {
@@ -136,6 +141,7 @@ Extract ALL information visible in the prescription."""
             prescriptions=[
                 {
                     "medicine": med.get("name", ""),
+                    "generic": exact_generic(med.get("name", "")),
                     "dosage": med.get("dosage", ""),
                     "frequency": med.get("frequency", ""),
                     "duration": med.get("duration", "")
@@ -149,7 +155,7 @@ Extract ALL information visible in the prescription."""
         return extracted_data
     
     except Exception as e:
-        print(f"[Bisheshoggo AI] OCR Error: {e}")
+        logger.error("OCR error: %s", e)
         import traceback
         traceback.print_exc()
         
@@ -1,53 +1,130 @@
 """
 Bisheshoggo AI - Healthcare Providers Routes
 """
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional
-from .. import models, schemas
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import models, schemas, read_models, scheduling, provider_search
 from ..database import get_db
+from ..config import settings
+from ..provider_search import provider_index
+from ..scheduling import schedule_index
+from ..serialization import get_adapter, negotiated_response
 
 router = APIRouter(prefix="/providers", tags=["Providers"])
 
+ProviderList = schemas.DataResponse[List[schemas.ProviderListItem]]
+_provider_list = get_adapter(ProviderList)
+_provider_search_page = get_adapter(schemas.ProviderSearchPage)
 
-@router.get("", response_model=dict)
+
+@router.get("", response_model=ProviderList)
 async def get_providers(
+    request: Request,
     specialization: Optional[str] = Query(None, description="Filter by specialization"),
     db: Session = Depends(get_db)
 ):
     """Get all available healthcare providers"""
-    query = db.query(models.ProviderProfile).options(
-        joinedload(models.ProviderProfile.user)
-    ).filter(models.ProviderProfile.is_available == True)
-    
-    if specialization and specialization != "all":
-        query = query.filter(models.ProviderProfile.specialization == specialization)
+    providers = read_models.list_providers(
+        db, specialization=specialization if specialization != "all" else None
+    )
     
-    providers = query.all()
+    return negotiated_response(request, _provider_list, {"data": providers})
+
+
+@router.get("/search", response_model=schemas.ProviderSearchPage)
+async def search_providers(
+    request: Request,
+    q: Optional[str] = Query(None, description="Free text over name, specialization, qualification, languages and bio"),
+    specialization: Optional[str] = Query(None),
+    language: Optional[List[str]] = Query(None, description="Speaks any of these (repeatable)"),
+    min_fee: Optional[float] = Query(None, ge=0),
+    max_fee: Optional[float] = Query(None, ge=0),
+    min_experience: Optional[int] = Query(None, ge=0),
+    telemedicine: Optional[bool] = Query(None),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    sort: str = Query("relevance", description="relevance, distance, fee or experience"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Ranked, paginated search over available providers"""
+    located = lat is not None and lng is not None
+    if sort not in provider_search.SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of: {', '.join(provider_search.SORTS)}"
+        )
+    if (sort == "distance" or radius_km is not None) and not located:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="lat and lng are required to sort or filter by distance"
+        )
     
-    # Format response to include user profile
-    result = []
-    for provider in providers:
-        result.append({
-            "id": provider.id,
-            "user_id": provider.user_id,
-            "specialization": provider.specialization,
-            "license_number": provider.license_number,
-            "qualification": provider.qualification,
-            "years_of_experience": provider.years_of_experience,
-            "consultation_fee": provider.consultation_fee,
-            "available_for_telemedicine": provider.available_for_telemedicine,
-            "is_available": provider.is_available,
-            "languages": provider.languages,
-            "bio": provider.bio,
-            "profile": {
-                "full_name": provider.user.full_name,
-                "email": provider.user.email,
-                "phone_number": provider.user.phone,
-                "avatar_url": provider.user.avatar_url
-            }
-        })
+    total, hits = provider_index.search(
+        db,
+        query=q,
+        specialization=specialization if specialization != "all" else None,
+        languages=[name for value in language or [] for name in value.split(",") if name.strip()],
+        min_fee=min_fee,
+        max_fee=max_fee,
+        min_experience=min_experience,
+        telemedicine=telemedicine,
+        latitude=lat,
+        longitude=lng,
+        radius_km=radius_km,
+        sort=sort,
+        offset=(page - 1) * page_size,
+        limit=page_size,
+    )
+    results = [
+        {**hit.provider._asdict(), "score": round(hit.score, 4),
+         "distance_km": round(hit.distance_km, 2) if hit.distance_km is not None else None}
+        for hit in hits
+    ]
     
-    return {"data": result}
+    return negotiated_response(request, _provider_search_page, {
+        "data": results, "total": total, "page": page, "page_size": page_size
+    })
 
 
+@router.get("/{provider_id}/availability", response_model=schemas.ProviderAvailability)
+async def get_provider_availability(
+    provider_id: str,
+    start: Optional[datetime] = Query(None, alias="from", description="Window start (default: now)"),
+    days: int = Query(1, ge=1, le=14, description="Window length in days"),
+    limit: int = Query(48, ge=1, le=500, description="Maximum free slots returned"),
+    db: Session = Depends(get_db)
+):
+    """Free slots in bookable hours, booked intervals and the next free slot of a provider"""
+    profile = db.query(models.ProviderProfile).filter(
+        or_(models.ProviderProfile.id == provider_id, models.ProviderProfile.user_id == provider_id)
+    ).first()
+    
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Provider not found"
+        )
+    
+    window_start = scheduling.to_utc(start) if start else datetime.now(timezone.utc).replace(tzinfo=None)
+    window_end = window_start + timedelta(days=days)
+    index = schedule_index.get(db, profile.user_id)
+    
+    free, next_free = [], None
+    if profile.is_available:
+        free = scheduling.free_slots(index, window_start, window_end, limit)
+        next_free = free[0] if free else scheduling.next_free_slot(index, window_start)
+    
+    return {
+        "provider_id": profile.id,
+        "user_id": profile.user_id,
+        "slot_minutes": settings.CONSULTATION_SLOT_MINUTES,
+        "next_free_slot": next_free,
+        "free_slots": free,
+        "booked": [{"start": s, "end": e} for s, e in index.within(window_start, window_end)],
+    }
@@ -2,75 +2,86 @@
 Bisheshoggo AI - Offline Dr (Symptom Check) Routes
 Powered by Local LLaMA Stack for Offline AI Diagnosis
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 import json
+import logging
 import re
 from .. import models, schemas
 from ..database import get_db
 from ..auth import get_current_user
+from ..serialization import get_adapter, negotiated_response
 from ..config import settings
+from ..metrics import record_backend
+from ..tracing import SPAN_KIND_CLIENT, STATUS_ERROR, start_span
+from ..patient_context import patient_contexts
+from ..knowledge_index import knowledge_index
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/symptom-check", tags=["Offline Dr"])
 
+SymptomCheckList = schemas.DataResponse[List[schemas.SymptomCheckResponse]]
+_symptom_check_list = get_adapter(SymptomCheckList)
+
 
 def call_local_llama(prompt: str) -> dict:
     """
     Call local LLaMA Stack for AI-powered diagnosis
     Falls back to rule-based system if LLaMA is unavailable
     """
-    try:
-        from llama_stack_client import LlamaStackClient
-        
-        print("🦙 Attempting to connect to Local LLaMA Stack...")
+    with start_span("llama_stack.chat_completion", {"gen_ai.request.model": "Llama3.2-3B-Instruct"},
+                    kind=SPAN_KIND_CLIENT) as span:
+        try:
+            from llama_stack_client import LlamaStackClient
         
-        # Connect to local LLaMA Stack (default port 5001)
-        client = LlamaStackClient(
-            base_url="http://localhost:5001",
-        )
+            # Connect to local LLaMA Stack (default port 5001)
+            client = LlamaStackClient(
+                base_url="http://localhost:5001",
+            )
         
-        # Call LLaMA for medical diagnosis
-        response = client.inference.chat_completion(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model_id="Llama3.2-3B-Instruct",  # Use the model you have installed
-            stream=False,
-        )
+            # Call LLaMA for medical diagnosis
+            response = client.inference.chat_completion(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model_id="Llama3.2-3B-Instruct",  # Use the model you have installed
+                stream=False,
+            )
         
-        # Extract the response content
-        content = response.completion_message.content
-        print(f"✅ LLaMA Response received: {content[:100]}...")
+            # Extract the response content
+            content = response.completion_message.content
+            logger.debug("LLaMA response received", extra={"chars": len(content or ""), "sample": True})
         
-        # Try to parse as JSON
-        try:
-            result = json.loads(content)
-            print("✅ Successfully parsed LLaMA JSON response")
-            return result
-        except json.JSONDecodeError:
-            # If not JSON, extract key information
-            print("⚠️ LLaMA response not JSON, extracting information...")
-            return {
-                "diagnosis": content.split('\n')[0] if content else "General Health Concern",
-                "suggested_conditions": ["Requires Professional Evaluation"],
-                "recommendations": content,
-                "urgency_level": "moderate",
-                "home_remedies": [],
-                "warning_signs": [],
-                "should_see_doctor": True
-            }
+            # Try to parse as JSON
+            try:
+                result = json.loads(content)
+                return result
+            except json.JSONDecodeError:
+                # If not JSON, extract key information
+                logger.info("LLaMA response not JSON, extracting information")
+                return {
+                    "diagnosis": content.split('\n')[0] if content else "General Health Concern",
+                    "suggested_conditions": ["Requires Professional Evaluation"],
+                    "recommendations": content,
+                    "urgency_level": "moderate",
+                    "home_remedies": [],
+                    "warning_signs": [],
+                    "should_see_doctor": True
+                }
     
-    except ImportError:
-        print("⚠️ llama-stack-client not installed")
-        return None
-    except Exception as e:
-        print(f"⚠️ LLaMA Stack Error: {e}")
-        print("   Falling back to rule-based diagnosis...")
-        return None
+        except ImportError:
+            logger.info("llama-stack-client not installed")
+            span.set_status(STATUS_ERROR, "llama-stack-client not installed")
+            return None
+        except Exception as e:
+            logger.warning("LLaMA Stack failed, falling back to rule-based diagnosis: %s", e)
+            span.record_exception(e)
+            return None
 
 
 def analyze_symptoms_locally(symptoms: List[str], severity: str, duration: str, additional_notes: str):
@@ -272,42 +283,33 @@ async def create_symptom_check(
     Works completely offline using local LLaMA model
     """
     try:
-        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        print("🩺 OFFLINE DR - Analyzing Symptoms...")
-        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        
         # Convert comma-separated symptoms to array
         symptoms_list = [s.strip() for s in check_data.symptoms.split(",")]
-        print(f"📋 Symptoms: {symptoms_list}")
-        print(f"⚡ Severity: {check_data.severity}")
-        print(f"⏱️ Duration: {check_data.duration}")
+        logger.info("Symptom check started", extra={
+            "symptom_count": len(symptoms_list),
+            "severity": check_data.severity,
+            "sample": True,
+        })
         
-        # Get patient medical history
-        patient_profile = db.query(models.PatientProfile).filter(
-            models.PatientProfile.user_id == current_user.id
-        ).first()
+        # Get patient medical history (cached summary, see patient_context)
+        medical_history = patient_contexts.get(db, current_user.id)
         
-        medical_history = ""
-        if patient_profile:
-            medical_history = f"""
-Blood Group: {patient_profile.blood_group or 'N/A'}
-Gender: {patient_profile.gender or 'N/A'}
-Medical Conditions: {', '.join(patient_profile.medical_conditions or [])}
-Allergies: {', '.join(patient_profile.allergies or [])}
-Current Medications: {', '.join(patient_profile.current_medications or [])}
-"""
+        reference_notes = knowledge_index.reference_notes(f"{', '.join(symptoms_list)}. {check_data.additional_notes or ''}")
         
         # Try Local LLaMA Stack first
         llama_prompt = f"""You are an expert medical AI assistant for rural Bangladesh. Analyze these symptoms and provide a diagnosis.
 
 Patient Information:
-{medical_history}
+{medical_history or "Not on record"}
 
 Current Symptoms: {', '.join(symptoms_list)}
 Severity: {check_data.severity or 'Not specified'}
 Duration: {check_data.duration or 'Not specified'}
 Additional Notes: {check_data.additional_notes or 'None'}
 
+Reference Notes (local knowledge base, use where relevant):
+{reference_notes or 'None'}
+
 Provide your response in the following JSON format:
 {{
     "diagnosis": "Primary diagnosis in Bengali and English",
@@ -326,7 +328,6 @@ Consider:
 - When immediate medical attention is needed
 - Provide recommendations in Bengali language"""
 
-        print("� Trying MedGemma (Google HAI-DEF) for AI diagnosis...")
         try:
             from ..medgemma_service import medgemma_symptom_analysis
             import asyncio
@@ -334,31 +335,35 @@ Consider:
                 symptoms=symptoms_list,
                 severity=check_data.severity or "moderate",
                 duration=check_data.duration or "",
-                additional_notes=check_data.additional_notes or ""
+                additional_notes=check_data.additional_notes or "",
+                user_id=current_user.id,
+                patient_context=medical_history
             )
             model_used = f"MedGemma ({ai_result.get('model', 'HAI-DEF')})"
-            print(f"✅ MedGemma analysis complete")
         except Exception as medgemma_error:
-            print(f"⚠️ MedGemma Error: {medgemma_error}")
-            print("🦙 Trying Local LLaMA Stack for AI diagnosis...")
+            logger.warning("MedGemma failed, trying Local LLaMA Stack: %s", medgemma_error)
             ai_result = call_local_llama(llama_prompt)
         
             # If LLaMA fails, use rule-based system
+            record_backend("llama_stack", ai_result is not None)
             if ai_result is None:
-                print("📋 Using rule-based diagnosis system...")
-                ai_result = analyze_symptoms_locally(
-                    symptoms=symptoms_list,
-                    severity=check_data.severity or "moderate",
-                    duration=check_data.duration or "",
-                    additional_notes=check_data.additional_notes or ""
-                )
+                with start_span("rule_based.analyze"):
+                    ai_result = analyze_symptoms_locally(
+                        symptoms=symptoms_list,
+                        severity=check_data.severity or "moderate",
+                        duration=check_data.duration or "",
+                        additional_notes=check_data.additional_notes or ""
+                    )
                 model_used = "Rule-based System"
+                record_backend("rule_based", True)
             else:
                 model_used = "Local LLaMA Stack"
         
-        print(f"✅ Diagnosis: {ai_result['diagnosis']}")
-        print(f"🚨 Urgency: {ai_result['urgency_level']}")
-        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        logger.info("Symptom check complete", extra={
+            "model": model_used,
+            "urgency_level": ai_result.get("urgency_level"),
+            "sample": True,
+        })
         
         # Store in database
         db_check = models.SymptomCheck(
@@ -402,7 +407,7 @@ Consider:
         }
     
     except Exception as e:
-        print(f"[Offline Dr] Error: {e}")
+        logger.exception("Symptom check failed, using basic fallback analysis")
         # Fallback: still provide basic analysis
         symptoms_list = [s.strip() for s in check_data.symptoms.split(",")]
         
@@ -449,8 +454,9 @@ Consider:
         }
 
 
-@router.get("", response_model=dict)
+@router.get("", response_model=SymptomCheckList)
 async def get_symptom_checks(
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -459,5 +465,5 @@ async def get_symptom_checks(
         models.SymptomCheck.user_id == current_user.id
     ).order_by(models.SymptomCheck.created_at.desc()).limit(50).all()
     
-    return {"data": checks}
+    return negotiated_response(request, _symptom_check_list, {"data": checks})
 
@@ -0,0 +1,225 @@
+"""
+Bisheshoggo AI - Provider Scheduling
+Booked-slot interval index, free-slot search and conflict-safe booking.
+
+Time is cut into a grid of CONSULTATION_SLOT_MINUTES slots (naive UTC). A
+scheduled consultation holds every grid slot that its
+[scheduled_at, scheduled_at + slot) interval overlaps, one
+``provider_slots`` row per slot. That table's (provider_id, slot_start)
+primary key is the source of truth. When two bookings of the same slot
+race, from any worker, only one can commit and the other gets a 409.
+Nothing is locked beyond the rows being inserted.
+
+Each process keeps an IntervalIndex per provider: booked time merged into
+disjoint, sorted runs. Conflict checks and next-free-slot searches are
+binary searches over it. A provider's index is rebuilt when their
+"provider_schedule" collection version (bumped by every slot insert or
+delete, see http_cache) no longer matches the version it was built from.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .database import SessionLocal
+from .http_cache import get_versions
+
+# Consultations in these states no longer hold their slots
+RELEASED_STATUSES = (models.ConsultationStatus.cancelled,)
+
+
+def slot_length() -> timedelta:
+    return timedelta(minutes=settings.CONSULTATION_SLOT_MINUTES)
+
+
+def to_utc(value: datetime) -> datetime:
+    """Naive UTC, the way timestamps are stored; naive input is taken as UTC already."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def align_down(value: datetime) -> datetime:
+    slot = slot_length()
+    return datetime.min + ((value - datetime.min) // slot) * slot
+
+
+def align_up(value: datetime) -> datetime:
+    aligned = align_down(value)
+    return aligned if aligned == value else aligned + slot_length()
+
+
+def slot_starts(scheduled_at: datetime) -> List[datetime]:
+    """Grid slots overlapped by a consultation starting at ``scheduled_at``."""
+    start = to_utc(scheduled_at)
+    end = start + slot_length()
+    slots = [align_down(start)]
+    while slots[-1] + slot_length() < end:
+        slots.append(slots[-1] + slot_length())
+    return slots
+
+
+class IntervalIndex:
+    """Disjoint, sorted, merged [start, end) intervals with O(log n) lookups."""
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]] = ()):
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            self.add(start, end)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def add(self, start: datetime, end: datetime):
+        """Insert an interval, merging it with every run it overlaps or touches."""
+        i = bisect_left(self._ends, start)
+        j = bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        i = bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] > start:
+            return True
+        return i + 1 < len(self._starts) and self._starts[i + 1] < end
+
+    def free_from(self, at: datetime) -> Tuple[datetime, Optional[datetime]]:
+        """The first free instant at or after ``at`` and when that gap ends (None = open-ended)."""
+        i = bisect_right(self._starts, at) - 1
+        if i >= 0 and self._ends[i] > at:
+            at = self._ends[i]
+        k = bisect_right(self._starts, at)
+        return at, self._starts[k] if k < len(self._starts) else None
+
+    def within(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Runs overlapping [start, end)."""
+        i = max(bisect_right(self._starts, start) - 1, 0)
+        j = bisect_left(self._starts, end)
+        return [(s, e) for s, e in zip(self._starts[i:j], self._ends[i:j]) if e > start]
+
+
+def _parse_clock(value: str) -> time:
+    hours, _, minutes = value.partition(":")
+    return time(int(hours), int(minutes or 0))
+
+
+def _open_window(at: datetime) -> Tuple[datetime, datetime]:
+    """The bookable-hours window (naive UTC) containing ``at``, or the next one."""
+    offset = timedelta(minutes=settings.SCHEDULE_UTC_OFFSET_MINUTES)
+    day_start, day_end = _parse_clock(settings.SCHEDULE_DAY_START), _parse_clock(settings.SCHEDULE_DAY_END)
+    local = at + offset
+    opens = datetime.combine(local.date(), day_start)
+    closes = datetime.combine(local.date(), day_end)
+    if local >= closes:
+        opens += timedelta(days=1)
+        closes += timedelta(days=1)
+    return opens - offset, closes - offset
+
+
+def next_free_slot(index: IntervalIndex, after: datetime, until: datetime = None) -> Optional[datetime]:
+    """Start of the first free grid slot in bookable hours at or after ``after``."""
+    slot = slot_length()
+    until = until or after + timedelta(days=settings.SCHEDULE_HORIZON_DAYS)
+    at = align_up(after)
+    while at < until:
+        opens, closes = _open_window(at)
+        at = max(at, align_up(opens))
+        at, gap_end = index.free_from(at)
+        at = align_up(at)
+        if at + slot > closes:
+            at = closes  # day is full; continue from the next opening
+            continue
+        if gap_end is None or at + slot <= gap_end:
+            return at if at + slot <= until else None
+        at = gap_end
+    return None
+
+
+def free_slots(index: IntervalIndex, start: datetime, end: datetime, limit: int) -> List[datetime]:
+    slots = []
+    at = start
+    while len(slots) < limit:
+        at = next_free_slot(index, at, until=end)
+        if at is None:
+            break
+        slots.append(at)
+        at += slot_length()
+    return slots
+
+
+class ScheduleIndex:
+    """Per-provider interval indexes of booked slots, rebuilt on version change."""
+
+    def __init__(self):
+        self._indexes: Dict[str, Tuple[int, IntervalIndex]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, provider_id: str) -> IntervalIndex:
+        key = ("provider_schedule", provider_id)
+        version = get_versions(db, [key])[key][0]
+        cached = self._indexes.get(provider_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        slot = slot_length()
+        horizon = align_down(datetime.now(timezone.utc).replace(tzinfo=None)) - slot
+        starts = db.execute(select(models.ProviderSlot.slot_start).where(
+            models.ProviderSlot.provider_id == provider_id,
+            models.ProviderSlot.slot_start >= horizon,
+        )).scalars()
+        index = IntervalIndex((start, start + slot) for start in starts)
+        with self._lock:
+            self._indexes[provider_id] = (version, index)
+        return index
+
+    def is_booked(self, db: Session, provider_id: str, scheduled_at: datetime) -> bool:
+        start = align_down(to_utc(scheduled_at))
+        end = to_utc(scheduled_at) + slot_length()
+        return self.get(db, provider_id).overlaps(start, end)
+
+
+schedule_index = ScheduleIndex()
+
+
+def claim_slots(consultation: models.Consultation):
+    """Attach the slot rows a scheduled consultation holds; they commit (or collide) with it."""
+    consultation.slots = [
+        models.ProviderSlot(provider_id=consultation.provider_id, slot_start=start)
+        for start in slot_starts(consultation.scheduled_at)
+    ]
+
+
+def release_slots(consultation: models.Consultation):
+    consultation.slots = []
+
+
+def backfill_slots():
+    """
+    Claim slots for scheduled consultations booked before slot tracking
+    existed. A consultation that collides with an earlier one keeps its
+    record but holds no slots.
+    """
+    db = SessionLocal()
+    try:
+        consultation = models.Consultation
+        rows = db.execute(select(consultation.id, consultation.provider_id, consultation.scheduled_at).where(
+            consultation.provider_id.isnot(None),
+            consultation.scheduled_at.isnot(None),
+            consultation.status.notin_(RELEASED_STATUSES),
+            ~consultation.slots.any(),
+        ).order_by(consultation.created_at)).all()
+        for consultation_id, provider_id, scheduled_at in rows:
+            for start in slot_starts(scheduled_at):
+                db.execute(insert(models.ProviderSlot).values(
+                    provider_id=provider_id, slot_start=start, consultation_id=consultation_id
+                ).on_conflict_do_nothing())
+        db.commit()
+    finally:
+        db.close()
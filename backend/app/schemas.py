@@ -1,8 +1,8 @@
 """
 Bisheshoggo AI - Pydantic Schemas for Request/Response Validation
 """
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal, Generic, TypeVar
 from datetime import datetime, date
 from enum import Enum
 
@@ -38,6 +38,14 @@ class FacilityType(str, Enum):
     diagnostic_center = "diagnostic_center"
 
 
+T = TypeVar("T")
+
+
+# Response Envelopes
+class DataResponse(BaseModel, Generic[T]):
+    data: T
+
+
 # Auth Schemas
 class UserCreate(BaseModel):
     email: EmailStr
@@ -108,7 +116,7 @@ class PatientProfileResponse(PatientProfileCreate):
 
 
 # Provider Profile Schemas
-class ProviderProfileCreate(BaseModel):
+class ProviderProfileBase(BaseModel):
     specialization: Optional[str] = None
     license_number: Optional[str] = None
     qualification: Optional[str] = None
@@ -120,6 +128,11 @@ class ProviderProfileCreate(BaseModel):
     bio: Optional[str] = None
 
 
+class ProviderProfileCreate(ProviderProfileBase):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
 class ProviderProfileResponse(ProviderProfileCreate):
     id: str
     user_id: str
@@ -146,6 +159,39 @@ class ProviderWithUser(BaseModel):
         from_attributes = True
 
 
+class ProviderContact(BaseModel):
+    full_name: str
+    email: str
+    phone_number: Optional[str] = Field(None, validation_alias="phone")
+    avatar_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ProviderListItem(ProviderProfileBase):
+    id: str
+    user_id: str
+    profile: ProviderContact = Field(validation_alias="user")
+
+    class Config:
+        from_attributes = True
+
+
+class ProviderSearchResult(ProviderListItem):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None
+    score: float
+
+
+class ProviderSearchPage(BaseModel):
+    data: List[ProviderSearchResult]
+    total: int
+    page: int
+    page_size: int
+
+
 # Medical Facility Schemas
 class FacilityCreate(BaseModel):
     name: str
@@ -174,6 +220,15 @@ class FacilityResponse(FacilityCreate):
         from_attributes = True
 
 
+class FacilityListItem(FacilityCreate):
+    id: str
+    is_active: bool
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Symptom Check Schemas
 class SymptomCheckCreate(BaseModel):
     symptoms: str  # Comma-separated string
@@ -231,6 +286,44 @@ class ConsultationResponse(BaseModel):
         from_attributes = True
 
 
+# Provider Availability Schemas
+class BookedInterval(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class ProviderAvailability(BaseModel):
+    provider_id: str
+    user_id: str
+    slot_minutes: int
+    next_free_slot: Optional[datetime] = None
+    free_slots: List[datetime]
+    booked: List[BookedInterval]
+
+
+# Consultation Chat Schemas
+class ConsultationMessageCreate(BaseModel):
+    message: str = Field(..., min_length=1, max_length=4000)
+    attachment_url: Optional[str] = None
+
+
+class ConsultationMessageResponse(BaseModel):
+    id: str
+    consultation_id: str
+    sender_id: str
+    message: str
+    attachment_url: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ConsultationMessagePage(BaseModel):
+    data: List[ConsultationMessageResponse]
+    next_cursor: Optional[str] = None  # message id to pass as before/after for the next page
+
+
 # Emergency SOS Schemas
 class EmergencyCreate(BaseModel):
     latitude: float
@@ -291,6 +384,33 @@ class MedicalRecordResponse(BaseModel):
         from_attributes = True
 
 
+class RecordProviderSummary(BaseModel):
+    full_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class MedicalRecordListItem(MedicalRecordResponse):
+    provider: Optional[RecordProviderSummary] = None
+
+
+class HistorySearchHit(BaseModel):
+    kind: str  # 'medical_record', 'symptom_check' or 'consultation'
+    id: str
+    title: Optional[str] = None  # HTML-escaped, matches wrapped in <mark>
+    snippet: Optional[str] = None
+    score: float
+    occurred_at: Optional[datetime] = None
+
+
+class HistorySearchPage(BaseModel):
+    data: List[HistorySearchHit]
+    total: int
+    page: int
+    page_size: int
+
+
 # AI Chat Schemas
 class ChatMessage(BaseModel):
     role: str
@@ -322,6 +442,27 @@ class MedicineSuggestionResponse(BaseModel):
     suggestions: List[MedicineSuggestion]
     overallRecommendation: str
     warnings: List[str]
+    interactionAlerts: List[str] = []
+
+
+# MedGemma Structured Output Schemas (drive constrained JSON decoding)
+class SymptomAnalysisOutput(BaseModel):
+    diagnosis: str
+    suggested_conditions: List[str]
+    recommendations: str
+    urgency_level: Literal["emergency", "high", "moderate", "low"]
+    home_remedies: List[str]
+    warning_signs: List[str]
+    should_see_doctor: bool
+    triage_reasoning: str
+    follow_up: str
+
+
+class MedicineAnalysisOutput(BaseModel):
+    suggestions: List[MedicineSuggestion]
+    overallRecommendation: str
+    warnings: List[str]
+    interactionAlerts: List[str] = []
 
 
 # OCR Schemas
@@ -0,0 +1,172 @@
+"""
+Bisheshoggo AI - Response Serialization
+JSON fast path for the API.
+
+FastAPI's default path for ``response_model=dict`` walks the whole payload in
+Python with jsonable_encoder and then calls json.dumps. Here:
+
+  * ORJSONResponse is the app-wide default response class when orjson is
+    installed (falls back to the stdlib JSONResponse otherwise);
+  * hot list routes validate ORM rows straight into a response schema with a
+    cached pydantic TypeAdapter and write the JSON bytes in the same
+    Rust-side pass (``json_response``), skipping jsonable_encoder entirely.
+
+List and sync endpoints also speak MessagePack for clients on 2G links.
+``negotiated_response`` picks it when the Accept header prefers
+application/msgpack and the optional ``msgpack`` package is installed: the
+same schema dump, without quoting, with native ints/floats/bools and
+datetimes as msgpack timestamp extensions (naive ones are UTC, as SQLite
+stores them). ``MessagePackBodyMiddleware`` lets clients upload msgpack
+request bodies to any JSON route.
+"""
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any
+from uuid import UUID
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401  (ORJSONResponse imports it lazily)
+    DefaultJSONResponse = ORJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+
+@lru_cache(maxsize=None)
+def get_adapter(tp) -> TypeAdapter:
+    """TypeAdapter for ``tp``, built (core schema compiled) once per type."""
+    return TypeAdapter(tp)
+
+
+def dump_json(adapter: TypeAdapter, content: Any) -> bytes:
+    """
+    Validate ``content`` (ORM objects and read rows are read by attribute)
+    against the adapter's schema and serialize it to JSON bytes.
+    """
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def json_response(adapter: TypeAdapter, content: Any, status_code: int = 200) -> Response:
+    """
+    ``dump_json`` wrapped in a Response. Returning a Response bypasses
+    FastAPI's response_model re-validation and jsonable_encoder.
+    """
+    return Response(content=dump_json(adapter, content), status_code=status_code, media_type="application/json")
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime):
+        return msgpack.Timestamp.from_datetime(obj if obj.tzinfo else obj.replace(tzinfo=timezone.utc))
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (UUID, Decimal)):
+        return str(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+def dump_msgpack(adapter: TypeAdapter, content: Any) -> bytes:
+    """``dump_json``'s MessagePack counterpart, driven by the same schema."""
+    data = adapter.dump_python(adapter.validate_python(content, from_attributes=True))
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """True if ``accept`` ranks a MessagePack type above JSON (and msgpack is installed)."""
+    if msgpack is None or not accept:
+        return False
+    best_msgpack = best_json = 0.0
+    for part in accept.split(","):
+        media_type, *params = part.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in _MSGPACK_MEDIA_TYPES:
+            best_msgpack = max(best_msgpack, q)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            best_json = max(best_json, q)
+    return best_msgpack > 0 and best_msgpack >= best_json
+
+
+def negotiated_response(request: Request, adapter: TypeAdapter, content: Any, status_code: int = 200) -> Response:
+    """``json_response``, or MessagePack if the client's Accept header prefers it."""
+    if prefers_msgpack(request.headers.get("accept", "")):
+        return Response(content=dump_msgpack(adapter, content), status_code=status_code, media_type=MSGPACK_MEDIA_TYPE)
+    return json_response(adapter, content, status_code)
+
+
+def _msgpack_to_json(obj):
+    if isinstance(obj, msgpack.Timestamp):
+        return obj.to_datetime().isoformat()
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8")
+    raise TypeError(f"Cannot convert {type(obj).__name__} to JSON")
+
+
+class MessagePackBodyMiddleware:
+    """
+    Pure ASGI middleware transcoding MessagePack request bodies to JSON, so
+    offline-sync uploads can be sent as msgpack to the existing JSON routes
+    and validated by the same request schemas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or msgpack is None:
+            return await self.app(scope, receive, send)
+        content_type = next((value for name, value in scope["headers"] if name == b"content-type"), b"")
+        if content_type.split(b";")[0].strip().decode("latin-1").lower() not in _MSGPACK_MEDIA_TYPES:
+            return await self.app(scope, receive, send)
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        try:
+            data = msgpack.unpackb(b"".join(chunks), raw=False, timestamp=0)
+            body = json.dumps(data, default=_msgpack_to_json, ensure_ascii=False).encode("utf-8")
+        except (ValueError, TypeError, msgpack.UnpackException):
+            response = DefaultJSONResponse({"detail": "Malformed MessagePack body"}, status_code=400)
+            return await response(scope, receive, send)
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value) for name, value in scope["headers"] if name not in (b"content-type", b"content-length")
+        ] + [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+        sent = False
+
+        async def receive_json():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, receive_json, send)
@@ -0,0 +1,432 @@
+"""
+Bisheshoggo AI - Tracing
+Minimal OpenTelemetry-compatible tracing: W3C ``traceparent`` propagation,
+parent-based head sampling by trace-ID ratio, and spans exported as OTLP/JSON
+(the format any OpenTelemetry collector accepts on /v1/traces).
+
+Usage:
+    with start_span("gemma_api.generate_content", {"endpoint": "chat"}) as span:
+        ...
+An exception escaping the block marks the span as an error and is re-raised.
+When tracing is off or a trace is not sampled, spans are shared no-op objects,
+so instrumented code costs about one ContextVar lookup.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span:
+    """A recording span; field names follow the OTLP span model."""
+
+    __slots__ = ("name", "context", "parent_span_id", "kind", "start_ns", "end_ns",
+                 "attributes", "events", "status_code", "status_message")
+
+    is_recording = True
+
+    def __init__(self, name: str, context: SpanContext, parent_span_id: str, kind: int, attributes: dict):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.events = []
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: dict = None):
+        self.events.append((time.time_ns(), name, attributes or {}))
+
+    def set_status(self, code: int, message: str = ""):
+        self.status_code = code
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.add_event("exception", {
+            "exception.type": type(exc).__name__,
+            "exception.message": str(exc),
+        })
+        self.set_status(STATUS_ERROR, str(exc))
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            _processor.on_end(self)
+
+
+class NonRecordingSpan:
+    """Carries trace context for propagation but records nothing."""
+
+    __slots__ = ("context",)
+
+    is_recording = False
+    name = ""
+
+    def __init__(self, context: SpanContext = None):
+        self.context = context
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def set_status(self, code, message=""):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = NonRecordingSpan()
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+# ── Exporters ────────────────────────────────────────────────────
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict):
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def span_to_otlp(span: Span) -> dict:
+    """Encode one span as an OTLP/JSON span object."""
+    encoded = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "events": [
+            {"timeUnixNano": str(ts), "name": name, "attributes": _otlp_attributes(attrs)}
+            for ts, name, attrs in span.events
+        ],
+        "status": {"code": span.status_code, "message": span.status_message},
+    }
+    if span.parent_span_id:
+        encoded["parentSpanId"] = span.parent_span_id
+    return encoded
+
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list; for tests and local debugging."""
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: list):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> list:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class LoggingSpanExporter:
+    """Writes each span as a structured log record (JSON when LOG_FORMAT=json)."""
+
+    def export(self, spans: list):
+        for span in spans:
+            logger.info("span %s", span.name, extra={"span": span_to_otlp(span)})
+
+    def shutdown(self):
+        pass
+
+
+class OTLPHTTPExporter:
+    """POSTs OTLP/JSON batches to an OpenTelemetry collector."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+
+    def export(self, spans: list):
+        import httpx
+        body = {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "bisheshoggo"}, "spans": [span_to_otlp(s) for s in spans]}],
+        }]}
+        try:
+            httpx.post(self.url, json=body, timeout=5.0).raise_for_status()
+        except Exception as e:
+            logger.warning("Dropped %d spans, OTLP export to %s failed: %s", len(spans), self.url, e)
+
+    def shutdown(self):
+        pass
+
+
+# ── Span processors ──────────────────────────────────────────────
+class SimpleSpanProcessor:
+    """Exports each span synchronously as it ends."""
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    def on_end(self, span):
+        self.exporter.export([span])
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them in batches from a background thread."""
+
+    def __init__(self, exporter, max_batch: int = 256, interval: float = 2.0, max_queue: int = 4096):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never block a request on telemetry
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    if batch:
+                        self.exporter.export(batch)
+                    return
+                batch.append(span)
+            if batch:
+                self.exporter.export(batch)
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+        self.exporter.shutdown()
+
+
+class _NoopProcessor:
+    def on_end(self, span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+_processor = _NoopProcessor()
+_enabled = False
+_sample_threshold = 0
+
+
+def configure_tracing(exporter=None, sample_rate: float = None, batch: bool = None):
+    """
+    Install an exporter and head-sampling rate. With no exporter, one is built
+    from TRACE_EXPORTER ("none", "log", "otlp" or "memory"); "none" disables
+    tracing. Returns the exporter so callers (tests) can inspect it.
+    """
+    global _processor, _enabled, _sample_threshold
+
+    if exporter is None:
+        kind = settings.TRACE_EXPORTER
+        if kind == "log":
+            exporter = LoggingSpanExporter()
+        elif kind == "otlp":
+            exporter = OTLPHTTPExporter(settings.OTEL_EXPORTER_OTLP_ENDPOINT, settings.OTEL_SERVICE_NAME)
+        elif kind == "memory":
+            exporter = InMemorySpanExporter()
+        elif kind != "none":
+            raise ValueError(f"Unknown TRACE_EXPORTER {kind!r}")
+
+    _processor.shutdown()
+    if exporter is None:
+        _processor, _enabled = _NoopProcessor(), False
+        return None
+
+    if batch is None:
+        batch = not isinstance(exporter, InMemorySpanExporter)
+    _processor = BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter)
+    rate = settings.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    _sample_threshold = int(max(0.0, min(1.0, rate)) * (1 << 64))
+    _enabled = True
+    return exporter
+
+
+def shutdown_tracing():
+    """Flush pending spans and turn tracing off."""
+    global _processor, _enabled
+    _processor.shutdown()
+    _processor, _enabled = _NoopProcessor(), False
+
+
+# ── Context and propagation ──────────────────────────────────────
+def parse_traceparent(header: str):
+    """Parse a W3C traceparent header into a SpanContext, or None if invalid."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 0x01))
+
+
+def current_span():
+    """The active span (possibly a no-op)."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def current_traceparent():
+    """traceparent header value for the active trace, or None."""
+    span = _current_span.get()
+    return span.context.traceparent if span is not None and span.context is not None else None
+
+
+def _new_context(parent: SpanContext):
+    span_id = os.urandom(8).hex()
+    if parent is not None:
+        return SpanContext(parent.trace_id, span_id, parent.sampled)
+    trace_id = os.urandom(16).hex()
+    # TraceIdRatioBased: sample when the low 64 bits fall under the threshold
+    return SpanContext(trace_id, span_id, int(trace_id[16:], 16) < _sample_threshold)
+
+
+@contextmanager
+def start_span(name: str, attributes: dict = None, kind: int = SPAN_KIND_INTERNAL,
+               parent: SpanContext = None, attach: bool = True):
+    """
+    Open a span as a child of ``parent`` (default: the active span).
+
+    Pass ``attach=False`` when the block spans generator yields that may
+    resume in another thread or context (dependencies with ``yield``,
+    streaming bodies); the span is then recorded but not made active.
+    """
+    if not _enabled:
+        yield _NOOP_SPAN
+        return
+
+    if parent is None:
+        active = _current_span.get()
+        parent = active.context if active is not None else None
+    context = _new_context(parent)
+    if context.sampled:
+        span = Span(name, context, parent.span_id if parent else None, kind, attributes)
+    else:
+        span = NonRecordingSpan(context)
+
+    token = _current_span.set(span) if attach else None
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        raise
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+        span.end()
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            return await self.app(scope, receive, send)
+
+        parent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        with start_span(f"{scope['method']} {scope['path']}", {"http.method": scope["method"]},
+                        kind=SPAN_KIND_SERVER, parent=parent) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route and span.is_recording:
+                    span.name = f"{scope['method']} {route}"
+                span.set_attributes({"http.route": route, "http.status_code": status_holder[0]})
+                if status_holder[0] >= 500:
+                    span.set_status(STATUS_ERROR)
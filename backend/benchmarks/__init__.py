@@ -0,0 +1 @@
+# Bisheshoggo AI - Benchmarks
@@ -0,0 +1,263 @@
+"""
+Bisheshoggo AI - API Load Benchmark
+Drives the FastAPI app in-process (httpx over ASGI, no network, no GPU) with
+concurrent virtual users and reports throughput and p50/p95/p99 latency for:
+
+    login          POST /api/auth/login
+    symptom_check  POST /api/symptom-check     (rule-based path)
+    facilities     GET  /api/facilities
+    sos            POST /api/emergency
+    chat_sse       POST /api/ai/chat           (SSE, stubbed model)
+
+The database is a fresh SQLite file seeded by app.seed plus one patient per
+virtual user. Inference runs on the stub backend (MEDGEMMA_INFERENCE_MODE=stub),
+instant by default so results measure our own code paths; --stub-prefill-ms
+and --stub-tokens-per-second add simulated model time. Symptom checks are
+forced down the rule-based path.
+
+Run from backend/:
+    python -m benchmarks.bench_api --requests 200 --concurrency 8 --output results.json
+    python -m benchmarks.bench_api --baseline benchmarks/baseline_api.json   # exit 1 on regression
+    python -m benchmarks.bench_api --save-baseline benchmarks/baseline_api.json
+
+Absolute numbers depend on the machine: re-record the baseline on the
+machine that runs the comparison. Back-to-back runs on a shared runner vary
+by up to ~40% per scenario, hence the default --tolerance of 0.5. Logs go to
+stderr so stdout holds only the report.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("login", "symptom_check", "facilities", "sos", "chat_sse")
+PASSWORD = "bench-password-123"
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _force_rule_based_symptom_check():
+    """Make the symptom-check route skip MedGemma and LLaMA Stack."""
+    from app import medgemma_service
+    from app.routers import symptom_check
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("benchmark: MedGemma disabled for the rule-based scenario")
+
+    # The route imports medgemma_symptom_analysis at call time
+    medgemma_service.medgemma_symptom_analysis = unavailable
+    symptom_check.call_local_llama = lambda prompt: None
+
+
+def _seed(users: int) -> list:
+    """Seed facilities and create one patient per virtual user; returns their emails."""
+    from app import models
+    from app.auth import get_password_hash
+    from app.database import SessionLocal, init_db
+    from app.seed import seed_database
+
+    init_db()
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the JSON report
+        seed_database()
+    hashed = get_password_hash(PASSWORD)
+    emails = [f"bench-user-{i}@example.com" for i in range(users)]
+    db = SessionLocal()
+    try:
+        for email in emails:
+            db.add(models.User(email=email, hashed_password=hashed, full_name="Bench Patient"))
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+
+def _requests_for(scenario: str):
+    """(method, path, json body, stream) for one iteration of ``scenario``."""
+    if scenario == "symptom_check":
+        return "POST", "/api/symptom-check", {
+            "symptoms": "fever, headache, body ache",
+            "severity": "moderate",
+            "duration": "3 days",
+        }, False
+    if scenario == "facilities":
+        return "GET", "/api/facilities", None, False
+    if scenario == "sos":
+        return "POST", "/api/emergency", {
+            "latitude": 22.1953, "longitude": 92.2184,
+            "location": "Bandarban Sadar", "emergency_type": "medical",
+            "description": "benchmark",
+        }, False
+    if scenario == "chat_sse":
+        return "POST", "/api/ai/chat", {
+            "messages": [{"role": "user", "content": "আমার ৩ দিন ধরে জ্বর, কী করব?"}],
+        }, True
+    raise ValueError(scenario)
+
+
+async def _run_scenario(client, scenario: str, emails: list, tokens: list, total: int, concurrency: int):
+    latencies, errors = [], 0
+    remaining = [total]
+
+    async def one(worker: int):
+        if scenario == "login":
+            response = await client.post("/api/auth/login", json={"email": emails[worker], "password": PASSWORD})
+            return response.status_code
+        method, path, body, stream = _requests_for(scenario)
+        headers = {"Authorization": f"Bearer {tokens[worker]}"}
+        if stream:
+            async with client.stream(method, path, json=body, headers=headers) as response:
+                async for chunk in response.aiter_text():
+                    pass
+                if not chunk.rstrip().endswith("data: [DONE]"):
+                    return 599
+                return response.status_code
+        response = await client.request(method, path, json=body, headers=headers)
+        return response.status_code
+
+    async def worker(index: int):
+        nonlocal errors
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status = await one(index)
+            except Exception:
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            if status >= 400 or status == 0:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def _run(args, emails: list) -> dict:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = []
+            for email in emails:
+                response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+                response.raise_for_status()
+                tokens.append(response.json()["access_token"])
+
+            results = {}
+            for scenario in args.scenarios:
+                # Warm caches, connections and lazy imports before measuring
+                await _run_scenario(client, scenario, emails, tokens, args.warmup, args.concurrency)
+                results[scenario] = await _run_scenario(
+                    client, scenario, emails, tokens, args.requests, args.concurrency,
+                )
+                print(f"[Bench] {scenario:14s} {json.dumps(results[scenario])}", file=sys.stderr)
+            return results
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for scenario, current in results.items():
+        reference = baseline.get("scenarios", {}).get(scenario)
+        if not reference:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if reference[metric] and current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{scenario} {metric} {current[metric]} > baseline {reference[metric]}")
+        if reference["throughput_rps"] and current["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario} throughput {current['throughput_rps']} < baseline {reference['throughput_rps']}"
+            )
+        if current["errors"] > reference.get("errors", 0):
+            regressions.append(f"{scenario} errors {current['errors']} > baseline {reference.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--stub-prefill-ms", type=float, default=0.0, help="stub backend time to first token")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=0.0, help="stub decode rate (0 = instant)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown")
+    parser.add_argument("--save-baseline", help="write these results as the new baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configure before anything under app/ is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ["LOG_STREAM"] = "stderr"  # stdout carries the JSON report
+        os.environ.setdefault("TRACE_EXPORTER", "none")
+        os.environ["GROQ_API_KEY"] = ""
+        os.environ["GOOGLE_API_KEY"] = ""
+        os.environ["MEDGEMMA_INFERENCE_MODE"] = "stub"
+        os.environ["STUB_PREFILL_MS"] = str(args.stub_prefill_ms)
+        os.environ["STUB_TOKENS_PER_SECOND"] = str(args.stub_tokens_per_second)
+
+        emails = _seed(args.concurrency)
+        _force_rule_based_symptom_check()
+        results = asyncio.run(_run(args, emails))
+
+    report = {
+        "benchmark": "api",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "stub_prefill_ms": args.stub_prefill_ms,
+            "stub_tokens_per_second": args.stub_tokens_per_second,
+        },
+        "scenarios": results,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"[Bench] REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Bisheshoggo AI - Consultation Chat Broker Benchmark
+Drives app.chat.ChatBroker in-process against a temporary SQLite file:
+--consultations channels with two subscribers each (patient and provider),
+every channel sending --messages messages at --rate messages/second.
+
+Each subscriber is a task draining its queue, standing in for a socket
+writer. Reports publish -> subscriber-dequeue latency percentiles, messages
+per write batch, and the time until every message is committed.
+Run from backend/:  python -m benchmarks.bench_chat --consultations 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+async def _run(consultations: int, messages: int, rate: float) -> dict:
+    from app import chat, schemas
+
+    broker = chat.ChatBroker()
+    batches = []
+    insert = chat._insert_messages
+
+    def counting_insert(rows):
+        batches.append(len(rows))
+        insert(rows)
+
+    chat._insert_messages = counting_insert
+    latencies = []
+    expected = consultations * messages * 2
+
+    async def subscriber(subscription):
+        received = 0
+        while received < messages:
+            event = await subscription.queue.get()
+            sent_at = json.loads(event)["client_id"]
+            latencies.append(time.perf_counter() - float(sent_at))
+            received += 1
+
+    async def sender(consultation_id: str, futures: list):
+        await asyncio.sleep(random.random() / rate)
+        for _ in range(messages):
+            data = schemas.ConsultationMessageCreate(message="আমার তিন দিন ধরে জ্বর, কী করব?")
+            futures.append(broker.send(consultation_id, "patient", data, client_id=repr(time.perf_counter())))
+            await asyncio.sleep(1 / rate)
+
+    ids = [f"consultation-{i}" for i in range(consultations)]
+    readers = [
+        asyncio.create_task(subscriber(broker.subscribe(consultation_id, user)))
+        for consultation_id in ids for user in ("patient", "provider")
+    ]
+    futures = []
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(consultation_id, futures) for consultation_id in ids))
+    await asyncio.gather(*readers)
+    await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - start
+    await broker.close()
+    chat._insert_messages = insert
+
+    latencies.sort()
+    assert len(latencies) == expected
+    return {
+        "deliveries": expected,
+        "fanout_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 3),
+            "p99": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "write_batches": len(batches),
+        "messages_per_batch": round(statistics.mean(batches), 1),
+        "seconds_to_all_committed": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultations", type=int, default=2000, help="concurrent consultations")
+    parser.add_argument("--messages", type=int, default=5, help="messages sent per consultation")
+    parser.add_argument("--rate", type=float, default=1.0, help="messages per second per consultation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app.database import init_db
+        init_db()
+        result = asyncio.run(_run(args.consultations, args.messages, args.rate))
+
+    print(json.dumps({**vars(args), **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Bisheshoggo AI - Response Compression Benchmark
+Bytes on the wire and compression CPU per encoding, over bodies captured from
+the running app (seeded SQLite file, stub inference backend):
+
+    facilities       GET  /api/facilities
+    providers        GET  /api/providers
+    medical_records  GET  /api/medical-records
+    symptom_check    POST /api/symptom-check, a few symptom sets (Bengali advice)
+    chat_sse         POST /api/ai/chat, re-split into per-token deltas
+
+Complete bodies are compressed one-shot, as CompressionMiddleware does. The
+chat answer is streamed twice, one SSE event per token delta (the old
+behaviour) and batched as at --tokens-per-second with SSE_BATCH_MS, each
+event followed by the encoder's sync flush. Only encodings whose optional
+package is installed are measured; levels come from the COMPRESSION_*
+settings, so they can be tuned through the environment.
+Run from backend/:  python -m benchmarks.bench_compression --rows 200
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import re
+import tempfile
+import time
+
+_SYMPTOM_SETS = [
+    {"symptoms": "fever, cough, headache", "severity": "moderate", "duration": "3 days"},
+    {"symptoms": "diarrhea, vomiting", "severity": "mild", "duration": "1 day"},
+    {"symptoms": "chest pain, shortness of breath", "severity": "severe", "duration": "2 hours"},
+    {"symptoms": "skin rash, itching", "severity": "mild", "duration": "1 week"},
+]
+_CHAT = {"messages": [{"role": "user", "content": "আমার তিন দিন ধরে জ্বর আর মাথাব্যথা। কী করব?"}]}
+
+
+async def _request(app, method: str, path: str, token: str = None, body: dict = None) -> list:
+    """Drive the ASGI app directly and return the response body chunks as sent."""
+    headers = [(b"host", b"bench"), (b"accept-encoding", b"identity")]
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    if payload:
+        headers.append((b"content-type", b"application/json"))
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode("latin-1")))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    chunks, sent = [], False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, (path, message["status"])
+        elif message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+
+    await app(scope, receive, send)
+    return chunks
+
+
+async def _capture(rows: int) -> dict:
+    from app.auth import create_access_token
+    from app.main import app
+    from benchmarks.bench_read_models import _seed
+
+    async with app.router.lifespan_context(app):
+        _seed(rows)
+        token = create_access_token({"sub": "patient"})
+        corpus = {}
+        for name, path in (("facilities", "/api/facilities"), ("providers", "/api/providers"),
+                           ("medical_records", "/api/medical-records")):
+            corpus[name] = b"".join(await _request(app, "GET", path, token))
+        for i, symptoms in enumerate(_SYMPTOM_SETS):
+            corpus[f"symptom_check_{i}"] = b"".join(await _request(app, "POST", "/api/symptom-check", token, symptoms))
+        events = b"".join(await _request(app, "POST", "/api/ai/chat", token, _CHAT)).decode("utf-8")
+    answer = "".join(
+        json.loads(line[len("data: "):])["content"]
+        for line in events.split("\n\n") if line.startswith("data: {")
+    )
+    return corpus, answer
+
+
+def _sse_events(deltas: list) -> list:
+    return [f"data: {json.dumps({'content': delta})}\n\n".encode("utf-8") for delta in deltas] + [b"data: [DONE]\n\n"]
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def _stream(coding: str, events: list) -> int:
+    from app.compression import ENCODERS
+
+    encoder = ENCODERS[coding]()
+    size = 0
+    for event in events:
+        size += len(encoder.compress(event) + encoder.flush())
+    return size + len(encoder.finish())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="facilities, providers and records to seed")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="upstream decode rate for SSE batching")
+    parser.add_argument("--repeat", type=int, default=20, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["MEDGEMMA_INFERENCE_MODE"] = "stub"
+        os.environ.setdefault("STUB_TOKENS_PER_SECOND", "0")
+        os.environ.setdefault("STUB_PREFILL_MS", "0")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        corpus, answer = asyncio.run(_capture(args.rows))
+
+    from app.compression import ENCODERS, compress_body
+    from app.config import settings
+
+    bodies = []
+    for name, body in corpus.items():
+        entry = {"body": name, "identity_bytes": len(body)}
+        if len(body) < settings.COMPRESSION_MIN_SIZE:
+            entry["below_threshold"] = True
+        for coding in ENCODERS:
+            size = len(compress_body(coding, body))
+            entry[coding] = {
+                "bytes": size,
+                "ratio": round(size / len(body), 3),
+                "us": round(_best(lambda: compress_body(coding, body), args.repeat) * 1e6, 1),
+            }
+        bodies.append(entry)
+
+    tokens = re.findall(r"\S+\s*", answer)
+    per_batch = max(1, round(args.tokens_per_second * settings.SSE_BATCH_MS / 1000))
+    streams = {
+        "per_token": _sse_events(tokens),
+        "batched": _sse_events(["".join(tokens[i:i + per_batch]) for i in range(0, len(tokens), per_batch)]),
+    }
+    sse = []
+    for name, events in streams.items():
+        entry = {"stream": name, "events": len(events), "identity_bytes": sum(map(len, events))}
+        for coding in ENCODERS:
+            entry[coding] = {
+                "bytes": _stream(coding, events),
+                "us": round(_best(lambda: _stream(coding, events), args.repeat) * 1e6, 1),
+            }
+        sse.append(entry)
+
+    total = {"identity": sum(entry["identity_bytes"] for entry in bodies)}
+    for coding in ENCODERS:
+        total[coding] = sum(entry[coding]["bytes"] for entry in bodies)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "encodings": list(ENCODERS),
+        "min_size": settings.COMPRESSION_MIN_SIZE,
+        "bodies": bodies,
+        "bodies_total_bytes": total,
+        "sse": sse,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Bisheshoggo AI - Medical History Search Benchmark
+Seeds --records medical records and --records symptom checks, spread over
+--patients patients, into a temporary SQLite file through the ORM, so the
+app.history_search flush hook indexes every row as it is written. Reports
+the seeding rate, then best-of latency of history_index.search for one
+patient (and for the provider who wrote every record) with common, rare,
+prefix and Bengali queries.
+Run from backend/:  python -m benchmarks.bench_history_search --records 50000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+
+_TITLES = ["জ্বর ও কাশি", "Blood test", "ডায়াবেটিস ফলোআপ", "Chest X-ray", "Prescription", "পেটে ব্যথা"]
+_DIAGNOSES = ["Viral fever", "Type 2 diabetes", "Hypertension", "Gastritis", "ম্যালেরিয়া", "ডেঙ্গু জ্বর", "Dengue fever"]
+_SYMPTOMS = ["fever", "headache", "cough", "জ্বর", "মাথাব্যথা", "chest pain", "vomiting", "rash"]
+_DRUGS = ["Paracetamol", "Metformin", "Amlodipine", "Omeprazole", "Artemether", "ORS"]
+
+_QUERIES = {
+    "common": "fever",
+    "rare_prefix": "artemet",
+    "bengali": "জ্বর",
+    "two_words": "dengue fever",
+}
+
+
+def _seed(patients: int, records: int) -> float:
+    from app import models
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    rng = random.Random(0)
+    db = SessionLocal()
+    try:
+        users = [models.User(email=f"patient{i}@example.com", hashed_password="x" * 60, full_name=f"Patient {i}")
+                 for i in range(patients)]
+        doctor = models.User(email="doctor@example.com", hashed_password="x" * 60, full_name="Doctor",
+                             role=models.UserRole.doctor)
+        db.add_all(users + [doctor])
+        db.commit()
+        user_ids, doctor_id = [user.id for user in users], doctor.id
+
+        start = time.perf_counter()
+        for batch in range(0, records, 1000):
+            for _ in range(min(1000, records - batch)):
+                patient_id = rng.choice(user_ids)
+                db.add(models.MedicalRecord(
+                    patient_id=patient_id, provider_id=doctor_id, record_type="prescription",
+                    title=rng.choice(_TITLES), diagnosis=rng.choice(_DIAGNOSES),
+                    description="তিন দিন ধরে জ্বরে ভুগছেন, follow up in one week",
+                    prescriptions={"items": [{"name": rng.choice(_DRUGS), "dosage": "500mg"}]},
+                ))
+                db.add(models.SymptomCheck(
+                    user_id=patient_id, symptoms=rng.sample(_SYMPTOMS, 3), severity="moderate",
+                    diagnosis=rng.choice(_DIAGNOSES),
+                ))
+            db.commit()
+        return time.perf_counter() - start, user_ids[0], doctor_id
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=50000, help="medical records (and as many symptom checks)")
+    parser.add_argument("--repeat", type=int, default=20, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        seconds, patient_id, doctor_id = _seed(args.patients, args.records)
+
+        from app.database import SessionLocal
+        from app.history_search import history_index
+
+        db = SessionLocal()
+        try:
+            results = []
+            for searcher, user_id in (("patient", patient_id), ("provider", doctor_id)):
+                for name, query in _QUERIES.items():
+                    total, _ = history_index.search(db, query, user_id)
+                    best = float("inf")
+                    gc.disable()
+                    try:
+                        for _ in range(args.repeat):
+                            start = time.perf_counter()
+                            history_index.search(db, query, user_id)
+                            best = min(best, time.perf_counter() - start)
+                    finally:
+                        gc.enable()
+                    results.append({"searcher": searcher, "query": name, "matches": total, "ms": round(best * 1000, 2)})
+        finally:
+            db.close()
+
+    print(json.dumps({
+        "documents": args.records * 2,
+        "indexed_writes_per_second": round(args.records * 2 / seconds),
+        "results": results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
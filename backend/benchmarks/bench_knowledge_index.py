@@ -0,0 +1,118 @@
+"""
+Bisheshoggo AI - Knowledge Index Benchmark
+Builds app.knowledge_index over the shipped knowledge base plus --chunks
+synthetic guideline paragraphs (each drawn mostly from one of ten English and
+Bengali clinical topics) in a temporary directory, then reports build time, time to map
+the index, best-of search latency with IVF probing against an exhaustive
+scan (nprobe = every list), and recall@k of the probed search.
+Run from backend/:  python -m benchmarks.bench_knowledge_index --chunks 2000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+
+_TOPICS = [
+    "fever high temperature paracetamol sponging fluids rest জ্বর প্যারাসিটামল",
+    "diarrhea loose stool dehydration ors zinc saline ডায়রিয়া স্যালাইন পাতলা পায়খানা",
+    "malaria dengue mosquito rash platelet bleeding ম্যালেরিয়া ডেঙ্গু মশা",
+    "pneumonia cough breathlessness wheeze asthma inhaler শ্বাসকষ্ট কাশি নিউমোনিয়া",
+    "snake bite venom immobilize limb antivenom hospital সাপ কামড় বিষ",
+    "pregnancy bleeding eclampsia headache swelling antenatal গর্ভাবস্থা প্রসব",
+    "diabetes insulin blood sugar metformin diet ডায়াবেটিস ইনসুলিন",
+    "hypertension blood pressure amlodipine salt stroke উচ্চ রক্তচাপ",
+    "chest pain heart attack aspirin sweating referral বুকে ব্যথা হৃদরোগ",
+    "wound burn fracture bleeding dressing splint ক্ষত পোড়া রক্তপাত",
+]
+_COMMON = "patient child adult elderly dose tablet syrup clinic urgent referral day week treatment শিশু ওষুধ হাসপাতাল".split()
+
+_QUERIES = [
+    "child with high fever and rash for three days",
+    "পাতলা পায়খানা ও বমি, স্যালাইন কীভাবে খাওয়াব",
+    "snake bite on the leg, what first aid",
+    "pregnant woman with severe headache and swelling",
+    "বুকে ব্যথা ও শ্বাসকষ্ট",
+    "blood sugar high, insulin dose",
+]
+
+
+def _write_guidelines(directory: str, chunks: int, rng: random.Random):
+    per_file = 50
+    for start in range(0, chunks, per_file):
+        paragraphs = []
+        for i in range(start, min(start + per_file, chunks)):
+            topic = _TOPICS[rng.randrange(len(_TOPICS))].split()
+            words = [rng.choice(topic if rng.random() < 0.6 else _COMMON) for _ in range(rng.randint(40, 110))]
+            paragraphs.append(f"## Guideline {i}\n\n" + " ".join(words) + ".")
+        with open(os.path.join(directory, f"guideline-{start // per_file}.md"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="synthetic guideline paragraphs")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=10, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        guidelines = os.path.join(tmp, "guidelines")
+        os.mkdir(guidelines)
+        _write_guidelines(guidelines, args.chunks, random.Random(0))
+        os.environ["KNOWLEDGE_SOURCES"] = guidelines
+        os.environ["KNOWLEDGE_INDEX_PATH"] = os.path.join(tmp, "knowledge_index.bin")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app import knowledge_index as ki
+
+        paths = ki.source_paths()
+        chunks = ki.load_chunks(paths)
+        start = time.perf_counter()
+        ki.build_index(chunks, ki.Path(os.environ["KNOWLEDGE_INDEX_PATH"]), ki.fingerprint(paths))
+        build_s = time.perf_counter() - start
+
+        service = ki.KnowledgeIndex(os.environ["KNOWLEDGE_INDEX_PATH"])
+        start = time.perf_counter()
+        index = service.load()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        probed = _best(lambda: [index.search(q, args.k, args.nprobe) for q in _QUERIES], args.repeat) / len(_QUERIES)
+        exhaustive = _best(lambda: [index.search(q, args.k, index.lists) for q in _QUERIES], args.repeat) / len(_QUERIES)
+        found = total = 0
+        for query in _QUERIES:
+            exact = {hit.chunk.id for hit in index.search(query, args.k, index.lists)}
+            found += len(exact & {hit.chunk.id for hit in index.search(query, args.k, args.nprobe)})
+            total += len(exact)
+        size = os.path.getsize(os.environ["KNOWLEDGE_INDEX_PATH"])
+
+    print(json.dumps({
+        "chunks": index.count,
+        "lists": index.lists,
+        "nprobe": args.nprobe,
+        "index_bytes": size,
+        "build_s": round(build_s, 2),
+        "load_ms": round(load_ms, 2),
+        "search_ms": round(probed * 1000, 3),
+        "exhaustive_search_ms": round(exhaustive * 1000, 3),
+        f"recall_at_{args.k}": round(found / total, 3) if total else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Bisheshoggo AI - Logging Overhead Benchmark
+Measures what one symptom-check request spends on logging in the calling
+(event loop) thread: the old ten synchronous print() lines versus the
+queue-backed structured logger, unsampled and with the default sampling.
+
+Each mode runs in a fresh child process whose stdout is a pipe drained by
+this process, which is how the API runs under a process manager: once
+without limit and once through a slow sink (a busy terminal or log shipper),
+where the pipe fills up and every synchronous write stalls its caller.
+Run from backend/:  python -m benchmarks.bench_logging --requests 20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+CHILD_SCRIPT = r"""
+import json, logging, sys, time
+mode, requests = sys.argv[1], int(sys.argv[2])
+symptoms = ["fever", "cough", "headache"]
+
+if mode == "print":
+    def one_request():
+        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print("🩺 OFFLINE DR - Analyzing Symptoms...")
+        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print(f"📋 Symptoms: {symptoms}")
+        print(f"⚡ Severity: moderate")
+        print(f"⏱️ Duration: 3 days")
+        print("🦙 Trying Local LLaMA Stack for AI diagnosis...")
+        print("📋 Using rule-based diagnosis system...")
+        print(f"✅ Diagnosis: Common Cold / Flu")
+        print(f"🚨 Urgency: moderate")
+        print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+else:
+    from app.config import settings
+    settings.LOG_SAMPLE_RATE = 1.0 if mode == "logging" else settings.LOG_SAMPLE_RATE
+    from app.logging_config import request_id_var, setup_logging, shutdown_logging
+    setup_logging()
+    logger = logging.getLogger("app.routers.symptom_check")
+    request_id_var.set("bench")
+
+    def one_request():
+        logger.info("Symptom check started", extra={"symptom_count": len(symptoms), "severity": "moderate", "sample": True})
+        logger.warning("MedGemma failed, trying Local LLaMA Stack: %s", "CUDA not available")
+        logger.info("Symptom check complete", extra={"model": "Rule-based System", "urgency_level": "moderate", "sample": True})
+
+for _ in range(200):
+    one_request()
+start = time.perf_counter()
+for _ in range(requests):
+    one_request()
+elapsed = time.perf_counter() - start
+if mode != "print":
+    shutdown_logging()
+sys.stdout.flush()
+sys.stderr.write(json.dumps({"mode": mode, "us_per_request": elapsed / requests * 1e6}) + "\n")
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("print", "logging", "logging_sampled")
+
+
+def _measure(mode: str, requests: int, sink_kbps: int) -> dict:
+    env = {**os.environ, "PYTHONIOENCODING": "utf-8", "LOG_FORMAT": "json"}
+    proc = subprocess.Popen(
+        [sys.executable, "-c", CHILD_SCRIPT, mode, str(requests)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    # Drain stdout like a log shipper would; a throttled sink makes the pipe
+    # fill up, at which point a synchronous write blocks its caller
+    stdout_bytes = 0
+    while True:
+        chunk = proc.stdout.read1(4096) if sink_kbps else proc.stdout.read1(1 << 20)
+        if not chunk:
+            break
+        stdout_bytes += len(chunk)
+        if sink_kbps:
+            time.sleep(len(chunk) / (sink_kbps * 1024))
+    stderr = proc.stderr.read().decode()
+    if proc.wait() != 0:
+        raise RuntimeError(f"{mode} run failed:\n{stderr}")
+    result = json.loads(stderr.strip().splitlines()[-1])
+    result["stdout_bytes"] = stdout_bytes
+    return result
+
+
+def _compare(requests: int, sink_kbps: int) -> list:
+    results = [_measure(mode, requests, sink_kbps) for mode in MODES]
+    baseline = results[0]["us_per_request"]
+    for result in results:
+        result["us_per_request"] = round(result["us_per_request"], 2)
+        result["vs_print"] = round(result["us_per_request"] / baseline, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sink-kbps", type=int, default=1024, help="throughput of the slow log sink")
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "requests": args.requests,
+        "fast_sink": _compare(args.requests, 0),
+        "slow_sink": {"kbps": args.sink_kbps, "results": _compare(args.requests // 10, args.sink_kbps)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Bisheshoggo AI - Patient Context Benchmark
+Seeds one patient with a full profile, --records medical records and
+--consultations completed consultations into a temporary SQLite file, then
+compares per-prompt cost: building the summary from the database
+(build_patient_context) against PatientContextCache.get hits, and reports the
+summary's estimated tokens against the history formatting it replaces
+(profile block plus the last five consultations, written out in full).
+Run from backend/:  python -m benchmarks.bench_patient_context --records 200
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def _best_per_call(fn, calls: int, repeat: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--consultations", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app import models
+        from app.database import SessionLocal, init_db
+        from app.patient_context import PatientContextCache, build_patient_context, estimate_tokens
+
+        init_db()
+        db = SessionLocal()
+        try:
+            user = models.User(email="patient@example.com", hashed_password="x" * 60, full_name="Patient")
+            db.add(user)
+            db.flush()
+            db.add(models.PatientProfile(
+                user_id=user.id, date_of_birth=date(1984, 3, 9), gender="female", blood_group="B+",
+                district="Bandarban", allergies=["Penicillin", "সালফা ওষুধ"],
+                current_medications=["Metformin 500mg twice daily", "Amlodipine 5mg"],
+                medical_conditions=["Type 2 diabetes", "Hypertension"],
+            ))
+            for i in range(args.records):
+                db.add(models.MedicalRecord(
+                    patient_id=user.id, record_type="lab_report", title=f"Report {i}",
+                    diagnosis=f"Follow-up {i}: HbA1c {6 + i % 4}.{i % 10}%", record_date=date(2026, 1, 1) + timedelta(days=i),
+                ))
+            for i in range(args.consultations):
+                db.add(models.Consultation(
+                    patient_id=user.id, consultation_type="chat", status=models.ConsultationStatus.completed,
+                    symptoms="জ্বর, মাথাব্যথা, শরীর ব্যথা", diagnosis=f"Viral fever episode {i}",
+                    prescription="Paracetamol 500mg 1+1+1 for 3 days, ORS after each loose stool",
+                ))
+            db.commit()
+
+            cache = PatientContextCache()
+            context = cache.get(db, user.id)
+            profile = db.query(models.PatientProfile).filter_by(user_id=user.id).one()
+            consultations = db.query(models.Consultation).filter_by(patient_id=user.id).limit(5).all()
+            replaced = (
+                f"Blood Group: {profile.blood_group}\nGender: {profile.gender}\n"
+                f"Medical Conditions: {', '.join(profile.medical_conditions)}\n"
+                f"Allergies: {', '.join(profile.allergies)}\n"
+                f"Current Medications: {', '.join(profile.current_medications)}\n\n"
+                + "\n\n".join(f"Diagnosis: {c.diagnosis}\nSymptoms: {c.symptoms}\nPrescription: {c.prescription}"
+                              for c in consultations)
+            )
+            built = _best_per_call(lambda: build_patient_context(db, user.id), args.calls // 5, args.repeat)
+            cached = _best_per_call(lambda: cache.get(db, user.id), args.calls, args.repeat)
+        finally:
+            db.close()
+
+    print(json.dumps({
+        "records": args.records,
+        "consultations": args.consultations,
+        "build_ms": round(built * 1000, 3),
+        "cached_get_ms": round(cached * 1000, 3),
+        "summary_tokens": estimate_tokens(context),
+        "replaced_history_tokens": estimate_tokens(replaced),
+        "summary": context,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Bisheshoggo AI - Provider Search Benchmark
+Seeds --providers random providers into a temporary SQLite file and times
+app.provider_search: the snapshot (index) build, then best-of latency for a
+mix of searches, from text-only to every filter plus distance ranking.
+Run from backend/:  python -m benchmarks.bench_provider_search --providers 5000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+
+_SPECIALIZATIONS = ["Cardiology", "General Medicine", "Pediatrics", "Gynecology", "Dermatology", "Orthopedics"]
+_LANGUAGES = ["Bangla", "English", "Chakma", "Marma", "Hindi"]
+_NAMES = ["Rahman", "Karim", "Chakma", "Marma", "Hasan", "Tripura", "Begum"]
+
+_SEARCHES = {
+    "text": {"query": "pediatric"},
+    "text_prefix_bengali": {"query": "গ্রাম"},
+    "filters": {"languages": ["Marma"], "telemedicine": True, "min_fee": 300, "max_fee": 500, "min_experience": 10},
+    "nearby": {"latitude": 22.19, "longitude": 92.21, "radius_km": 25, "sort": "distance"},
+    "everything": {
+        "query": "general medicine", "languages": ["Bangla", "Chakma"], "max_fee": 800,
+        "telemedicine": True, "latitude": 22.19, "longitude": 92.21,
+    },
+}
+
+
+def _seed(providers: int):
+    from app import models
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    rng = random.Random(0)
+    db = SessionLocal()
+    try:
+        for i in range(providers):
+            user = models.User(
+                email=f"doctor{i}@example.com", hashed_password="x" * 60,
+                full_name=f"Dr. {rng.choice(_NAMES)} {i}", role=models.UserRole.doctor,
+            )
+            db.add(user)
+            db.flush()
+            db.add(models.ProviderProfile(
+                user_id=user.id, specialization=rng.choice(_SPECIALIZATIONS), qualification="MBBS",
+                years_of_experience=rng.randint(0, 30), consultation_fee=rng.choice([None, 200, 300, 500, 800, 1000]),
+                languages=rng.sample(_LANGUAGES, 2), available_for_telemedicine=rng.random() < 0.6,
+                bio="বান্দরবান অঞ্চলে গ্রামীণ স্বাস্থ্যসেবা, rural health physician",
+                latitude=21.5 + rng.random() * 1.5, longitude=91.8 + rng.random() * 1.0,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        _seed(args.providers)
+
+        from app.database import SessionLocal
+        from app.provider_search import ProviderSearchIndex
+
+        db = SessionLocal()
+        try:
+            index = ProviderSearchIndex()
+            start = time.perf_counter()
+            index.ensure_fresh(db)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            results = []
+            for name, params in _SEARCHES.items():
+                total, _ = index.search(db, **params)
+                best = float("inf")
+                gc.disable()
+                try:
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        index.search(db, **params)
+                        best = min(best, time.perf_counter() - start)
+                finally:
+                    gc.enable()
+                results.append({"search": name, "matches": total, "ms": round(best * 1000, 2)})
+        finally:
+            db.close()
+
+    print(json.dumps({"providers": args.providers, "index_build_ms": round(build_ms, 1), "results": results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
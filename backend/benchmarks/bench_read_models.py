@@ -0,0 +1,155 @@
+"""
+Bisheshoggo AI - List Query Benchmark
+Compares the three list endpoints' query + serialization against a seeded
+SQLite file, loading full ORM entities (with joinedload relationships) versus
+the column-projection read models in app.read_models:
+
+    orm         session.query(Entity).options(joinedload(...)).all()
+    projection  select(<listed columns>) -> named tuples
+
+Both feed the same cached TypeAdapter, and the output is checked to be
+identical. Reports best-of wall time and tracemalloc peak per listing.
+Run from backend/:  python -m benchmarks.bench_read_models --rows 2000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+
+def _seed(rows: int):
+    from app import models
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        patient = models.User(id="patient", email="patient@example.com", hashed_password="x" * 60, full_name="Patient")
+        db.add(patient)
+        for i in range(rows):
+            db.add(models.MedicalFacility(
+                name=f"Upazila Health Complex {i:05d}", facility_type=models.FacilityType.hospital,
+                phone="+8801700000000", address="Main Road", village="Ruma", district="Bandarban",
+                division="Chittagong", latitude=22.19, longitude=92.21, operating_hours="24/7",
+                services_offered=["Emergency", "Maternity", "Pharmacy"], has_ambulance=True,
+                has_emergency=True, contact_person="Dr. Rahman",
+            ))
+            doctor = models.User(
+                id=f"doctor-{i}", email=f"doctor{i}@example.com", hashed_password="x" * 60,
+                full_name=f"Dr. {i}", phone="+8801700000000", role=models.UserRole.doctor,
+            )
+            db.add(doctor)
+            db.add(models.ProviderProfile(
+                user_id=doctor.id, specialization="General Medicine", license_number=f"BMDC-{i}",
+                qualification="MBBS", years_of_experience=7, consultation_fee=500.0,
+                languages=["Bangla", "English"], bio="Rural health physician.",
+            ))
+            db.add(models.MedicalRecord(
+                patient_id=patient.id, provider_id=doctor.id if i % 2 else None,
+                record_type="prescription", title=f"Follow-up {i}", description="Fever and cough",
+                diagnosis="Viral fever", prescriptions={"Paracetamol": "500mg 1+1+1"},
+                attachments=[], record_date=date(2025, 1, 15),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _orm_listings():
+    """The entity-loading queries the list routes ran before the read models"""
+    from sqlalchemy.orm import joinedload
+    from app import models
+
+    return {
+        "facilities": lambda db: db.query(models.MedicalFacility).filter(
+            models.MedicalFacility.is_active == True
+        ).order_by(models.MedicalFacility.name).all(),
+        "providers": lambda db: db.query(models.ProviderProfile).options(
+            joinedload(models.ProviderProfile.user)
+        ).filter(models.ProviderProfile.is_available == True).all(),
+        "medical_records": lambda db: db.query(models.MedicalRecord).options(
+            joinedload(models.MedicalRecord.provider)
+        ).filter(models.MedicalRecord.patient_id == "patient").order_by(
+            models.MedicalRecord.created_at.desc()
+        ).all(),
+    }
+
+
+def _projection_listings():
+    from app import read_models
+
+    return {
+        "facilities": lambda db: read_models.list_facilities(db),
+        "providers": lambda db: read_models.list_providers(db),
+        "medical_records": lambda db: read_models.list_medical_records(db, "patient"),
+    }
+
+
+def _listing_body(load, adapter) -> bytes:
+    from app.database import SessionLocal
+    from app.serialization import json_response
+
+    db = SessionLocal()
+    try:
+        return json_response(adapter, {"data": load(db)}).body
+    finally:
+        db.close()
+
+
+def _measure(load, adapter, repeat: int) -> dict:
+    _listing_body(load, adapter)
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _listing_body(load, adapter)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    _listing_body(load, adapter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(best * 1000, 2), "peak_kib": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=10, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        _seed(args.rows)
+
+        from app.routers.facilities import _facility_list
+        from app.routers.medical_records import _medical_record_list
+        from app.routers.providers import _provider_list
+        adapters = {"facilities": _facility_list, "providers": _provider_list, "medical_records": _medical_record_list}
+        orm, projection = _orm_listings(), _projection_listings()
+
+        results = []
+        for name, adapter in adapters.items():
+            assert _listing_body(orm[name], adapter) == _listing_body(projection[name], adapter), f"{name}: output differs"
+            before = _measure(orm[name], adapter, args.repeat)
+            after = _measure(projection[name], adapter, args.repeat)
+            results.append({
+                "listing": name,
+                "orm": before,
+                "projection": after,
+                "speedup": round(before["ms"] / after["ms"], 2),
+                "memory_ratio": round(after["peak_kib"] / before["peak_kib"], 2),
+            })
+
+    print(json.dumps({"rows": args.rows, "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
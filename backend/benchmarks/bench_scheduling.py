@@ -0,0 +1,73 @@
+"""
+Bisheshoggo AI - Scheduling Index Benchmark
+Conflict checks and next-free-slot searches on app.scheduling.IntervalIndex
+for providers with growing numbers of booked slots (random ~70% occupancy
+of bookable hours), against a linear scan over the booked slot list.
+Run from backend/:  python -m benchmarks.bench_scheduling --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+
+def _best_per_call(fn, queries, repeat: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for query in queries:
+                fn(query)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="booked slots")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5, help="best-of repetitions")
+    args = parser.parse_args()
+
+    from app import scheduling
+
+    slot = scheduling.slot_length()
+    origin = scheduling.align_down(datetime(2026, 1, 1))
+    rng = random.Random(0)
+    results = []
+    for size in args.sizes:
+        # Walk forward through bookable hours, booking ~70% of slots
+        booked, at = [], origin
+        while len(booked) < size:
+            at = scheduling.next_free_slot(scheduling.IntervalIndex(), at, until=at + timedelta(days=2))
+            if rng.random() < 0.7:
+                booked.append(at)
+            at += slot
+        index = scheduling.IntervalIndex((start, start + slot) for start in booked)
+        span = (booked[-1] - origin).total_seconds()
+        queries = [origin + timedelta(seconds=rng.uniform(0, span)) for _ in range(args.queries)]
+
+        def scan_overlaps(at):
+            return any(start < at + slot and at < start + slot for start in booked)
+
+        indexed = _best_per_call(lambda at: index.overlaps(at, at + slot), queries, args.repeat)
+        scanned = _best_per_call(scan_overlaps, queries[:200], 1)
+        next_free = _best_per_call(lambda at: scheduling.next_free_slot(index, at), queries, args.repeat)
+        results.append({
+            "booked_slots": size,
+            "runs": len(index),
+            "conflict_check_us": round(indexed * 1e6, 2),
+            "linear_scan_us": round(scanned * 1e6, 1),
+            "next_free_slot_us": round(next_free * 1e6, 2),
+        })
+
+    print(json.dumps({"queries": args.queries, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Bisheshoggo AI - Response Serialization Benchmark
+Times turning N already-loaded ORM rows into response bytes for the three
+list routes, without the database or the ASGI stack:
+
+    legacy    hand-built dict per row -> FastAPI response_model=dict -> JSONResponse
+    orjson    same dicts and FastAPI path, rendered by ORJSONResponse
+    adapter   cached TypeAdapter validates ORM rows and dumps JSON in one pass
+
+Run from backend/:  python -m benchmarks.bench_serialization --rows 100 1000 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+from datetime import date, datetime
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app import models
+from app.routers.facilities import _facility_list
+from app.routers.medical_records import _medical_record_list
+from app.routers.providers import _provider_list
+from app.serialization import json_response
+
+CREATED = datetime(2025, 1, 15, 9, 30)
+DICT_FIELD = create_model_field("Response", dict)
+
+
+def make_facilities(n: int) -> list:
+    return [models.MedicalFacility(
+        id=f"facility-{i}", name=f"Upazila Health Complex {i}", facility_type=models.FacilityType.hospital,
+        phone="+8801700000000", address="Main Road", village="Ruma", district="Bandarban",
+        division="Chittagong", latitude=22.19, longitude=92.21, operating_hours="24/7",
+        services_offered=["Emergency", "Maternity", "Pharmacy"], has_ambulance=True,
+        has_emergency=True, is_active=True, contact_person="Dr. Rahman", created_at=CREATED,
+    ) for i in range(n)]
+
+
+def make_providers(n: int) -> list:
+    return [models.ProviderProfile(
+        id=f"provider-{i}", user_id=f"user-{i}", specialization="General Medicine",
+        license_number=f"BMDC-{i}", qualification="MBBS", years_of_experience=7,
+        consultation_fee=500.0, available_for_telemedicine=True, is_available=True,
+        languages=["Bangla", "English"], bio="Rural health physician.",
+        user=models.User(id=f"user-{i}", email=f"doctor{i}@example.com", full_name=f"Dr. {i}",
+                         phone="+8801700000000", avatar_url=None),
+    ) for i in range(n)]
+
+
+def make_medical_records(n: int) -> list:
+    doctor = models.User(id="doctor", email="doctor@example.com", full_name="Dr. Karim")
+    return [models.MedicalRecord(
+        id=f"record-{i}", patient_id="patient", provider_id="doctor", consultation_id=None,
+        record_type="prescription", title=f"Follow-up {i}", description="Fever and cough",
+        diagnosis="Viral fever", prescriptions={"Paracetamol": "500mg 1+1+1"},
+        attachments=[], document_url=None, record_date=date(2025, 1, 15), created_at=CREATED,
+        provider=doctor,
+    ) for i in range(n)]
+
+
+# The per-row dict builders the routes used before the adapter fast path
+def legacy_facility(f):
+    return {
+        "id": f.id, "name": f.name, "facility_type": f.facility_type, "phone": f.phone,
+        "address": f.address, "village": f.village, "district": f.district, "division": f.division,
+        "latitude": f.latitude, "longitude": f.longitude, "operating_hours": f.operating_hours,
+        "services_offered": f.services_offered, "has_ambulance": f.has_ambulance,
+        "has_emergency": f.has_emergency, "is_active": f.is_active, "contact_person": f.contact_person,
+        "created_at": f.created_at.isoformat() if f.created_at else None,
+    }
+
+
+def legacy_provider(p):
+    return {
+        "id": p.id, "user_id": p.user_id, "specialization": p.specialization,
+        "license_number": p.license_number, "qualification": p.qualification,
+        "years_of_experience": p.years_of_experience, "consultation_fee": p.consultation_fee,
+        "available_for_telemedicine": p.available_for_telemedicine, "is_available": p.is_available,
+        "languages": p.languages, "bio": p.bio,
+        "profile": {"full_name": p.user.full_name, "email": p.user.email,
+                    "phone_number": p.user.phone, "avatar_url": p.user.avatar_url},
+    }
+
+
+def legacy_medical_record(r):
+    return {
+        "id": r.id, "patient_id": r.patient_id, "provider_id": r.provider_id,
+        "consultation_id": r.consultation_id, "record_type": r.record_type, "title": r.title,
+        "description": r.description, "diagnosis": r.diagnosis, "prescriptions": r.prescriptions,
+        "attachments": r.attachments, "document_url": r.document_url, "record_date": r.record_date,
+        "created_at": r.created_at,
+        "provider": {"full_name": r.provider.full_name} if r.provider else None,
+    }
+
+
+COLLECTIONS = {
+    "facilities": (make_facilities, legacy_facility, _facility_list),
+    "providers": (make_providers, legacy_provider, _provider_list),
+    "medical_records": (make_medical_records, legacy_medical_record, _medical_record_list),
+}
+
+
+def _fastapi_path(rows, builder, response_class) -> bytes:
+    content = asyncio.run(serialize_response(field=DICT_FIELD, response_content={"data": [builder(r) for r in rows]}))
+    return response_class(content).body
+
+
+def _time(fn, repeat: int) -> float:
+    """Best of ``repeat`` runs in milliseconds, with the cyclic GC paused as timeit does."""
+    fn()
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20, help="best-of repetitions")
+    args = parser.parse_args()
+
+    results = []
+    for name, (make, builder, adapter) in COLLECTIONS.items():
+        for n in args.rows:
+            rows = make(n)
+            legacy = json.loads(_fastapi_path(rows, builder, JSONResponse))
+            assert json.loads(json_response(adapter, {"data": rows}).body) == legacy, f"{name}: output differs"
+            timings = {
+                "legacy_ms": _time(lambda: _fastapi_path(rows, builder, JSONResponse), args.repeat),
+                "orjson_ms": _time(lambda: _fastapi_path(rows, builder, ORJSONResponse), args.repeat),
+                "adapter_ms": _time(lambda: json_response(adapter, {"data": rows}).body, args.repeat),
+            }
+            results.append({
+                "collection": name, "rows": n,
+                **{k: round(v, 3) for k, v in timings.items()},
+                "speedup": round(timings["legacy_ms"] / timings["adapter_ms"], 2),
+            })
+
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
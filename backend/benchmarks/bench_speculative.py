@@ -0,0 +1,127 @@
+"""
+Bisheshoggo AI - Speculative Decoding Benchmark
+Compares plain vs draft-assisted MedGemma generation on our triage and chat
+prompts: tokens/sec, draft acceptance rate, and whether greedy outputs match.
+
+Requires a GPU and MEDGEMMA_DRAFT_MODEL_ID set (e.g. google/gemma-3-270m-it).
+Run from backend/:  python -m benchmarks.bench_speculative --runs 3
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from app import medgemma_service as svc
+from app.config import settings
+
+TRIAGE_CASES = [
+    (["fever", "cough", "sore throat"], "moderate", "3 days", ""),
+    (["diarrhea", "vomiting", "stomach pain"], "severe", "1 day", "Drank pond water"),
+    (["headache", "stiff neck", "fever"], "severe", "12 hours", "Child, 6 years old"),
+]
+
+CHAT_QUESTIONS = [
+    "আমার বাচ্চার ৩ দিন ধরে জ্বর, কী করব?",
+    "How should I store insulin without a refrigerator?",
+    "What are the warning signs of dengue?",
+]
+
+
+def _prompts():
+    for symptoms, severity, duration, notes in TRIAGE_CASES:
+        yield "symptom_analysis", [
+            {"role": "system", "content": "You are a medical AI triage assistant. Respond only with valid JSON."},
+            {"role": "user", "content": svc._symptom_analysis_prompt(symptoms, severity, duration, notes)},
+        ]
+    for question in CHAT_QUESTIONS:
+        yield "chat", [
+            {"role": "system", "content": svc.MEDGEMMA_SYSTEM_INSTRUCTION},
+            {"role": "user", "content": question},
+        ]
+
+
+class _ForwardCounter:
+    """Counts forward passes of a module via a hook."""
+
+    def __init__(self, module):
+        self.calls = 0
+        self._handle = module.register_forward_hook(self._hook)
+
+    def _hook(self, *args):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+    def close(self):
+        self._handle.remove()
+
+
+def _run(endpoint, messages, speculative, target_counter, draft_counter):
+    target_counter.reset()
+    draft_counter.reset()
+    start = time.perf_counter()
+    text = svc._generate_local(messages, temperature=0, endpoint=endpoint, speculative=speculative)
+    elapsed = time.perf_counter() - start
+    tokens = len(svc._processor.tokenizer(text, add_special_tokens=False)["input_ids"])
+    return text, tokens, elapsed, target_counter.calls, draft_counter.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="repetitions per prompt and mode")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if not settings.MEDGEMMA_DRAFT_MODEL_ID:
+        sys.exit("MEDGEMMA_DRAFT_MODEL_ID is not set; nothing to compare")
+    if not svc._load_model() or svc._draft_model is None:
+        sys.exit(f"Model or draft model failed to load: {svc._model_load_error}")
+
+    target_counter = _ForwardCounter(svc._model)
+    draft_counter = _ForwardCounter(svc._draft_model)
+    results = []
+
+    for endpoint, messages in _prompts():
+        row = {"endpoint": endpoint, "prompt": messages[-1]["content"][:60]}
+        outputs = {}
+        for mode, speculative in (("plain", False), ("speculative", True)):
+            rates, acceptance = [], []
+            for _ in range(args.runs):
+                text, tokens, elapsed, target_calls, draft_calls = _run(
+                    endpoint, messages, speculative, target_counter, draft_counter,
+                )
+                rates.append(tokens / elapsed)
+                if speculative and draft_calls:
+                    # Each verification step yields one token from the target model;
+                    # everything beyond that was an accepted draft token.
+                    acceptance.append(max(tokens - target_calls, 0) / draft_calls)
+            outputs[mode] = text
+            row[f"{mode}_tokens_per_sec"] = round(statistics.median(rates), 1)
+            if acceptance:
+                row["acceptance_rate"] = round(statistics.median(acceptance), 3)
+        row["speedup"] = round(row["speculative_tokens_per_sec"] / row["plain_tokens_per_sec"], 2)
+        row["outputs_identical"] = outputs["plain"] == outputs["speculative"]
+        results.append(row)
+        print(f"[Bench] {endpoint:17s} {row['plain_tokens_per_sec']:7.1f} -> "
+              f"{row['speculative_tokens_per_sec']:7.1f} tok/s  x{row['speedup']}  "
+              f"accept={row.get('acceptance_rate')}  identical={row['outputs_identical']}")
+
+    target_counter.close()
+    draft_counter.close()
+
+    report = {
+        "draft_model": settings.MEDGEMMA_DRAFT_MODEL_ID,
+        "num_assistant_tokens": settings.MEDGEMMA_NUM_ASSISTANT_TOKENS,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Bisheshoggo AI - API Cold-Start Benchmark
+Starts a fresh interpreter, imports the app, runs the lifespan startup and
+serves one GET /health, then checks wall time and peak RSS against a budget.
+Also fails if torch/transformers got imported on the way (they must stay lazy).
+
+framework_import_s is the share spent importing FastAPI, Starlette's test
+client, SQLAlchemy and pydantic before any app module loads. On a 1-vCPU
+runner that floor alone is 0.55-0.7s; the app's own modules, route
+registration and lifespan add about 0.3s (backfills and index preloads run
+in the background after startup). A median above budget with a framework
+floor well past 0.7s points at a busy runner rather than the app.
+
+Run from backend/:  python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Executed in a clean child process so nothing is already imported/cached
+CHILD_SCRIPT = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import sqlalchemy.orm
+from fastapi.testclient import TestClient
+framework = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    response = client.get("/health")
+ready = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "framework_import_s": framework - start,
+    "import_s": imported - start,
+    "health_ready_s": ready - start,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "ml_stack_loaded": [m for m in ("torch", "transformers") if m in sys.modules],
+}))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _measure_once(database_url):
+    env = {**os.environ, "DATABASE_URL": database_url, "DEBUG": "false"}
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="budget for /health to be ready")
+    parser.add_argument("--max-rss-mb", type=float, default=150.0, help="peak RSS budget")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        samples = [_measure_once(database_url) for _ in range(args.runs)]
+
+    summary = {
+        "runs": args.runs,
+        "framework_import_s_median": round(statistics.median(s["framework_import_s"] for s in samples), 3),
+        "import_s_median": round(statistics.median(s["import_s"] for s in samples), 3),
+        "health_ready_s_median": round(statistics.median(s["health_ready_s"] for s in samples), 3),
+        "peak_rss_mb_max": round(max(s["peak_rss_mb"] for s in samples), 1),
+        "ml_stack_loaded": sorted({m for s in samples for m in s["ml_stack_loaded"]}),
+        "budget": {"max_seconds": args.max_seconds, "max_rss_mb": args.max_rss_mb},
+    }
+    print(json.dumps(summary, indent=2))
+
+    failures = []
+    if summary["health_ready_s_median"] > args.max_seconds:
+        failures.append(f"/health ready in {summary['health_ready_s_median']}s > {args.max_seconds}s")
+    if summary["peak_rss_mb_max"] > args.max_rss_mb:
+        failures.append(f"peak RSS {summary['peak_rss_mb_max']} MB > {args.max_rss_mb} MB")
+    if summary["ml_stack_loaded"]:
+        failures.append(f"ML stack imported at startup: {', '.join(summary['ml_stack_loaded'])}")
+    for failure in failures:
+        print(f"[Bench] FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Bisheshoggo AI - Wire Format Benchmark
+JSON versus MessagePack for the list endpoints' response bodies, rendered
+from a seeded SQLite file through the routes' own TypeAdapters:
+
+    json     serialization.dump_json      (orjson via pydantic-core)
+    msgpack  serialization.dump_msgpack   (same schema dump, msgpack timestamps)
+
+Reports body size raw and gzip-compressed (as CompressionMiddleware would
+send it), best-of encode time and best-of client-side decode time.
+Run from backend/:  python -m benchmarks.bench_wire_format --rows 500
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import zlib
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def _seed_history(rows: int):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for i in range(rows):
+            db.add(models.SymptomCheck(
+                user_id="patient", symptoms=["fever", "cough", "headache"], severity="moderate",
+                duration="3 days", diagnosis="Viral Fever",
+                recommendations="বিশ্রাম নিন, প্রচুর পানি পান করুন এবং প্যারাসিটামল সেবন করুন। জ্বর ৩ দিনের বেশি থাকলে ডাক্তার দেখান।",
+                suggested_conditions=["Viral Fever", "Common Cold"], synced=True,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=10, help="best-of repetitions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from benchmarks.bench_read_models import _seed
+        _seed(args.rows)
+        _seed_history(args.rows)
+
+        import orjson
+        from app import models, read_models
+        from app.database import SessionLocal
+        from app.routers.facilities import _facility_list
+        from app.routers.medical_records import _medical_record_list
+        from app.routers.providers import _provider_list
+        from app.routers.symptom_check import _symptom_check_list
+        from app.serialization import dump_json, dump_msgpack, msgpack
+
+        if msgpack is None:
+            raise SystemExit("msgpack is not installed")
+
+        db = SessionLocal()
+        try:
+            listings = {
+                "facilities": (_facility_list, read_models.list_facilities(db)),
+                "providers": (_provider_list, read_models.list_providers(db)),
+                "medical_records": (_medical_record_list, read_models.list_medical_records(db, "patient")),
+                "symptom_checks": (_symptom_check_list, db.query(models.SymptomCheck).all()),
+            }
+            results = []
+            for name, (adapter, rows) in listings.items():
+                content = {"data": rows}
+                as_json = dump_json(adapter, content)
+                as_msgpack = dump_msgpack(adapter, content)
+                results.append({
+                    "listing": name,
+                    "json": {
+                        "bytes": len(as_json),
+                        "gzip_bytes": len(zlib.compress(as_json, 6)),
+                        "encode_ms": round(_best(lambda: dump_json(adapter, content), args.repeat) * 1000, 2),
+                        "decode_ms": round(_best(lambda: orjson.loads(as_json), args.repeat) * 1000, 2),
+                    },
+                    "msgpack": {
+                        "bytes": len(as_msgpack),
+                        "gzip_bytes": len(zlib.compress(as_msgpack, 6)),
+                        "encode_ms": round(_best(lambda: dump_msgpack(adapter, content), args.repeat) * 1000, 2),
+                        "decode_ms": round(_best(lambda: msgpack.unpackb(as_msgpack, timestamp=3), args.repeat) * 1000, 2),
+                    },
+                    "size_ratio": round(len(as_msgpack) / len(as_json), 3),
+                })
+        finally:
+            db.close()
+
+    print(json.dumps({"rows": args.rows, "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -35,5 +35,6 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=True,
+        log_config=None,  # uvicorn's loggers propagate to the app's queued JSON handler
     )
@@ -0,0 +1,21 @@
+from app.drug_dictionary import canonicalize_prescriptions
+from app.drug_interactions import interactions_for_prescriptions
+
+
+def _interactions(*names):
+    return interactions_for_prescriptions(canonicalize_prescriptions([{"name": n} for n in names]))
+
+
+def test_exact_matches_produce_deterministic_alert():
+    findings = _interactions("Warfarin", "Ciprocin 500")
+    assert [f["generics"] for f in findings] == [["warfarin", "ciprofloxacin"]]
+
+
+def test_fuzzy_match_produces_no_deterministic_alert():
+    items = canonicalize_prescriptions([{"name": "Warfarin"}, {"name": "Ciprocn"}])
+    assert items[1]["canonical"]["match"] == "fuzzy"
+    assert interactions_for_prescriptions(items) == []
+
+
+def test_fuzzy_duplicate_is_not_reported_as_double_dosing():
+    assert _interactions("Seclo 20", "Losectl") == []